@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_remove_user_user_name_alter_user_username"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="is_guest",
+            field=models.BooleanField(default=False),
+        ),
+    ]
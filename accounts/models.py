@@ -5,3 +5,5 @@ from django.db import models
 # Create your models here.
 class User(AbstractUser):
     username = models.CharField(max_length=225, unique=True)
+    # 게스트가 처음 메시지를 보낼 때 만들어지는 유저 (로그인 불가)
+    is_guest = models.BooleanField(default=False)
@@ -0,0 +1,63 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+
+from chat.lobby import invalidate_chatroom_list
+from chat.models import ArchivedMessage, ChatRoom, Message
+from chat_project.helpers import SEOUL_TZ
+
+
+def archive_cutoff(days=None):
+    days = settings.CHAT_MESSAGE_HOT_DAYS if days is None else days
+    return datetime.now(tz=SEOUL_TZ) - timedelta(days=days)
+
+
+def archive_messages(before, batch_size=1000, pause=0):
+    # before 보다 오래된 메시지를 batch_size 씩 짧은 트랜잭션으로 archive 테이블로 옮긴다.
+    # 배치 사이에 pause 초 쉬어 잠금과 복제 지연이 길어지지 않게 한다.
+    db = router.db_for_write(Message)
+    archived = 0
+    while True:
+        with transaction.atomic(using=db):
+            messages = list(
+                Message.objects.using(db)
+                .filter(created_at__lt=before)
+                .order_by("id")[:batch_size]
+            )
+            if not messages:
+                return archived
+            ArchivedMessage.objects.using(db).bulk_create(
+                [
+                    ArchivedMessage(
+                        id=message.id,
+                        user_id=message.user_id,
+                        room_id=message.room_id,
+                        content=message.content,
+                        created_at=message.created_at,
+                    )
+                    for message in messages
+                ],
+                ignore_conflicts=True,
+            )
+            ids = [message.id for message in messages]
+            # 행마다 post_delete (요약 재계산, 버퍼 무효화) 가 나가지 않도록 신호 없이 지운다.
+            # (Message 를 참조하는 FK 가 없어 cascade 할 것도 없다.)
+            Message.objects.using(db).filter(id__in=ids)._raw_delete(db)
+            # 요약이 옮긴 메시지를 가리키는 채팅방만 다시 계산한다.
+            # 히스토리 버퍼는 archive 까지 이어서 읽은 것과 같으므로 그대로 둔다.
+            rooms = (
+                ChatRoom.objects.using(db)
+                .filter(latest_message_id__in=ids)
+                .values_list("id", "latest_message_id")
+            )
+            refreshed = sum(
+                ChatRoom.refresh_latest_message(room_id, latest_id, archived=True)
+                for room_id, latest_id in rooms
+            )
+        if refreshed:
+            invalidate_chatroom_list()
+        archived += len(messages)
+        if pause:
+            time.sleep(pause)
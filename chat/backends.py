@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+_backends = {}
+
+
+def get_backend(setting_name):
+    # CACHES, CHANNEL_LAYERS 와 같은 {"BACKEND": ..., "OPTIONS": {...}} 형태의 설정을 읽어 인스턴스를 만든다.
+    if setting_name not in _backends:
+        config = getattr(settings, setting_name)
+        _backends[setting_name] = import_string(config["BACKEND"])(
+            **config.get("OPTIONS", {})
+        )
+    return _backends[setting_name]
+
+
+def reset_backends():
+    _backends.clear()
+
+
+@receiver(setting_changed)
+def _reset_backend(*, setting, **kwargs):
+    _backends.pop(setting, None)
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from collections import Counter
+
+from django.conf import settings
+
+# 프로세스의 모든 연결 묶음 전송 지표 (frames: 보낸 프레임 수, messages: 담긴 메시지 수)
+batch_stats = Counter()
+
+
+# 채팅 메시지를 연결별로 짧게 모아 한 프레임으로 보낸다. (/room/{room_id}/chat/?delivery=batch)
+# 직전 전송 후 CHAT_BATCH_WINDOW_MS 가 지났으면 (조용한 방) 기다리지 않고 바로 보내고,
+# 그 안에 이어서 들어온 메시지만 창이 끝날 때까지, 혹은 CHAT_BATCH_MAX_MESSAGES 개까지 모아서 보낸다.
+class MessageBatcher:
+    def __init__(self, send, combine):
+        self.send = send
+        self.combine = combine
+        self.window = settings.CHAT_BATCH_WINDOW_MS / 1000
+        self.max_size = settings.CHAT_BATCH_MAX_MESSAGES
+        self.pending = []
+        self.last_sent = 0
+        self._timer = None
+
+    async def add(self, frame):
+        if not self.pending and time.monotonic() - self.last_sent >= self.window:
+            await self._send([frame])
+            return
+
+        self.pending.append(frame)
+        if len(self.pending) >= self.max_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.pending:
+            frames, self.pending = self.pending, []
+            await self._send(frames)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.pending = []
+
+    async def _send(self, frames):
+        self.last_sent = time.monotonic()
+        batch_stats["frames"] += 1
+        batch_stats["messages"] += len(frames)
+        # 하나뿐이면 원래 프레임 그대로 보낸다.
+        await self.send(frames[0] if len(frames) == 1 else self.combine(frames))
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
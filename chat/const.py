@@ -1,8 +1,21 @@
 # 오류 메시지
 WEBSOCKET_ERROR = "[Websocket Connection Error]"
+# ERROR 프레임 code
+RATE_LIMITED = "rate_limited"
+INVALID_CURSOR = "invalid_cursor"
 
 # SYSTEM USER
 SYSTEM = "SYSTEM"
 
 # 채팅방 메시지
 NO_MSG = "메시지가 없습니다."
+LATEST_MESSAGE_PREVIEW_LENGTH = 255
+
+# 채팅방별 메시지 전송 속도 제한 범위 (초당 메시지 수, 연속 최대 메시지 수)
+MIN_MESSAGE_RATE = 0.01
+MAX_MESSAGE_RATE = 1_000
+MAX_MESSAGE_BURST = 1_000
+
+# 프로토콜 버전 (v2 부터 과거 메시지를 묶어서 전송)
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
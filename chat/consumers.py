@@ -1,249 +1,325 @@
-import json
-import uuid
-from collections import OrderedDict
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime
+from functools import partial
+from urllib.parse import parse_qs
 
-from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.contrib.auth import get_user_model
-from django.db.models import (CharField, Count, F, OuterRef, Q, Subquery,
-                              TextField, Value)
-from django.db.models.functions import Coalesce
+from django.conf import settings
 
-from chat.const import NO_MSG, SYSTEM, WEBSOCKET_ERROR
+from chat.batching import MessageBatcher
+from chat.const import (INVALID_CURSOR, PROTOCOL_V2, RATE_LIMITED,
+                        WEBSOCKET_ERROR)
+from chat.data import (aget_chatroom_list_frame, aget_guest_user, aget_room,
+                       aload_history, arecord_visit, asave_message)
+from chat.encoding import (MSGPACK_SUBPROTOCOL, decode_frame,
+                           encode_batch_frame, encode_binary_batch_frame,
+                           encode_frame, to_binary_frame)
 from chat.enums import MessageType
-from chat.models import ChatRoom, ChatRoomVisit, Message
+from chat.groups import broadcast_frame, group_add, group_discard
+from chat.guests import Guest, issue_guest, load_guest
+from chat.history import build_history_frames, build_legacy_history_frame
+from chat.lobby import (LOBBY_GROUP, latest_message_coalescer, parse_cursor,
+                        publish_visitor_count)
+from chat.models import Message
+from chat.outbox import Outbox, watch_transport
+from chat.persistence import message_writer
+from chat.presence import presence_tracker
+from chat.ratelimit import (acheck_message_rate, acheck_request_rate,
+                            rate_limit_key)
+from chat.search import search_indexer
+from chat.timing import PhaseTimer
 from chat_project.helpers import SEOUL_TZ
 
-User = get_user_model()
 
+class FrameConsumer(AsyncWebsocketConsumer):
+    # 핸드셰이크에서 msgpack subprotocol 을 고른 클라이언트와는 바이너리 프레임으로,
+    # 그 외에는 JSON 텍스트 프레임으로 주고받는다.
+    # accept 이후의 프레임은 연결별 송신 큐(Outbox)를 거쳐 보낸다.
+    binary = False
+    outbox = None
 
-class ChatRoomConsumer(AsyncWebsocketConsumer):
+    async def accept_frames(self, headers=None):
+        self.binary = MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", [])
+        await self.accept(
+            subprotocol=MSGPACK_SUBPROTOCOL if self.binary else None, headers=headers
+        )
+        self.outbox = Outbox(
+            self.send, self.close, flow=watch_transport(self.base_send)
+        )
+
+    async def close(self, code=None, reason=None):
+        if self.outbox is not None and self.outbox.flow is not None:
+            self.outbox.flow.detach()
+        await super().close(code=code, reason=reason)
+
+    async def websocket_disconnect(self, message):
+        if self.outbox is not None:
+            self.outbox.stop()
+        await super().websocket_disconnect(message)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        await self.receive_frame(decode_frame(text_data, bytes_data))
+
+    async def receive_frame(self, data):
+        pass
+
+    async def send_event(self, event, key=None):
+        # 그룹 이벤트에 실려온 프레임을 다시 인코딩하지 않고 그대로 보낸다.
+        # key 가 같은 프레임은 송신 큐에서 합쳐질 수 있다. (CHAT_OUTBOUND_QUEUE_POLICY=coalesce)
+        await self.send_encoded(event["text"], key=key)
+
+    async def send_encoded(self, frame, key=None):
+        # JSON 으로 미리 인코딩된 프레임은 binary 클라이언트에게만 변환해서 보낸다.
+        if isinstance(frame, bytes):
+            await self.outbox.put(key, bytes_data=frame)
+        elif self.binary:
+            await self.outbox.put(key, bytes_data=to_binary_frame(frame))
+        else:
+            await self.outbox.put(key, text_data=frame)
+
+    async def _send_error(self, code, **fields):
+        await self.send_encoded(
+            encode_frame({"type": MessageType.ERROR, "code": code, **fields})
+        )
+
+
+class ChatRoomConsumer(FrameConsumer):
     async def connect(self):
-        self.room_group_name = "chatroom"
+        self.room_group_name = LOBBY_GROUP
 
-        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await group_add(self.channel_layer, self.room_group_name, self.channel_name)
+        await self.accept_frames()
         await self._send_chatroom_list()
-        await self.accept()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        await group_discard(self.channel_layer, self.room_group_name, self.channel_name)
+
+    async def receive_frame(self, data):
+        # 클라이언트가 버전 누락을 감지하면 전체 목록을 다시 요청한다.
+        if data.get("type") == MessageType.REQUEST_SNAPSHOT:
+            await self._send_chatroom_list()
+        elif data.get("type") == MessageType.LOAD_ROOMS:
+            try:
+                after = parse_cursor(data.get("cursor"))
+            except ValueError:
+                await self._send_error(INVALID_CURSOR)
+                return
+            await self._send_chatroom_list(after)
 
     async def update_latest_msg(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": MessageType.UPDATE_LATEST_MSG,
-                    "message": event["message"],
-                    "username": event["username"],
-                    "chatroom_id": event["chatroom_id"],
-                }
-            )
-        )
+        await self._send_delta(event)
 
-    async def _send_chatroom_list(self):
-        now = datetime.now(tz=SEOUL_TZ)
-        chatrooms = await database_sync_to_async(
-            lambda: list(
-                ChatRoom.objects.annotate(
-                    recent_visitors_count=Count(
-                        "visits",
-                        filter=Q(
-                            visits__last_visited_at__gte=now - timedelta(minutes=30)
-                        ),
-                    )
-                )
-                .order_by("-recent_visitors_count")
-                .values_list("id", "name", "recent_visitors_count")
-            )
-        )()
-        latest_message = await self._get_latest_message()
-        results = OrderedDict(
-            (
-                str(id_),
-                {
-                    "chatroom_id": id_,
-                    "name": name,
-                    "visitor_count": visitor_count,
-                    "latest_message": latest_message.get(id_),
-                },
-            )
-            for id_, name, visitor_count in chatrooms
-        )
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": MessageType.SEND_CHATROOM_LIST,
-                "results": results,
-            },
-        )
+    async def update_latest_msgs(self, event):
+        await self._send_delta(event)
 
-    async def send_chatroom_list(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": MessageType.SEND_CHATROOM_LIST,
-                    "results": event["results"],
-                }
-            )
-        )
+    async def room_created(self, event):
+        await self._send_delta(event)
 
-    async def _get_latest_message(self):
-        latest_message_subquery = (
-            Message.objects.filter(room=OuterRef("id"))
-            .order_by("-created_at")
-            .annotate(username=F("user__username"))
-            .values("content", "username")[:1]
-        )
+    async def visitor_count_changed(self, event):
+        await self._send_delta(event)
 
-        latest_messages = await database_sync_to_async(
-            lambda: list(
-                ChatRoom.objects.annotate(
-                    chatroom_id=F("id"),
-                    message=Coalesce(
-                        Subquery(latest_message_subquery.values("content")),
-                        Value(NO_MSG),
-                        output_field=TextField(),
-                    ),
-                    username=Coalesce(
-                        Subquery(latest_message_subquery.values("username")),
-                        Value(SYSTEM),
-                        output_field=CharField(),
-                    ),
-                ).values_list("id", "message", "username")
-            )
-        )()
-        return {
-            id_: {
-                "message": msg,
-                "username": user,
-            }
-            for id_, msg, user in latest_messages
-        }
+    async def rank_changed(self, event):
+        await self._send_delta(event)
 
+    async def _send_delta(self, event):
+        await self.send_event(event)
+
+    async def _send_chatroom_list(self, after=None):
+        frame = await aget_chatroom_list_frame(after, self.binary)
+        await self.send_encoded(frame)
+
+
+class ChatConsumer(FrameConsumer):
+    batcher = None
+    joined = False
 
-class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
+        timer = PhaseTimer("connect")
         try:
             self.room_id = self.scope["url_route"]["kwargs"]["room_id"]
             self.room_group_name = f"chat_{self.room_id}"
             self.user = self.scope["user"]
-            self.room = await database_sync_to_async(ChatRoom.objects.get)(
-                id=self.room_id
+            self.protocol_version = self._get_protocol_version()
+            self.user = self._get_user()
+            self.rate_key = rate_limit_key(self.user, self.scope.get("client"))
+            # 서로 의존하지 않는 단계는 동시에 실행한다.
+            self.room, _ = await asyncio.gather(
+                aget_room(self.room_id),
+                group_add(self.channel_layer, self.room_group_name, self.channel_name),
             )
-            self.user = await self._get_user()
+            timer.mark("lookup")
 
-            await self.channel_layer.group_add(self.room_group_name, self.channel_name)
-            await self.accept()
+            await self.accept_frames(headers=self._guest_cookie_headers())
+            self.batcher = self._get_batcher()
+            await self._send_guest_token()
+            timer.mark("accept")
 
             now = datetime.now(tz=SEOUL_TZ)
-            await self._record_visit(now)
-            await self._send_past_messages()
-            await self._send_user_count()
+            entries, _ = await asyncio.gather(
+                self._load_history(),
+                self._record_visit(now),
+            )
+            timer.mark("load")
+
+            await self._send_history(entries)
+            timer.mark("history")
+
+            await asyncio.gather(
+                publish_visitor_count(self.room.id),
+                self._join_presence(),
+            )
+            timer.mark("count")
+            timer.log(room=self.room_id)
 
         except Exception as e:
             print(f"{WEBSOCKET_ERROR} {str(e)}")
             await self.close()
 
+    async def _join_presence(self):
+        await presence_tracker.join(self.room.id)
+        # 접속 수에 더해진 뒤에만 종료시 뺀다.
+        self.joined = True
+
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if self.batcher is not None:
+            self.batcher.stop()
+        if self.joined:
+            await presence_tracker.leave(self.room.id)
+        await group_discard(self.channel_layer, self.room_group_name, self.channel_name)
+
+    async def receive_frame(self, data):
+        # 제한을 넘은 프레임은 DB/channel layer 를 거치기 전에 보낸 사람에게만 알린다.
+        load_more = data.get("type") == MessageType.LOAD_MORE
+        check_rate = acheck_request_rate if load_more else acheck_message_rate
+        retry_after = await check_rate(self.room, self.rate_key)
+        if retry_after:
+            await self._send_error(RATE_LIMITED, retry_after=retry_after)
+            return
+
+        if load_more:
+            # before_id 는 마지막으로 받은 메시지 id (양의 정수) 이다. (bool 은 int 여도 받지 않는다.)
+            before_id = data.get("before_id")
+            if type(before_id) is not int or before_id <= 0:
+                await self._send_error(INVALID_CURSOR)
+                return
+            await self._send_past_messages(before_id=before_id)
+            return
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
         message = data["message"]
         await self._save_and_send_chat_msg(message)
         await self._send_latest_message_for_chatroom(message)
 
-    async def _get_user(self):
+    def _get_user(self):
         if "user" not in self.scope or not self.user.is_authenticated:
-            return await self._create_temp_user()
+            return self._get_guest()
         else:
             return self.scope["user"]
 
-    def _generate_unique_id(self):
-        return str(uuid.uuid4())[:8]
+    def _get_guest(self):
+        # 토큰이 없거나 위조/만료되었으면 새 게스트를 발급한다.
+        token = self._get_query_param("guest") or self.scope.get("cookies", {}).get(
+            settings.CHAT_GUEST_COOKIE
+        )
+        return (token and load_guest(token)) or issue_guest()
 
-    async def _create_temp_user(self):
-        return await database_sync_to_async(User.objects.create)(
-            username=f"{self._generate_unique_id()}", password="1234"
+    def _guest_cookie_headers(self):
+        if self.user.pk is not None:
+            return None
+        cookie = (
+            f"{settings.CHAT_GUEST_COOKIE}={self.user.token}; "
+            f"Max-Age={settings.CHAT_GUEST_TOKEN_MAX_AGE}; Path=/; HttpOnly; SameSite=Lax"
         )
+        return [(b"set-cookie", cookie.encode())]
 
-    async def chat_message(self, event):
-        await self.send(
-            text_data=json.dumps(
+    async def _send_guest_token(self, guest=None):
+        # 쿠키를 쓰지 못하는 클라이언트는 이 토큰을 ?guest= 로 넘겨 재접속한다.
+        guest = guest or self.user
+        if guest.pk is not None:
+            return
+        await self.send_encoded(
+            encode_frame(
                 {
-                    "message": event["message"],
-                    "username": event["username"],
+                    "type": MessageType.GUEST_TOKEN,
+                    "username": guest.username,
+                    "token": guest.token,
                 }
             )
         )
 
-    async def _send_user_count(self):
-        active_user_count = await database_sync_to_async(
-            self.room.recent_visitor_count
-        )()
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "active_user_cnt": active_user_count,
-                "type": MessageType.SEND_USER_COUNT,
-            },
+    def _get_protocol_version(self):
+        try:
+            return int(self._get_query_param("version"))
+        except (TypeError, ValueError):
+            return settings.CHAT_DEFAULT_PROTOCOL_VERSION
+
+    def _get_batcher(self):
+        # 많은 메시지를 받는 클라이언트는 CHAT_MESSAGES 배열 프레임으로 묶어서 받을 수 있다.
+        if self._get_query_param("delivery") != "batch":
+            return None
+        encode = encode_binary_batch_frame if self.binary else encode_batch_frame
+        return MessageBatcher(
+            self.send_encoded, partial(encode, MessageType.CHAT_MESSAGES)
         )
 
+    def _get_query_param(self, name):
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        return query.get(name, [None])[0]
+
+    async def chat_message(self, event):
+        if self.batcher is None:
+            await self.send_event(event)
+        else:
+            frame = event["text"]
+            await self.batcher.add(to_binary_frame(frame) if self.binary else frame)
+
     async def _save_and_send_chat_msg(self, message):
-        await database_sync_to_async(Message.objects.create)(
-            content=message, room=self.room, user=self.user
-        )
-        await self.channel_layer.group_send(
+        # 게스트는 처음 메시지를 보낼 때 User 행을 만든다.
+        if self.user.pk is None:
+            guest = self.user
+            self.user = await aget_guest_user(guest)
+            if self.user.username != guest.username:
+                # 일반 유저와 이름이 겹쳐 새 게스트 이름을 받았으면 토큰을 다시 보낸다.
+                await self._send_guest_token(Guest(self.user.username))
+
+        chat_message = Message(content=message, room=self.room, user=self.user)
+        if not settings.CHAT_WRITE_BEHIND_ENABLED:
+            chat_message.index_later = True
+            await asave_message(chat_message)
+
+        await broadcast_frame(
+            self.channel_layer,
             self.room_group_name,
+            MessageType.CHAT_MESSAGE,
             {
-                "type": MessageType.CHAT_MESSAGE,
                 "message": message,
                 "username": self.user.username,
             },
         )
+        if settings.CHAT_WRITE_BEHIND_ENABLED:
+            await message_writer.enqueue(chat_message)
+        else:
+            search_indexer.add([chat_message])
 
     async def _record_visit(self, now: datetime):
-        return await database_sync_to_async(ChatRoomVisit.objects.create)(
-            user=self.user, room=self.room, last_visited_at=now
-        )
+        await arecord_visit(self.user, self.room, now)
 
     async def send_user_count(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": MessageType.SEND_USER_COUNT,
-                    "active_user_count": event["active_user_cnt"],
-                }
-            )
-        )
+        await self.send_event(event, key=MessageType.SEND_USER_COUNT)
 
-    async def _send_past_messages(self):
-        past_messages = await database_sync_to_async(
-            lambda: list(
-                Message.objects.filter(room=self.room)
-                .order_by("-id")
-                .select_related("user")
-            )
-        )()
-        for message in past_messages:
-            await self.send(
-                text_data=json.dumps(
-                    {
-                        "type": MessageType.PAST_MESSAGE,
-                        "message": message.content,
-                        "username": message.user.username,
-                    }
-                )
-            )
+    async def _send_past_messages(self, before_id=None):
+        await self._send_history(await self._load_history(before_id))
+
+    async def _load_history(self, before_id=None):
+        return await aload_history(self.room.id, before_id=before_id)
+
+    async def _send_history(self, entries):
+        if self.protocol_version >= PROTOCOL_V2:
+            for frame in build_history_frames(entries):
+                await self.send_encoded(frame)
+            return
+
+        for entry in entries:
+            await self.send_encoded(build_legacy_history_frame(entry))
 
     async def _send_latest_message_for_chatroom(self, message):
-        await self.channel_layer.group_send(
-            "chatroom",
-            {
-                "type": MessageType.UPDATE_LATEST_MSG,
-                "message": message,
-                "username": self.user.username,
-                "chatroom_id": self.room_id,
-            },
-        )
+        await latest_message_coalescer.add(self.room_id, message, self.user.username)
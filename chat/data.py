@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError
+
+from chat.executor import run_sync
+from chat.guests import issue_guest
+from chat.history import load_history_entries
+from chat.lobby import get_chatroom_list_frame
+from chat.rooms import room_cache
+from chat.routers import pin_primary
+from chat.visitors import record_visit
+
+User = get_user_model()
+
+
+# consumer 가 쓰는 DB 접근 함수. 모든 DB 작업은 전용 executor(run_sync)에서 실행한다.
+# (Django async ORM 의 aget/asave 등은 프로세스에 하나뿐인 thread_sensitive executor 로 모인다.)
+async def aget_room(room_id):
+    return await room_cache.aget(room_id)
+
+
+def get_guest_user(guest):
+    # 같은 이름의 일반 유저가 있으면 is_guest 조건 때문에 IntegrityError 가 나므로 새 게스트 이름으로 만든다.
+    while True:
+        try:
+            user, _ = User.objects.get_or_create(
+                username=guest.username,
+                is_guest=True,
+                defaults={"password": make_password(None)},
+            )
+            return user
+        except IntegrityError:
+            guest = issue_guest()
+
+
+async def aget_guest_user(guest):
+    return await run_sync(get_guest_user, guest)
+
+
+async def asave_message(message):
+    await run_sync(message.save)
+    # read-your-writes 표시는 호출한 쪽(이벤트 루프)의 context 에 남긴다.
+    pin_primary()
+
+
+async def arecord_visit(user, room, visited_at):
+    await run_sync(record_visit, user, room, visited_at)
+
+
+async def aload_history(room_id, before_id=None):
+    return await run_sync(load_history_entries, room_id, before_id=before_id)
+
+
+async def aget_chatroom_list_frame(after=None, binary=False):
+    return await run_sync(get_chatroom_list_frame, after, binary)
@@ -0,0 +1,7 @@
+from django.db.backends.mysql import base
+
+from chat.db_backends.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
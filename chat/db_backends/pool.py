@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import Counter, deque
+
+from django.db.utils import OperationalError
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+# 프로세스 단위 DB 연결 풀
+# - MIN_SIZE: 처음 사용할 때 미리 열어두는 연결 수, MAX_SIZE: 최대 연결 수 (넘으면 TIMEOUT 초까지 대기)
+# - MAX_LIFETIME: 이 시간(초)이 지난 연결은 반납/대여시 닫고 새로 연다.
+# - HEALTH_CHECK_AFTER: 이 시간(초) 이상 쉬었던 연결은 빌려주기 전에 SELECT 1 로 확인한다.
+class ConnectionPool:
+    def __init__(
+        self,
+        connect,
+        min_size=0,
+        max_size=10,
+        max_lifetime=None,
+        timeout=10,
+        health_check_after=30,
+    ):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.stats = Counter()
+        self.size = 0
+        self.in_use = 0
+        self.waiting = 0
+        self._idle = deque()
+        self._created_at = {}
+        self._cond = threading.Condition()
+        self._filled = False
+        self.closed = False
+
+    def acquire(self, connect=None):
+        self._fill()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                entry = self._take(deadline)
+            if entry is None:
+                return self._create(connect)
+
+            conn, idle_since = entry
+            stale = time.monotonic() - idle_since >= self.health_check_after
+            if self._expired(conn):
+                self.stats["recycled"] += 1
+                self._discard(conn)
+            elif stale and not self._ping(conn):
+                self.stats["health_check_failed"] += 1
+                self._discard(conn)
+            else:
+                self.stats["reused"] += 1
+                return conn
+
+    def release(self, conn):
+        try:
+            # 끝나지 않은 트랜잭션을 다음 사용자에게 넘기지 않는다.
+            conn.rollback()
+        except Exception:
+            self.stats["health_check_failed"] += 1
+            self._discard(conn)
+            return
+        if self._expired(conn) or self.closed:
+            self.stats["recycled"] += 1
+            self._discard(conn)
+            return
+        with self._cond:
+            self.in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn):
+        self._discard(conn)
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                **self.stats,
+            }
+
+    def close(self):
+        # 사용 중인 연결은 반납될 때 닫는다.
+        with self._cond:
+            self.closed = True
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            with self._cond:
+                self.in_use += 1
+            self._discard(conn)
+
+    def _take(self, deadline):
+        # 쉬고 있는 연결을 꺼내거나, 새로 열 자리를 잡는다. (새로 열어야 하면 None)
+        while True:
+            if self._idle:
+                self.in_use += 1
+                return self._idle.pop()
+            if self.size < self.max_size:
+                self.size += 1
+                self.in_use += 1
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats["timeouts"] += 1
+                raise PoolTimeout(
+                    f"no database connection available within {self.timeout}s"
+                )
+            self.waiting += 1
+            try:
+                self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+
+    def _create(self, connect=None):
+        try:
+            conn = (connect or self.connect)()
+        except Exception:
+            with self._cond:
+                self.size -= 1
+                self.in_use -= 1
+                self._cond.notify()
+            raise
+        self.stats["created"] += 1
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self.stats["closed"] += 1
+        with self._cond:
+            self.size -= 1
+            self.in_use -= 1
+            self._cond.notify()
+
+    def _expired(self, conn):
+        if self.max_lifetime is None:
+            return False
+        created_at = self._created_at.get(id(conn), 0)
+        return time.monotonic() - created_at >= self.max_lifetime
+
+    def _ping(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def _fill(self):
+        if self._filled:
+            return
+        with self._cond:
+            if self._filled:
+                return
+            self._filled = True
+            count = max(self.min_size - self.size, 0)
+            self.size += count
+            self.in_use += count
+        for _ in range(count):
+            self.release(self._create())
+
+
+def _params_key(conn_params):
+    return tuple(sorted((key, repr(value)) for key, value in conn_params.items()))
+
+
+def get_pool(alias, conn_params, connect, options):
+    # 연결 설정이 바뀌면 (ex. 테스트 DB 로 NAME 변경) 예전 DB 를 가리키는 풀을 닫고 새로 만든다.
+    key = _params_key(conn_params)
+    with _pools_lock:
+        current = _pools.get(alias)
+        if current is not None and current[0] == key:
+            return current[1]
+        pool = ConnectionPool(
+            connect,
+            min_size=options.get("MIN_SIZE", 0),
+            max_size=options.get("MAX_SIZE", 10),
+            max_lifetime=options.get("MAX_LIFETIME"),
+            timeout=options.get("TIMEOUT", 10),
+            health_check_after=options.get("HEALTH_CHECK_AFTER", 30),
+        )
+        _pools[alias] = (key, pool)
+    if current is not None:
+        current[1].close()
+    return pool
+
+
+def pool_metrics():
+    return {alias: pool.metrics() for alias, (_, pool) in _pools.items()}
+
+
+def close_pools():
+    with _pools_lock:
+        pools = [pool for _, pool in _pools.values()]
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# 기존 backend 의 DatabaseWrapper 앞에 섞어서, 연결을 닫는 대신 풀에 반납한다.
+# 풀 설정은 DATABASES 의 "POOL" 키로 받는다. (OPTIONS 는 드라이버 connect 인자로 넘어간다.)
+class PooledDatabaseWrapperMixin:
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        # 새 연결은 항상 지금 wrapper 의 연결 설정으로 연다.
+        def connect():
+            return super(PooledDatabaseWrapperMixin, self).get_new_connection(
+                conn_params
+            )
+
+        self.pool = get_pool(
+            self.alias, conn_params, connect, self.settings_dict.get("POOL", {})
+        )
+        return self.pool.acquire(connect)
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # atomic 블록 안에서 닫힌 연결은 wrapper 가 계속 들고 있으므로 풀에 돌려주지 않는다.
+                self.pool.discard(self.connection)
+            else:
+                self.pool.release(self.connection)
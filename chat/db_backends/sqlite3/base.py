@@ -0,0 +1,11 @@
+from django.db.backends.sqlite3 import base
+
+from chat.db_backends.pool import PooledDatabaseWrapperMixin
+
+
+# 로컬/테스트용. 메모리 DB 는 Django 가 연결을 닫지 않으므로 풀을 거치지 않는다.
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        if self.is_in_memory_db():
+            return base.DatabaseWrapper.get_new_connection(self, conn_params)
+        return super().get_new_connection(conn_params)
@@ -0,0 +1,73 @@
+import json
+
+import msgpack
+
+from chat.backends import get_backend
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 핸드셰이크에서 이 subprotocol 을 고른 클라이언트와는 바이너리(msgpack) 프레임으로 주고받는다.
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+
+class StdlibJSONEncoder:
+    def dumps(self, data):
+        return json.dumps(data)
+
+
+# orjson 이 설치되어 있을 때만 사용할 수 있다.
+class OrjsonEncoder:
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonEncoder requires the orjson package.")
+
+    def dumps(self, data):
+        return orjson.dumps(data).decode()
+
+
+def encode_frame(data):
+    return get_backend("CHAT_JSON_ENCODER").dumps(data)
+
+
+def encode_binary_frame(data):
+    return msgpack.packb(data)
+
+
+def to_binary_frame(text_frame):
+    # 미리 인코딩해 둔 JSON 프레임(과거 메시지, 채팅방 목록)을 msgpack 프레임으로 바꾼다.
+    return msgpack.packb(json.loads(text_frame))
+
+
+def encode_batch_frame(handler, frames):
+    # 미리 인코딩된 프레임들을 다시 인코딩하지 않고 {"type", "messages": [...]} 프레임으로 묶는다.
+    return '{"type": %s, "messages": [%s]}' % (json.dumps(handler), ",".join(frames))
+
+
+def encode_binary_batch_frame(handler, frames):
+    packer = msgpack.Packer()
+    return b"".join(
+        [
+            packer.pack_map_header(2),
+            packer.pack("type"),
+            packer.pack(handler),
+            packer.pack("messages"),
+            packer.pack_array_header(len(frames)),
+            *frames,
+        ]
+    )
+
+
+def decode_frame(text_data=None, bytes_data=None):
+    if bytes_data is not None:
+        return msgpack.unpackb(bytes_data)
+    return json.loads(text_data)
+
+
+def encode_event(handler, frame):
+    # 그룹 이벤트에는 JSON 프레임만 실어 channel layer 로 보내는 크기를 줄인다.
+    # 대부분인 JSON 클라이언트는 그대로 보내고, msgpack 클라이언트의 consumer 만 to_binary_frame 으로 바꾼다.
+    return {"type": handler, "text": encode_frame(frame)}
@@ -8,7 +8,18 @@ class LowerStrEnum(str, Enum):
 
 class MessageType(LowerStrEnum):
     CHAT_MESSAGE = auto()
+    CHAT_MESSAGES = auto()
     PAST_MESSAGE = auto()
+    PAST_MESSAGES = auto()
     SEND_CHATROOM_LIST = auto()
     UPDATE_LATEST_MSG = auto()
+    UPDATE_LATEST_MSGS = auto()
     SEND_USER_COUNT = auto()
+    LOAD_MORE = auto()
+    REQUEST_SNAPSHOT = auto()
+    LOAD_ROOMS = auto()
+    ROOM_CREATED = auto()
+    VISITOR_COUNT_CHANGED = auto()
+    RANK_CHANGED = auto()
+    GUEST_TOKEN = auto()
+    ERROR = auto()
@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_executor = None
+_lock = threading.Lock()
+
+
+# async ORM 으로 옮기지 못한 sync 경로(캐시 + DB, bulk upsert 등)를 실행하는 전용 executor.
+# 공유 executor(이벤트 루프 기본 / thread_sensitive 단일 스레드)를 다른 작업과 나눠 쓰지 않는다.
+def get_db_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.CHAT_DB_EXECUTOR_WORKERS,
+                    thread_name_prefix="chat-db",
+                )
+    return _executor
+
+
+def shutdown_db_executor():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+async def run_sync(func, *args, **kwargs):
+    # database_sync_to_async 처럼 스레드의 오래된 DB 연결을 정리한다.
+    return await database_sync_to_async(
+        func, thread_sensitive=False, executor=get_db_executor()
+    )(*args, **kwargs)
+
+
+@receiver(setting_changed)
+def _reset_executor(*, setting, **kwargs):
+    if setting == "CHAT_DB_EXECUTOR_WORKERS":
+        shutdown_db_executor()
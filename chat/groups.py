@@ -0,0 +1,66 @@
+import asyncio
+import zlib
+
+from channels.layers import DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from chat.encoding import encode_event
+
+
+# 하나의 논리 그룹을 CHAT_GROUP_SHARDS 개의 하위 그룹으로 나눈다.
+# 멤버는 channel_name 해시로 한 shard 에만 들어가고, 전송은 모든 shard 로 동시에 보낸다.
+def group_shards(group):
+    kind = group.split("_", 1)[0]
+    return settings.CHAT_GROUP_SHARDS.get(kind, 1)
+
+
+def shard_group_name(group, channel_name):
+    shards = group_shards(group)
+    if shards <= 1:
+        return group
+    return f"{group}.{zlib.crc32(channel_name.encode()) % shards}"
+
+
+def shard_group_names(group):
+    shards = group_shards(group)
+    if shards <= 1:
+        return [group]
+    return [f"{group}.{shard}" for shard in range(shards)]
+
+
+async def group_add(channel_layer, group, channel_name):
+    await channel_layer.group_add(shard_group_name(group, channel_name), channel_name)
+
+
+async def group_discard(channel_layer, group, channel_name):
+    await channel_layer.group_discard(
+        shard_group_name(group, channel_name), channel_name
+    )
+
+
+async def group_send(channel_layer, group, message):
+    shards = shard_group_names(group)
+    if len(shards) == 1:
+        await channel_layer.group_send(shards[0], message)
+        return
+    await asyncio.gather(
+        *(channel_layer.group_send(shard, message) for shard in shards)
+    )
+
+
+# 설정된 layer 와 같은 backend/서버를 쓰고 키 prefix 만 다른 인스턴스 (벤치마크용)
+# flush() 는 이 prefix 의 키만 지우므로 운영 중인 layer 의 채널/그룹은 건드리지 않는다.
+# InMemoryChannelLayer 는 인스턴스마다 따로 저장하므로 새로 만들기만 한다.
+def isolated_channel_layer(prefix, alias=DEFAULT_CHANNEL_LAYER):
+    config = settings.CHANNEL_LAYERS[alias]
+    backend = import_string(config["BACKEND"])
+    options = dict(config.get("CONFIG", {}))
+    if not issubclass(backend, InMemoryChannelLayer):
+        options["prefix"] = prefix
+    return backend(**options)
+
+
+async def broadcast_frame(channel_layer, group, handler, frame):
+    # 프레임을 보내는 쪽에서 한번만 인코딩하고, 받는 consumer 는 그대로 전달한다.
+    await group_send(channel_layer, group, encode_event(handler, frame))
@@ -0,0 +1,49 @@
+import secrets
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Q
+
+User = get_user_model()
+
+GUEST_TOKEN_SALT = "chat.guest"
+
+
+# DB 행 없이 서명된 토큰으로만 식별하는 익명 유저. 메시지를 보낼 때만 User 행을 만든다.
+class Guest:
+    pk = None
+    is_authenticated = False
+    is_guest = True
+
+    def __init__(self, username):
+        self.username = username
+
+    @property
+    def visitor_id(self):
+        return f"guest:{self.username}"
+
+    @property
+    def token(self):
+        # 접속할 때마다 새로 서명해 만료 시각을 뒤로 민다.
+        return signing.dumps(self.username, salt=GUEST_TOKEN_SALT)
+
+
+def issue_guest():
+    return Guest(f"guest-{secrets.token_hex(8)}")
+
+
+def load_guest(token):
+    try:
+        username = signing.loads(
+            token, salt=GUEST_TOKEN_SALT, max_age=settings.CHAT_GUEST_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    return Guest(username)
+
+
+def temp_users():
+    # 게스트 토큰 이전에 접속마다 만들던 임시 유저 (uuid 8자리, 해싱되지 않은 비밀번호)
+    legacy = Q(username__regex=r"^[0-9a-f]{8}$", password="1234")
+    return User.objects.filter(legacy | Q(is_guest=True))
@@ -0,0 +1,182 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+
+from chat.backends import get_backend
+from chat.encoding import encode_frame
+from chat.enums import MessageType
+from chat.models import ArchivedMessage, Message
+
+
+# 채팅방별 최근 메시지를 인코딩된 상태로 보관하는 링버퍼.
+# django-redis 캐시면 redis list 명령으로 원자적으로 갱신하고, 그 외 캐시(locmem 등)는 get/set 으로 갱신한다.
+class CacheHistoryBuffer:
+    def __init__(self, cache="default", size=200, timeout=60 * 60 * 24):
+        self.cache_alias = cache
+        self.size = size
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, room_id):
+        return f"chat:history:{room_id}"
+
+    def _redis(self):
+        if not type(self.cache).__module__.startswith("django_redis"):
+            return None
+        from django_redis import get_redis_connection
+
+        return get_redis_connection(self.cache_alias)
+
+    def push(self, room_id, message_id, entry):
+        redis = self._redis()
+        if redis is not None:
+            key = self.cache.make_key(self._key(room_id))
+            # 버퍼가 없는 방은 채우지 않는다. (비어있는 버퍼가 전체 이력으로 오인되지 않도록)
+            with redis.pipeline() as pipe:
+                pipe.lpushx(key, f"{message_id}:{entry}")
+                pipe.ltrim(key, 0, self.size - 1)
+                pipe.execute()
+            return
+
+        items = self.cache.get(self._key(room_id))
+        if items is not None:
+            items.insert(0, (message_id, entry))
+            self.cache.set(self._key(room_id), items[: self.size], self.timeout)
+
+    def warm(self, room_id, items):
+        redis = self._redis()
+        if redis is not None:
+            key = self.cache.make_key(self._key(room_id))
+            with redis.pipeline() as pipe:
+                pipe.delete(key)
+                # 빈 방도 캐시 히트가 되도록 센티널을 넣어둔다.
+                pipe.rpush(key, *[f"{id_}:{entry}" for id_, entry in items], "")
+                pipe.expire(key, self.timeout)
+                pipe.execute()
+            return
+
+        self.cache.set(self._key(room_id), list(items), self.timeout)
+
+    def invalidate(self, room_id):
+        self.cache.delete(self._key(room_id))
+
+    def page(self, room_id, before_id=None, limit=None):
+        # 버퍼로 응답할 수 없으면 (캐시 미스, 버퍼보다 깊은 스크롤) None 을 반환한다.
+        limit = limit or settings.CHAT_HISTORY_PAGE_SIZE
+        items = self._read(room_id)
+        if items is None:
+            return None
+
+        complete = len(items) < self.size
+        results, last_id = [], None
+        for id_, entry in items:
+            # warm 과 push 가 겹치면 같은 메시지가 두 번 들어갈 수 있다.
+            if last_id is not None and id_ >= last_id:
+                continue
+            last_id = id_
+            if before_id is not None and id_ >= before_id:
+                continue
+            results.append(entry)
+            if len(results) == limit:
+                return results
+        return results if complete else None
+
+    def _read(self, room_id):
+        redis = self._redis()
+        if redis is None:
+            return self.cache.get(self._key(room_id))
+
+        raw = redis.lrange(self.cache.make_key(self._key(room_id)), 0, self.size)
+        if not raw:
+            return None
+        items = []
+        for value in raw:
+            id_, sep, entry = value.decode().partition(":")
+            if sep:
+                items.append((int(id_), entry))
+        return items
+
+
+def get_history_buffer():
+    return get_backend("CHAT_HISTORY_BUFFER")
+
+
+def fetch_history_page(room_id, before_id=None, limit=None, using=None):
+    # hot 테이블에서 모자란 만큼 archive 테이블에서 이어서 읽는다. (archive 쪽 id 가 항상 더 작다.)
+    limit = limit or settings.CHAT_HISTORY_PAGE_SIZE
+    messages = _fetch_page(Message, room_id, before_id, limit, using)
+    if len(messages) < limit:
+        oldest_id = messages[-1].id if messages else before_id
+        messages += _fetch_page(
+            ArchivedMessage, room_id, oldest_id, limit - len(messages), using
+        )
+    return messages
+
+
+def _fetch_page(model, room_id, before_id, limit, using=None):
+    queryset = model.objects.using(using).filter(room_id=room_id)
+    if before_id is not None:
+        queryset = queryset.filter(id__lt=before_id)
+    return list(queryset.select_related("user").order_by("-id")[:limit])
+
+
+def load_history_entries(room_id, before_id=None, limit=None):
+    limit = limit or settings.CHAT_HISTORY_PAGE_SIZE
+    buffer = get_history_buffer()
+    entries = buffer.page(room_id, before_id=before_id, limit=limit)
+    if entries is not None:
+        return entries
+
+    if before_id is not None:
+        messages = fetch_history_page(room_id, before_id=before_id, limit=limit)
+        return [encode_history_entry(message) for message in messages]
+
+    # 버퍼는 모든 연결이 공유하므로 replica 지연으로 빠진 메시지가 캐시되지 않도록 primary 에서 읽는다.
+    db = router.db_for_write(Message)
+    messages = fetch_history_page(room_id, limit=max(limit, buffer.size), using=db)
+    items = [(message.id, encode_history_entry(message)) for message in messages]
+    buffer.warm(room_id, items)
+    # warm 하는 사이에 저장된 메시지는 push 가 유실됐을 수 있으므로 버퍼를 버린다.
+    latest_id = items[0][0] if items else 0
+    if Message.objects.using(db).filter(room_id=room_id, id__gt=latest_id).exists():
+        buffer.invalidate(room_id)
+    return [entry for _, entry in items[:limit]]
+
+
+def encode_history_entry(message):
+    return encode_frame(
+        {
+            "id": message.id,
+            "message": message.content,
+            "username": message.user.username,
+        }
+    )
+
+
+def build_legacy_history_frame(entry):
+    # v1 클라이언트용 past_message 프레임. 인코딩된 엔트리 앞에 type 만 붙인다.
+    return f'{{"type": "{MessageType.PAST_MESSAGE.value}", {entry[1:]}'
+
+
+def build_history_frames(entries, max_bytes=None):
+    # 인코딩된 메시지들을 past_messages 프레임으로 묶는다.
+    # 프레임 크기(UTF-8 바이트)가 max_bytes 를 넘지 않도록 나누되, 메시지 하나가 더 크면 단독 프레임이 된다.
+    # (orjson 은 한글을 이스케이프하지 않아 글자 수보다 바이트 수가 최대 3배 크다.)
+    max_bytes = max_bytes or settings.CHAT_HISTORY_FRAME_MAX_BYTES
+    head = f'{{"type": "{MessageType.PAST_MESSAGES.value}", "messages": ['
+    tail = "]}"
+
+    frames, chunk, size = [], [], len(head) + len(tail)
+    for entry in entries:
+        entry_size = len(entry.encode())
+        if chunk and size + entry_size + 2 > max_bytes:
+            frames.append(head + ", ".join(chunk) + tail)
+            chunk, size = [], len(head) + len(tail)
+        chunk.append(entry)
+        size += entry_size + 2
+    if chunk:
+        frames.append(head + ", ".join(chunk) + tail)
+    return frames
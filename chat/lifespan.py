@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import sys
+
+from chat.lobby import latest_message_coalescer
+from chat.persistence import message_writer
+from chat.search import search_indexer
+
+logger = logging.getLogger(__name__)
+
+
+# 서버 종료 전에 이벤트 루프에서 모아둔 메시지를 저장하고 채팅방 목록 갱신과 검색 색인을 마친다.
+async def shutdown():
+    await message_writer.close()
+    await latest_message_coalescer.close()
+    await search_indexer.close()
+
+
+# ASGI lifespan 을 지원하는 서버(uvicorn 등)용
+class LifespanApp:
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    await shutdown()
+                except Exception:
+                    logger.exception("failed to flush chat buffers on shutdown")
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+# daphne 은 lifespan 을 보내지 않으므로 twisted reactor 가 멈추기 전(before shutdown)에 실행한다.
+def register_daphne_shutdown():
+    if "twisted.internet.reactor" not in sys.modules:
+        return
+    from twisted.internet import defer, reactor
+
+    reactor.addSystemEventTrigger(
+        "before",
+        "shutdown",
+        lambda: defer.Deferred.fromFuture(asyncio.ensure_future(shutdown())),
+    )
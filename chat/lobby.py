@@ -0,0 +1,254 @@
+import asyncio
+import threading
+from collections import Counter, OrderedDict
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import caches
+
+from chat.const import NO_MSG, SYSTEM
+from chat.encoding import encode_binary_frame, encode_event, encode_frame
+from chat.enums import MessageType
+from chat.executor import run_sync
+from chat.groups import group_send
+from chat.models import ChatRoom
+from chat.ranking import get_room_ranking
+from chat.visitors import get_visitor_counter
+
+LOBBY_GROUP = "chatroom"
+
+SNAPSHOT_KEY = "chat:lobby:snapshot"
+BINARY_SNAPSHOT_KEY = "chat:lobby:snapshot:msgpack"
+VERSION_KEY = "chat:lobby:version"
+
+_build_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.CHAT_LOBBY_CACHE]
+
+
+def current_lobby_version():
+    return _cache().get(VERSION_KEY, 0)
+
+
+def next_lobby_version():
+    cache = _cache()
+    cache.add(VERSION_KEY, 0, None)
+    return cache.incr(VERSION_KEY)
+
+
+def get_room_rank(room_id):
+    # 채팅방 목록(방문자 수 내림차순)에서의 위치 (0부터)
+    return get_room_ranking().rank(room_id)
+
+
+def encode_cursor(score, room_id):
+    return f"{score}:{room_id}"
+
+
+def parse_cursor(cursor):
+    # 다음 페이지 cursor 는 이전 페이지 마지막 채팅방의 "score:room_id" 이다.
+    # 없으면 첫 페이지(None), 형식이 잘못되면 ValueError
+    if cursor is None or cursor == "":
+        return None
+    score, sep, room_id = str(cursor).partition(":")
+    if not sep:
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return int(score), int(room_id)
+
+
+def build_chatroom_page(after=None, limit=None):
+    # 순위에서 after 다음 limit 개 채팅방과 다음 페이지 cursor 를 반환한다.
+    limit = limit or settings.CHAT_LOBBY_PAGE_SIZE
+    items = get_room_ranking().page(after, limit + 1)
+    page = items[:limit]
+    room_ids = [room_id for _, room_id in page]
+    chatrooms = {
+        id_: (name, message, username)
+        for id_, name, message, username in ChatRoom.objects.filter(
+            id__in=room_ids
+        ).values_list("id", "name", "latest_message_preview", "latest_message_username")
+    }
+    visitor_counts = get_visitor_counter().counts(room_ids)
+    results = OrderedDict()
+    for id_ in room_ids:
+        if id_ not in chatrooms:
+            continue
+        name, message, username = chatrooms[id_]
+        results[str(id_)] = {
+            "chatroom_id": id_,
+            "name": name,
+            "visitor_count": visitor_counts[id_],
+            "latest_message": {
+                "message": message or NO_MSG,
+                "username": username or SYSTEM,
+            },
+        }
+    next_cursor = encode_cursor(*page[-1]) if len(items) > limit else None
+    return results, next_cursor
+
+
+def build_chatroom_list_frame(after=None, binary=False, version=None):
+    # 버전을 먼저 읽어야 스냅샷 이후의 delta 를 클라이언트가 놓치지 않는다.
+    if version is None:
+        version = current_lobby_version()
+    results, next_cursor = build_chatroom_page(after)
+    encode = encode_binary_frame if binary else encode_frame
+    return encode(
+        {
+            "type": MessageType.SEND_CHATROOM_LIST,
+            "version": version,
+            "results": results,
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+def get_chatroom_list_frame(after=None, binary=False):
+    # 첫 페이지는 인코딩된 프레임을 형식별로 캐시에서 공유하고, TTL 이 지나거나 무효화되면 다시 만든다.
+    if after is not None:
+        return build_chatroom_list_frame(after, binary)
+
+    key = BINARY_SNAPSHOT_KEY if binary else SNAPSHOT_KEY
+    frame = _cache().get(key)
+    if frame is not None:
+        return frame
+
+    with _build_lock:
+        frame = _cache().get(key)
+        if frame is None:
+            version = current_lobby_version()
+            frame = build_chatroom_list_frame(binary=binary, version=version)
+            # 만드는 동안 delta 가 나갔으면 그 변경이 빠졌을 수 있으므로 이번 응답에만 쓰고 캐시하지 않는다.
+            if current_lobby_version() == version:
+                _cache().set(key, frame, settings.CHAT_LOBBY_SNAPSHOT_TTL)
+    return frame
+
+
+def refresh_room_ranking(batch_size=1000):
+    # 방문 기록이 기간을 벗어나 줄어든 방문자 수를 순위에 반영한다. (주기적으로 실행)
+    last_id = 0
+    while True:
+        room_ids = list(
+            ChatRoom.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not room_ids:
+            break
+        last_id = room_ids[-1]
+        get_room_ranking().update_many(get_visitor_counter().counts(room_ids))
+    invalidate_chatroom_list()
+
+
+def invalidate_chatroom_list():
+    _cache().delete_many([SNAPSHOT_KEY, BINARY_SNAPSHOT_KEY])
+
+
+def build_lobby_delta(delta_type, **fields):
+    # delta 마다 버전을 올리고, 이전 버전의 스냅샷은 버린다.
+    invalidate_chatroom_list()
+    frame = {"type": delta_type, "version": next_lobby_version(), **fields}
+    return encode_event(delta_type, frame)
+
+
+async def publish_lobby_delta(delta_type, **fields):
+    event = await run_sync(build_lobby_delta, delta_type, **fields)
+    await group_send(get_channel_layer(), LOBBY_GROUP, event)
+
+
+def _visitor_count_deltas(room_id):
+    cache = _cache()
+    deltas = []
+
+    visitor_count = get_visitor_counter().count(room_id)
+    if cache.get(f"chat:lobby:visitor_count:{room_id}") != visitor_count:
+        cache.set(f"chat:lobby:visitor_count:{room_id}", visitor_count, None)
+        deltas.append(
+            (
+                MessageType.VISITOR_COUNT_CHANGED,
+                {"chatroom_id": room_id, "visitor_count": visitor_count},
+            )
+        )
+
+    rank = get_room_rank(room_id)
+    if cache.get(f"chat:lobby:rank:{room_id}") != rank:
+        cache.set(f"chat:lobby:rank:{room_id}", rank, None)
+        deltas.append(
+            (MessageType.RANK_CHANGED, {"chatroom_id": room_id, "rank": rank})
+        )
+    return deltas
+
+
+async def publish_visitor_count(room_id):
+    for delta_type, fields in await run_sync(_visitor_count_deltas, room_id):
+        await publish_lobby_delta(delta_type, **fields)
+
+
+# 채팅방별 마지막 메시지 변경을 최대 하나만 들고 있다가 CHAT_LOBBY_COALESCE_INTERVAL_MS 마다 한 프레임으로 보낸다.
+# 보낼 변경이 없으면 task 를 끝내고, 다음 변경이 들어오면 다시 시작한다.
+class LatestMessageCoalescer:
+    def __init__(self):
+        self.pending = {}
+        self.stats = Counter()
+        self._loop = None
+        self._task = None
+        self._lock = None
+
+    async def add(self, chatroom_id, message, username):
+        if not settings.CHAT_LOBBY_COALESCE_INTERVAL_MS:
+            await publish_lobby_delta(
+                MessageType.UPDATE_LATEST_MSG,
+                message=message,
+                username=username,
+                chatroom_id=chatroom_id,
+            )
+            return
+
+        self._bind_loop()
+        self.stats["queued"] += 1
+        if chatroom_id in self.pending:
+            self.stats["coalesced"] += 1
+        self.pending[chatroom_id] = {
+            "chatroom_id": chatroom_id,
+            "message": message,
+            "username": username,
+        }
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+
+    async def flush(self):
+        self._bind_loop()
+        async with self._lock:
+            if not self.pending:
+                return
+            messages, self.pending = list(self.pending.values()), {}
+            self.stats["flushes"] += 1
+            self.stats["flushed"] += len(messages)
+            await publish_lobby_delta(MessageType.UPDATE_LATEST_MSGS, messages=messages)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._loop is not None:
+            await self.flush()
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.CHAT_LOBBY_COALESCE_INTERVAL_MS / 1000)
+            await self.flush()
+            if not self.pending:
+                self.stats["idle_stops"] += 1
+                return
+
+
+latest_message_coalescer = LatestMessageCoalescer()
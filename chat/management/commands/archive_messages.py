@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from chat.archive import archive_cutoff, archive_messages
+
+
+class Command(BaseCommand):
+    help = (
+        "CHAT_MESSAGE_HOT_DAYS(--days) 보다 오래된 메시지를 archive 테이블로 옮깁니다. "
+        "(주기적으로 실행)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--pause", type=float, default=0.1)
+
+    def handle(self, *args, days, batch_size, pause, **options):
+        archived = archive_messages(
+            archive_cutoff(days), batch_size=batch_size, pause=pause
+        )
+        self.stdout.write(self.style.SUCCESS(f"{archived} messages archived"))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from chat.const import LATEST_MESSAGE_PREVIEW_LENGTH
+from chat.models import ChatRoom, Message
+
+
+class Command(BaseCommand):
+    help = "채팅방 목록용 마지막 메시지 요약(ChatRoom.latest_message_*)을 기존 데이터로 채웁니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        last_id, updated = 0, 0
+        while True:
+            room_ids = list(
+                ChatRoom.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not room_ids:
+                break
+            last_id = room_ids[-1]
+            updated += self._backfill(room_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} chatrooms updated"))
+
+    def _backfill(self, room_ids):
+        latest_ids = (
+            Message.objects.filter(room_id__in=room_ids)
+            .values("room_id")
+            .annotate(latest_id=Max("id"))
+            .values_list("latest_id", flat=True)
+        )
+        messages = {
+            message.room_id: message
+            for message in Message.objects.filter(
+                id__in=list(latest_ids)
+            ).select_related("user")
+        }
+        rooms = list(ChatRoom.objects.filter(id__in=messages))
+        for room in rooms:
+            message = messages[room.id]
+            room.latest_message_id = message.id
+            room.latest_message_preview = message.content[
+                :LATEST_MESSAGE_PREVIEW_LENGTH
+            ]
+            room.latest_message_username = message.user.username
+            room.latest_message_at = message.created_at
+        return ChatRoom.objects.bulk_update(
+            rooms,
+            [
+                "latest_message_id",
+                "latest_message_preview",
+                "latest_message_username",
+                "latest_message_at",
+            ],
+        )
@@ -0,0 +1,57 @@
+import asyncio
+import statistics
+import time
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from chat.enums import MessageType
+from chat_project.asgi import application
+
+
+class Command(BaseCommand):
+    help = (
+        "게스트 클라이언트들이 한 채팅방에 동시에 (재)접속할 때 "
+        "클라이언트가 접속 인원 응답까지 받는 지연 시간을 측정합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("room_id", type=int)
+        parser.add_argument("--clients", type=int, default=200)
+        parser.add_argument("--rounds", type=int, default=3)
+
+    def handle(self, *args, room_id, clients, rounds, **options):
+        self.stdout.write(f"{'round':>5} {'p50(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9}")
+        tokens = [None] * clients
+        for round_no in range(rounds):
+            # 첫 라운드에 받은 게스트 토큰으로 재접속한다.
+            results = asyncio.run(self._storm(room_id, tokens))
+            latencies = sorted(latency for latency, _ in results)
+            tokens = [token for _, token in results]
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"{round_no:>5} {statistics.median(latencies):>9.1f} "
+                f"{p99:>9.1f} {latencies[-1]:>9.1f}"
+            )
+
+    async def _storm(self, room_id, tokens):
+        return await asyncio.gather(
+            *(self._connect(room_id, token) for token in tokens)
+        )
+
+    async def _connect(self, room_id, token):
+        path = f"/room/{room_id}/chat/" + (f"?guest={token}" if token else "")
+        communicator = WebsocketCommunicator(application, path)
+        started = time.perf_counter()
+        connected, _ = await communicator.connect(timeout=30)
+        if not connected:
+            raise RuntimeError(f"failed to connect to room {room_id}")
+        while True:
+            response = await communicator.receive_json_from(timeout=30)
+            if response.get("type") == MessageType.GUEST_TOKEN:
+                token = response["token"]
+            elif response.get("type") == MessageType.SEND_USER_COUNT:
+                break
+        latency = (time.perf_counter() - started) * 1000
+        await communicator.disconnect()
+        return latency, token
@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.utils import ConnectionHandler
+
+from chat.db_backends.pool import close_pools, pool_metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "DB 연결 풀 사용 여부에 따른 초당 쿼리 수를 측정합니다. "
+        "(쿼리마다 연결을 닫는 ASGI 경로를 흉내낸다.)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--queries", type=int, default=2_000)
+        parser.add_argument("--threads", type=int, default=8)
+
+    def handle(self, *args, database, queries, threads, **options):
+        config = settings.DATABASES[database]
+        vendor = config["ENGINE"].rsplit(".", 1)[-1]
+        engines = {
+            "direct": f"django.db.backends.{vendor}",
+            "pooled": f"chat.db_backends.{vendor}",
+        }
+
+        self.stdout.write(f"{'mode':>8} {'qps':>10}")
+        for mode, engine in engines.items():
+            alias = f"bench_{mode}"
+            handler = ConnectionHandler(
+                {
+                    "default": {"ENGINE": "django.db.backends.dummy"},
+                    alias: {**config, "ENGINE": engine},
+                }
+            )
+            qps = self._bench(alias, handler, queries, threads)
+            self.stdout.write(f"{mode:>8} {qps:>10.0f}")
+
+        self.stdout.write(f"pool metrics: {pool_metrics().get('bench_pooled')}")
+        close_pools()
+
+    def _bench(self, alias, handler, queries, threads):
+        def run(count):
+            for _ in range(count):
+                with handler[alias].cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                handler[alias].close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [
+                executor.submit(run, queries // threads) for _ in range(threads)
+            ]:
+                future.result()
+        return queries // threads * threads / (time.perf_counter() - started)
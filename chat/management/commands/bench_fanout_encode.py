@@ -0,0 +1,91 @@
+import asyncio
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from chat.encoding import encode_event, encode_frame, orjson
+from chat.groups import group_add, group_send, isolated_channel_layer
+
+ENCODERS = {
+    "json": "chat.encoding.StdlibJSONEncoder",
+    "orjson": "chat.encoding.OrjsonEncoder",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "설정된 channel layer 로 그룹 팬아웃을 보내고 받는 consumer 마다 인코딩할 때와 "
+        "보내는 쪽에서 한번만 인코딩할 때의 메시지당 CPU/전체 시간을 측정합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--receivers", type=int, nargs="+", default=[10, 100, 1_000]
+        )
+        parser.add_argument(
+            "--lengths",
+            type=int,
+            nargs="+",
+            default=[20, 200, 2_000],
+            help="메시지 글자 수 (한글)",
+        )
+        parser.add_argument("--messages", type=int, default=50)
+
+    def handle(self, *args, receivers, lengths, messages, **options):
+        encoders = ["json"] + (["orjson"] if orjson is not None else [])
+        self.stdout.write(
+            f"{'encoder':>8} {'length':>6} {'receivers':>9} "
+            f"{'per-recv cpu/wall(ms)':>22} {'once cpu/wall(ms)':>18}"
+        )
+        for name in encoders:
+            with override_settings(CHAT_JSON_ENCODER={"BACKEND": ENCODERS[name]}):
+                for length in lengths:
+                    for receiver_count in receivers:
+                        per_receiver, once = asyncio.run(
+                            self._bench(receiver_count, length, messages)
+                        )
+                        self.stdout.write(
+                            f"{name:>8} {length:>6} {receiver_count:>9} "
+                            f"{per_receiver[0]:>10.2f}/{per_receiver[1]:<11.2f} "
+                            f"{once[0]:>8.2f}/{once[1]:<9.2f}"
+                        )
+
+    async def _bench(self, receiver_count, length, messages):
+        # 운영 중인 layer 의 키를 지우지 않도록 벤치마크 전용 prefix 를 쓴다.
+        channel_layer = isolated_channel_layer(f"bench:{uuid.uuid4().hex}")
+        group = f"bench_{receiver_count}_{length}"
+        channels = [f"{group}.member-{i}" for i in range(receiver_count)]
+        for channel in channels:
+            await group_add(channel_layer, group, channel)
+        frame = {"message": ("안녕하세요 " * length)[:length], "username": "bench-user"}
+
+        # 받는 consumer 마다 이벤트의 필드로 프레임을 만들어 인코딩한다.
+        async def per_receiver():
+            await group_send(channel_layer, group, {"type": "chat.message", **frame})
+            for channel in channels:
+                event = await channel_layer.receive(channel)
+                encode_frame(
+                    {"message": event["message"], "username": event["username"]}
+                )
+
+        # 보내는 쪽에서 한번 인코딩하고, 받는 consumer 는 그대로 보낸다.
+        async def once():
+            await group_send(channel_layer, group, encode_event("chat.message", frame))
+            for channel in channels:
+                (await channel_layer.receive(channel))["text"]
+
+        results = [await self._measure(send, messages) for send in (per_receiver, once)]
+        # 이 prefix 의 키 (벤치마크 그룹) 만 지운다.
+        await channel_layer.flush()
+        return results
+
+    async def _measure(self, fanout, messages):
+        cpu, wall = time.process_time(), time.perf_counter()
+        for _ in range(messages):
+            await fanout()
+        return (
+            (time.process_time() - cpu) / messages * 1_000,
+            (time.perf_counter() - wall) / messages * 1_000,
+        )
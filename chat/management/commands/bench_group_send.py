@@ -0,0 +1,52 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from chat.groups import group_add, group_send, isolated_channel_layer
+
+
+class Command(BaseCommand):
+    help = (
+        "설정된 channel layer 로 멤버 수/shard 수별 group_send 지연 시간을 측정합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--members", type=int, nargs="+", default=[1_000, 10_000, 50_000]
+        )
+        parser.add_argument("--shards", type=int, nargs="+", default=[1, 8])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, members, shards, repeat, **options):
+        self.stdout.write(f"{'members':>8} {'shards':>6} {'avg(ms)':>9} {'max(ms)':>9}")
+        for member_count in members:
+            for shard_count in shards:
+                with override_settings(CHAT_GROUP_SHARDS={"bench": shard_count}):
+                    latencies = asyncio.run(self._bench(member_count, repeat))
+                self.stdout.write(
+                    f"{member_count:>8} {shard_count:>6} "
+                    f"{statistics.mean(latencies):>9.2f} {max(latencies):>9.2f}"
+                )
+
+    async def _bench(self, member_count, repeat):
+        # 운영 중인 layer 의 키를 지우지 않도록 벤치마크 전용 prefix 를 쓴다.
+        channel_layer = isolated_channel_layer(f"bench:{uuid.uuid4().hex}")
+        group = f"bench_{member_count}"
+        for i in range(member_count):
+            await group_add(channel_layer, group, f"{group}.member-{i}")
+
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await group_send(channel_layer, group, {"type": "bench.message"})
+            latencies.append((time.perf_counter() - started) * 1000)
+            # 채널 용량이 차서 메시지가 버려지지 않도록 매번 비운다. (이 prefix 의 키만 지운다.)
+            await channel_layer.flush()
+            for i in range(member_count):
+                await group_add(channel_layer, group, f"{group}.member-{i}")
+        await channel_layer.flush()
+        return latencies
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from chat.models import ChatRoom
+from chat.visitors import check_visitor_counts, rebuild_visitor_counts
+
+
+class Command(BaseCommand):
+    help = "최근 방문자 카운터를 ChatRoomVisit SQL 집계와 비교합니다. (--rebuild 시 SQL 기준으로 다시 채웁니다.)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--minutes", type=int, default=None)
+        parser.add_argument("--rebuild", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, minutes, rebuild, batch_size, **options):
+        room_ids = list(ChatRoom.objects.order_by("id").values_list("id", flat=True))
+        mismatched = 0
+        for i in range(0, len(room_ids), batch_size):
+            batch = room_ids[i : i + batch_size]
+            if rebuild:
+                rebuild_visitor_counts(batch)
+            for room_id, (counted, expected) in check_visitor_counts(
+                batch, minutes=minutes
+            ).items():
+                mismatched += 1
+                self.stdout.write(f"room {room_id}: counter={counted} sql={expected}")
+
+        if mismatched:
+            self.stdout.write(self.style.WARNING(f"{mismatched} chatrooms mismatched"))
+        else:
+            self.stdout.write(self.style.SUCCESS("visitor counts are consistent"))
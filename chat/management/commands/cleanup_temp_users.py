@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from chat.guests import temp_users
+
+
+class Command(BaseCommand):
+    help = (
+        "메시지를 남기지 않은 임시/게스트 유저를 배치로 삭제합니다. "
+        "(메시지를 남긴 유저는 히스토리를 위해 남겨둔다.)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        last_id, deleted = 0, 0
+        while True:
+            user_ids = list(
+                temp_users()
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            unused = temp_users().filter(
+                id__in=user_ids,
+                messages__isnull=True,
+                archived_messages__isnull=True,
+            )
+            if dry_run:
+                deleted += unused.count()
+            else:
+                deleted += unused.delete()[1].get(unused.model._meta.label, 0)
+
+        verb = "would be deleted" if dry_run else "deleted"
+        self.stdout.write(self.style.SUCCESS(f"{deleted} temp users {verb}"))
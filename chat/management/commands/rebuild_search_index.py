@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from chat.models import ArchivedMessage, Message
+from chat.search import index_messages
+
+
+class Command(BaseCommand):
+    help = (
+        "메시지 검색 역색인을 기존 메시지(hot + archive)로 채웁니다. "
+        "(이미 색인된 메시지는 건너뛴다.)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        indexed = 0
+        for model in (ArchivedMessage, Message):
+            last_id = 0
+            while True:
+                messages = list(
+                    model.objects.filter(id__gt=last_id)
+                    .order_by("id")
+                    .only("id", "room_id", "content")[:batch_size]
+                )
+                if not messages:
+                    break
+                last_id = messages[-1].id
+                index_messages(messages)
+                indexed += len(messages)
+
+        self.stdout.write(self.style.SUCCESS(f"{indexed} messages indexed"))
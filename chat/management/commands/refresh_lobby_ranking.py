@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from chat.lobby import refresh_room_ranking
+
+
+class Command(BaseCommand):
+    help = "모든 채팅방의 최근 방문자 수로 채팅방 목록 순위를 다시 계산합니다. (주기적으로 실행)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        refresh_room_ranking(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS("lobby ranking refreshed"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0005_message_room_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatroom",
+            name="latest_message_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="latest_message_id",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="latest_message_preview",
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="latest_message_username",
+            field=models.CharField(max_length=225, null=True),
+        ),
+    ]
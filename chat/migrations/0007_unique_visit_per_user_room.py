@@ -0,0 +1,47 @@
+# Generated by Django 5.1 on 2026-10-18 02:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_visits(apps, schema_editor):
+    # (user, room) 마다 가장 최근 방문 기록 하나만 남긴다.
+    ChatRoomVisit = apps.get_model("chat", "ChatRoomVisit")
+    duplicated = (
+        ChatRoomVisit.objects.values("user_id", "room_id")
+        .annotate(visit_count=Count("id"))
+        .filter(visit_count__gt=1)
+        .values_list("user_id", "room_id")
+    )
+    for user_id, room_id in duplicated.iterator():
+        visit_ids = list(
+            ChatRoomVisit.objects.filter(user_id=user_id, room_id=room_id)
+            .order_by("-last_visited_at", "-id")
+            .values_list("id", flat=True)
+        )
+        ChatRoomVisit.objects.filter(id__in=visit_ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_chatroom_latest_message_summary"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_visits, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="chatroomvisit",
+            index=models.Index(
+                fields=["room", "last_visited_at"], name="visit_room_last_visited_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="chatroomvisit",
+            constraint=models.UniqueConstraint(
+                fields=("user", "room"), name="unique_visit_per_user_room"
+            ),
+        ),
+    ]
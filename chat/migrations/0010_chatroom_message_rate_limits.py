@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0009_messageterm"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatroom",
+            name="room_message_burst",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="room_message_rate",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="user_message_burst",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="user_message_rate",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
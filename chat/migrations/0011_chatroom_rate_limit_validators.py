@@ -0,0 +1,62 @@
+# Generated by Django 5.1 on 2026-10-18 03:29
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0010_chatroom_message_rate_limits"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chatroom",
+            name="room_message_burst",
+            field=models.PositiveIntegerField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(1000),
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatroom",
+            name="room_message_rate",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(0.01),
+                    django.core.validators.MaxValueValidator(1000),
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatroom",
+            name="user_message_burst",
+            field=models.PositiveIntegerField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(1000),
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatroom",
+            name="user_message_rate",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(0.01),
+                    django.core.validators.MaxValueValidator(1000),
+                ],
+            ),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from datetime import datetime, timedelta
 
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import connections, models, router
 
+from chat.const import (LATEST_MESSAGE_PREVIEW_LENGTH, MAX_MESSAGE_BURST,
+                        MAX_MESSAGE_RATE, MIN_MESSAGE_RATE)
 from chat_project import settings
 from chat_project.helpers import SEOUL_TZ
 
@@ -11,12 +14,101 @@ class ChatRoom(models.Model):
     name = models.fields.CharField(max_length=255)
     created_at = models.fields.DateTimeField(auto_now=True)
 
+    # 채팅방 목록용 마지막 메시지 요약 (메시지 저장/삭제시 갱신)
+    latest_message_id = models.fields.BigIntegerField(null=True)
+    latest_message_preview = models.fields.CharField(max_length=255, null=True)
+    latest_message_username = models.fields.CharField(max_length=225, null=True)
+    latest_message_at = models.fields.DateTimeField(null=True)
+
+    # 메시지 전송 속도 제한 (초당 메시지 수, 연속 최대 메시지 수). 비어 있으면 settings 기본값
+    # 방 생성 API 로 받으므로 0 이하(전송 불가)나 지나치게 큰 값은 받지 않는다.
+    user_message_rate = models.fields.FloatField(
+        null=True,
+        blank=True,
+        validators=[
+            MinValueValidator(MIN_MESSAGE_RATE),
+            MaxValueValidator(MAX_MESSAGE_RATE),
+        ],
+    )
+    user_message_burst = models.fields.PositiveIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_MESSAGE_BURST)],
+    )
+    room_message_rate = models.fields.FloatField(
+        null=True,
+        blank=True,
+        validators=[
+            MinValueValidator(MIN_MESSAGE_RATE),
+            MaxValueValidator(MAX_MESSAGE_RATE),
+        ],
+    )
+    room_message_burst = models.fields.PositiveIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_MESSAGE_BURST)],
+    )
+
     def recent_visitor_count(self):
         now = datetime.now(tz=SEOUL_TZ)
         return ChatRoomVisit.objects.filter(
             room=self, last_visited_at__gte=now - timedelta(minutes=30)
         ).count()
 
+    @classmethod
+    def update_latest_message(cls, message):
+        rooms = cls.objects.filter(id=message.room_id)
+        if message.pk is not None:
+            rooms = rooms.filter(
+                models.Q(latest_message_id__isnull=True)
+                | models.Q(latest_message_id__lt=message.pk)
+            )
+        else:
+            rooms = rooms.filter(
+                models.Q(latest_message_at__isnull=True)
+                | models.Q(latest_message_at__lte=message.created_at)
+            )
+        return rooms.update(
+            latest_message_id=message.pk,
+            latest_message_preview=message.content[:LATEST_MESSAGE_PREVIEW_LENGTH],
+            latest_message_username=message.user.username,
+            latest_message_at=message.created_at,
+        )
+
+    @classmethod
+    def refresh_latest_message(cls, room_id, deleted_id, archived=False):
+        # 요약의 메시지가 지워지면(삭제, archive 이동) hot/archive 에 남은 마지막 메시지로 다시 채운다.
+        # archive 로 옮긴 메시지(archived=True)는 archive 에 남아 있으므로 후보에서 빼지 않는다.
+        # 요약이 아닌 메시지가 지워질 때는 조회하지 않는다.
+        db = router.db_for_write(cls)
+        rooms = cls.objects.using(db).filter(id=room_id, latest_message_id=deleted_id)
+        if not rooms.exists():
+            return 0
+        candidates = []
+        for model in (Message, ArchivedMessage):
+            queryset = model.objects.using(db).filter(room_id=room_id)
+            if not archived:
+                queryset = queryset.exclude(id=deleted_id)
+            candidates.append(queryset.select_related("user").order_by("-id").first())
+        latest = max(
+            (message for message in candidates if message is not None),
+            key=lambda message: message.id,
+            default=None,
+        )
+        if latest is None:
+            return rooms.update(
+                latest_message_id=None,
+                latest_message_preview=None,
+                latest_message_username=None,
+                latest_message_at=None,
+            )
+        return rooms.update(
+            latest_message_id=latest.id,
+            latest_message_preview=latest.content[:LATEST_MESSAGE_PREVIEW_LENGTH],
+            latest_message_username=latest.user.username,
+            latest_message_at=latest.created_at,
+        )
+
 
 class ChatRoomVisit(models.Model):
     user = models.ForeignKey(
@@ -25,6 +117,33 @@ class ChatRoomVisit(models.Model):
     room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="visits")
     last_visited_at = models.fields.DateTimeField(null=True, db_index=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "room"], name="unique_visit_per_user_room"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["room", "last_visited_at"], name="visit_room_last_visited_idx"
+            ),
+        ]
+
+    @classmethod
+    def upsert(cls, user, room, visited_at):
+        # (user, room) 당 한 행만 유지하고 마지막 방문 시각만 갱신한다.
+        features = connections[router.db_for_write(cls)].features
+        return cls.objects.bulk_create(
+            [cls(user=user, room=room, last_visited_at=visited_at)],
+            update_conflicts=True,
+            unique_fields=(
+                ["user", "room"]
+                if features.supports_update_conflicts_with_target
+                else None
+            ),
+            update_fields=["last_visited_at"],
+        )
+
     def active_users(cls, room, minutes: int = 30):
         return cls.objects.filter(
             room=room,
@@ -41,3 +160,49 @@ class Message(models.Model):
     )
     content = models.TextField()
     created_at = models.fields.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["room", "id"], name="message_room_id_idx"),
+        ]
+
+
+# 오래된 메시지를 옮겨두는 cold 테이블 (chat.archive). id 는 원래 Message id 를 그대로 쓴다.
+class ArchivedMessage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_messages",
+    )
+    room = models.ForeignKey(
+        ChatRoom, on_delete=models.CASCADE, related_name="archived_messages"
+    )
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["room", "id"], name="archived_message_room_id_idx"),
+        ]
+
+
+# 메시지 검색용 역색인 (chat.search). 단어를 2글자 단위(n-gram)로 나눠 메시지 id 와 함께 저장한다.
+# archive 로 옮겨진 메시지도 검색되도록 message 는 FK 가 아닌 id 로 가진다.
+class MessageTerm(models.Model):
+    term = models.CharField(max_length=2)
+    message_id = models.BigIntegerField()
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["term", "message_id"], name="unique_term_per_message"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["term", "room", "message_id"], name="message_term_room_idx"
+            ),
+        ]
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from collections import Counter, deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+
+# 프로세스의 모든 연결 송신 큐 지표
+outbox_stats = Counter()
+
+
+def outbox_metrics():
+    return dict(outbox_stats)
+
+
+# daphne 의 ASGI send(partial(Server.handle_reply, protocol)) 는 소켓이 비워지길 기다리지 않고
+# twisted transport 버퍼에 쌓기만 한다. 그래서 transport 에 streaming producer 로 등록해
+# 쓰기 버퍼가 차면(pauseProducing) 보내기를 멈추고, 비워지면(resumeProducing) 다시 보낸다.
+# 연결을 닫을 때는 producer 를 해제한다. (멈춘 producer 가 남아 있으면 twisted 가 연결을 닫지 않는다.)
+class TransportFlowControl:
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.writable = asyncio.Event()
+        self.writable.set()
+        protocol.registerProducer(self, True)
+
+    def detach(self):
+        if self.protocol is not None:
+            self.protocol.unregisterProducer()
+            self.protocol = None
+        self.writable.set()
+
+    def pauseProducing(self):
+        self.writable.clear()
+
+    def resumeProducing(self):
+        self.writable.set()
+
+    def stopProducing(self):
+        self.writable.set()
+
+
+def watch_transport(send):
+    # SessionMiddleware 등은 send 를 감싼 bound method (self.real_send 에 원래 send) 로 바꾸므로
+    # daphne 의 partial(handle_reply, protocol) 이 나올 때까지 벗긴다.
+    while hasattr(getattr(send, "__self__", None), "real_send"):
+        send = send.__self__.real_send
+    # daphne 이 아니면 (테스트, send 가 직접 기다리는 서버) None
+    protocol = next(iter(getattr(send, "args", ())), None)
+    if not hasattr(protocol, "registerProducer"):
+        return None
+    return TransportFlowControl(protocol)
+
+
+# 연결마다 하나씩 두는 송신 큐.
+# consumer 는 프레임을 큐에 넣기만 하고 별도 task 가 transport 가 받을 수 있을 때 순서대로 보내므로,
+# 느린 클라이언트가 channel layer 에서 메시지를 꺼내는 일을 막지 않고, 밀린 프레임은 이 큐에서만 쌓인다.
+# 큐가 CHAT_OUTBOUND_QUEUE_SIZE 만큼 차면 (느린 클라이언트) CHAT_OUTBOUND_QUEUE_POLICY 에 따라
+# - drop_oldest: 가장 오래된 프레임을 버린다.
+# - coalesce: key 가 같은 프레임(접속자 수 등)은 아직 안 보냈으면 새 것으로 바꾸고,
+#   그래도 가득 차면 가장 오래된 프레임을 버린다.
+# - disconnect: 남은 프레임을 버리고 CHAT_SLOW_CONSUMER_CLOSE_CODE 로 연결을 끊는다.
+class Outbox:
+    def __init__(self, send, close, size=None, policy=None, flow=None):
+        self.send = send
+        self.close = close
+        self.flow = flow
+        self.size = size or settings.CHAT_OUTBOUND_QUEUE_SIZE
+        self.policy = policy or settings.CHAT_OUTBOUND_QUEUE_POLICY
+        self.frames = deque()
+        self.slow = False
+        self.closed = False
+        self._keyed = {}
+        self._ready = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def put(self, key=None, **frame):
+        if self.closed:
+            return
+        outbox_stats["enqueued"] += 1
+        if self.policy == COALESCE and key in self._keyed:
+            self._keyed[key][1] = frame
+            outbox_stats["coalesced"] += 1
+            return
+
+        if len(self.frames) >= self.size:
+            self._mark_slow()
+            if self.policy == DISCONNECT:
+                await self._disconnect()
+                return
+            self._drop_oldest()
+
+        entry = [key, frame]
+        self.frames.append(entry)
+        if key is not None:
+            self._keyed[key] = entry
+        outbox_stats["max_depth"] = max(outbox_stats["max_depth"], len(self.frames))
+        self._ready.set()
+
+    def stop(self):
+        if self.flow is not None:
+            self.flow.detach()
+        self.closed = True
+        self.frames.clear()
+        self._keyed.clear()
+        self._task.cancel()
+
+    def _mark_slow(self):
+        if self.slow:
+            return
+        self.slow = True
+        outbox_stats["slow_consumers"] += 1
+        logger.warning(
+            "slow consumer: outbound queue is full (%d frames), policy=%s",
+            self.size,
+            self.policy,
+        )
+
+    def _drop_oldest(self):
+        key, _ = entry = self.frames.popleft()
+        if self._keyed.get(key) is entry:
+            del self._keyed[key]
+        outbox_stats["dropped"] += 1
+
+    async def _disconnect(self):
+        outbox_stats["dropped"] += len(self.frames) + 1
+        outbox_stats["disconnected"] += 1
+        self.stop()
+        await self.close(code=settings.CHAT_SLOW_CONSUMER_CLOSE_CODE)
+
+    async def _run(self):
+        while True:
+            if not self.frames:
+                # 큐를 다 비우면 다시 정상 클라이언트로 본다.
+                self.slow = False
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            if self.flow is not None and not self.flow.writable.is_set():
+                await self.flow.writable.wait()
+                continue
+
+            key, frame = entry = self.frames.popleft()
+            if self._keyed.get(key) is entry:
+                del self._keyed[key]
+            try:
+                await self.send(**frame)
+            except Exception:
+                # 보내지 못하는 연결은 더 쌓지 않는다.
+                outbox_stats["send_failed"] += 1
+                logger.exception("failed to send frame, dropping outbound queue")
+                self.closed = True
+                self.frames.clear()
+                self._keyed.clear()
+                return
+            outbox_stats["sent"] += 1
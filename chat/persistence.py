@@ -0,0 +1,126 @@
+import asyncio
+import atexit
+import logging
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.db import DatabaseError, router
+
+from chat.executor import run_sync
+from chat.models import Message
+from chat.signals import handle_messages_created
+
+logger = logging.getLogger(__name__)
+
+
+def _fill_pks(batch):
+    # MySQL 은 bulk_create 가 pk 를 돌려주지 않으므로 방금 저장한 행을 primary 에서 다시 읽어 채운다.
+    # (pk 가 있어야 과거 메시지 버퍼, 검색 색인, 채팅방 목록 요약을 갱신할 수 있다.)
+    ids = defaultdict(deque)
+    rows = (
+        Message.objects.db_manager(router.db_for_write(Message))
+        .filter(
+            room_id__in={message.room_id for message in batch},
+            created_at__gte=min(message.created_at for message in batch),
+            created_at__lte=max(message.created_at for message in batch),
+        )
+        .order_by("id")
+        .values_list("id", "room_id", "user_id", "created_at", "content")
+    )
+    for pk, *fields in rows:
+        ids[tuple(fields)].append(pk)
+    for message in batch:
+        key = (message.room_id, message.user_id, message.created_at, message.content)
+        if ids[key]:
+            message.pk = ids[key].popleft()
+
+
+# 브로드캐스트 이후 메시지를 모아서 bulk_create 하는 프로세스 단위 write-behind 버퍼.
+# CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS 마다, 혹은 CHAT_WRITE_BEHIND_BATCH_SIZE 만큼 쌓이면 저장한다.
+class MessageWriteBuffer:
+    def __init__(self):
+        self.pending = deque()
+        self.stats = Counter()
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._lock = None
+        self._closing = False
+
+    async def enqueue(self, message):
+        self._bind_loop()
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+        if len(self.pending) >= settings.CHAT_WRITE_BEHIND_MAX_QUEUE:
+            # 큐가 가득 차면 버리지 않고 저장이 끝날때까지 보낸 쪽을 기다리게 한다.
+            self.stats["backpressure"] += 1
+            await self.flush()
+
+        self.pending.append(message)
+        self.stats["enqueued"] += 1
+        if len(self.pending) >= settings.CHAT_WRITE_BEHIND_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def flush(self):
+        self._bind_loop()
+        async with self._lock:
+            while self.pending:
+                batch = self._take_batch()
+                await run_sync(self._write, batch)
+
+    async def close(self):
+        # 저장 루프가 하던 flush 를 끊지 않도록 취소하지 않고 깨워서 마지막 flush 후 끝나기를 기다린다.
+        self._bind_loop()
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            self._closing = True
+            self._wakeup.set()
+            try:
+                await task
+            finally:
+                self._closing = False
+        await self.flush()
+
+    def flush_sync(self):
+        # 프로세스 종료시(atexit) 이벤트 루프 없이 남은 메시지를 저장한다.
+        while self.pending:
+            self._write(self._take_batch())
+
+    def _take_batch(self):
+        size = min(len(self.pending), settings.CHAT_WRITE_BEHIND_BATCH_SIZE)
+        return [self.pending.popleft() for _ in range(size)]
+
+    def _write(self, batch):
+        try:
+            Message.objects.bulk_create(batch)
+            if any(message.pk is None for message in batch):
+                _fill_pks(batch)
+        except DatabaseError:
+            self.stats["failed"] += len(batch)
+            logger.exception("failed to write %d chat messages", len(batch))
+            return
+        self.stats["flushed"] += len(batch)
+        self.stats["flushes"] += 1
+        handle_messages_created(batch)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = None
+
+    async def _run(self):
+        interval = settings.CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+message_writer = MessageWriteBuffer()
+atexit.register(message_writer.flush_sync)
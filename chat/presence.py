@@ -0,0 +1,240 @@
+import asyncio
+import atexit
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import caches
+
+from chat.backends import get_backend
+from chat.enums import MessageType
+from chat.executor import run_sync
+from chat.groups import broadcast_frame
+
+logger = logging.getLogger(__name__)
+
+# 연결 수를 1 줄이고 0 이 되면 필드를 지운다.
+LEAVE_SCRIPT = """
+local left = redis.call("HINCRBY", KEYS[1], ARGV[1], -1)
+if left <= 0 then
+    redis.call("HDEL", KEYS[1], ARGV[1])
+end
+return left
+"""
+
+
+# 채팅방별 hash (field=노드, value=그 노드의 연결 수) 와 노드별 heartbeat sorted set 으로 접속 중인 연결 수를 센다.
+# node_ttl 초 동안 heartbeat 가 없는 노드(비정상 종료)의 연결은 세지 않고, 셀 때 지운다.
+# heartbeat 는 노드의 채팅방별 연결 수를 다시 쓰므로, 잠시 끊겼다 돌아온 노드의 지워진 필드도 복구된다.
+class RedisPresence:
+    def __init__(self, cache="default", node_ttl=30):
+        self.cache_alias = cache
+        self.node_ttl = node_ttl
+        self._leave_script = None
+
+    def _redis(self):
+        from django_redis import get_redis_connection
+
+        return get_redis_connection(self.cache_alias)
+
+    def _key(self, room_id):
+        return caches[self.cache_alias].make_key(f"chat:presence:{room_id}")
+
+    def _nodes_key(self):
+        return caches[self.cache_alias].make_key("chat:presence:nodes")
+
+    def join(self, room_id, node_id, now=None):
+        with self._redis().pipeline() as pipe:
+            pipe.zadd(self._nodes_key(), {node_id: now or time.time()})
+            pipe.hincrby(self._key(room_id), node_id, 1)
+            pipe.execute()
+
+    def leave(self, room_id, node_id):
+        if self._leave_script is None:
+            self._leave_script = self._redis().register_script(LEAVE_SCRIPT)
+        self._leave_script(keys=[self._key(room_id)], args=[node_id])
+
+    def heartbeat(self, node_id, rooms=None, now=None):
+        now = now or time.time()
+        with self._redis().pipeline() as pipe:
+            pipe.zadd(self._nodes_key(), {node_id: now})
+            pipe.zremrangebyscore(self._nodes_key(), "-inf", now - self.node_ttl)
+            for room_id, count in (rooms or {}).items():
+                pipe.hset(self._key(room_id), node_id, count)
+            pipe.execute()
+
+    def remove_node(self, node_id):
+        self._redis().zrem(self._nodes_key(), node_id)
+
+    def count(self, room_id, now=None):
+        return self.counts([room_id], now=now)[room_id]
+
+    def counts(self, room_ids, now=None):
+        now = now or time.time()
+        with self._redis().pipeline(transaction=False) as pipe:
+            pipe.zrangebyscore(self._nodes_key(), now - self.node_ttl, "+inf")
+            for room_id in room_ids:
+                pipe.hgetall(self._key(room_id))
+            alive, *rooms = pipe.execute()
+
+        alive = set(alive)
+        results = {}
+        with self._redis().pipeline(transaction=False) as pipe:
+            for room_id, connections in zip(room_ids, rooms):
+                dead = [node for node in connections if node not in alive]
+                if dead:
+                    pipe.hdel(self._key(room_id), *dead)
+                results[room_id] = sum(
+                    int(count) for node, count in connections.items() if node in alive
+                )
+            pipe.execute()
+        return results
+
+
+# 테스트 및 단일 프로세스용 구현
+class InMemoryPresence:
+    def __init__(self, node_ttl=30):
+        self.node_ttl = node_ttl
+        self.rooms = defaultdict(Counter)
+        self.nodes = {}
+        self._lock = threading.Lock()
+
+    def join(self, room_id, node_id, now=None):
+        with self._lock:
+            self.nodes[node_id] = now or time.time()
+            self.rooms[room_id][node_id] += 1
+
+    def leave(self, room_id, node_id):
+        with self._lock:
+            self.rooms[room_id][node_id] -= 1
+            if self.rooms[room_id][node_id] <= 0:
+                del self.rooms[room_id][node_id]
+
+    def heartbeat(self, node_id, rooms=None, now=None):
+        with self._lock:
+            self.nodes[node_id] = now or time.time()
+            for room_id, count in (rooms or {}).items():
+                self.rooms[room_id][node_id] = count
+
+    def remove_node(self, node_id):
+        with self._lock:
+            self.nodes.pop(node_id, None)
+
+    def count(self, room_id, now=None):
+        return self.counts([room_id], now=now)[room_id]
+
+    def counts(self, room_ids, now=None):
+        start = (now or time.time()) - self.node_ttl
+        results = {}
+        with self._lock:
+            for room_id in room_ids:
+                connections = self.rooms.get(room_id, {})
+                for node in [n for n in connections if self.nodes.get(n, 0) < start]:
+                    del connections[node]
+                results[room_id] = sum(connections.values())
+        return results
+
+
+def get_presence():
+    return get_backend("CHAT_PRESENCE")
+
+
+# 이 프로세스(노드)의 접속/종료를 presence 에 기록하고, 채팅방별 접속 수 변경을
+# CHAT_PRESENCE_DEBOUNCE_MS 동안 모아서 한번만 브로드캐스트한다.
+# CHAT_PRESENCE_HEARTBEAT_SECONDS 마다 heartbeat 로 살아있는 노드임을 알리고 이 노드의 채팅방별 연결 수를 다시 쓴다.
+class PresenceTracker:
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self.rooms = Counter()
+        self.pending = set()
+        self.stats = Counter()
+        self._presence = None
+        self._loop = None
+        self._heartbeat = None
+        self._task = None
+
+    async def join(self, room_id):
+        self._bind_loop()
+        self._presence = get_presence()
+        await run_sync(self._presence.join, room_id, self.node_id)
+        self.rooms[room_id] += 1
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = self._loop.create_task(self._run_heartbeat())
+        await self._changed(room_id)
+
+    async def leave(self, room_id):
+        self._bind_loop()
+        await run_sync(get_presence().leave, room_id, self.node_id)
+        self.rooms[room_id] -= 1
+        if self.rooms[room_id] <= 0:
+            del self.rooms[room_id]
+        await self._changed(room_id)
+
+    async def flush(self):
+        room_ids, self.pending = list(self.pending), set()
+        if room_ids:
+            await self._broadcast(room_ids)
+
+    def close(self):
+        # 정상 종료시 다른 노드가 TTL 을 기다리지 않고 이 노드의 연결을 빼고 센다.
+        if self._presence is not None:
+            self._presence.remove_node(self.node_id)
+
+    async def _changed(self, room_id):
+        if not settings.CHAT_PRESENCE_DEBOUNCE_MS:
+            await self._broadcast([room_id])
+            return
+        if room_id in self.pending:
+            self.stats["debounced"] += 1
+        self.pending.add(room_id)
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._flush_later())
+
+    async def _broadcast(self, room_ids):
+        counts = await run_sync(get_presence().counts, room_ids)
+        channel_layer = get_channel_layer()
+        for room_id, count in counts.items():
+            self.stats["broadcasts"] += 1
+            await broadcast_frame(
+                channel_layer,
+                f"chat_{room_id}",
+                MessageType.SEND_USER_COUNT,
+                {
+                    "type": MessageType.SEND_USER_COUNT,
+                    "active_user_count": count,
+                },
+            )
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._heartbeat = None
+            self._task = None
+
+    async def _flush_later(self):
+        await asyncio.sleep(settings.CHAT_PRESENCE_DEBOUNCE_MS / 1000)
+        await self.flush()
+
+    async def _run_heartbeat(self):
+        while True:
+            await asyncio.sleep(settings.CHAT_PRESENCE_HEARTBEAT_SECONDS)
+            try:
+                await self.heartbeat()
+            except Exception:
+                # 실패해도 멈추지 않는다. (다음 heartbeat 가 연결 수를 다시 쓴다.)
+                self.stats["heartbeat_failed"] += 1
+                logger.exception("presence heartbeat failed")
+
+    async def heartbeat(self):
+        await run_sync(get_presence().heartbeat, self.node_id, dict(self.rooms))
+
+
+presence_tracker = PresenceTracker()
+atexit.register(presence_tracker.close)
@@ -0,0 +1,114 @@
+from django.core.cache import caches
+from sortedcontainers import SortedList
+
+from chat.backends import get_backend
+
+# (score, member) 바로 다음 위치부터 ARGV[3] 개를 score 와 함께 반환한다.
+# 같은 score 안에서는 member 사전순으로 정렬되어 있으므로 그 구간에서 이분 탐색한다.
+PAGE_AFTER_SCRIPT = """
+local lo = redis.call("ZCOUNT", KEYS[1], "-inf", "(" .. ARGV[1])
+local hi = lo + redis.call("ZCOUNT", KEYS[1], ARGV[1], ARGV[1])
+while lo < hi do
+    local mid = math.floor((lo + hi) / 2)
+    if redis.call("ZRANGE", KEYS[1], mid, mid)[1] <= ARGV[2] then
+        lo = mid + 1
+    else
+        hi = mid
+    end
+end
+return redis.call("ZRANGE", KEYS[1], lo, lo + tonumber(ARGV[3]) - 1, "WITHSCORES")
+"""
+
+
+# 채팅방 목록 순위 (방문자 수 내림차순, 같으면 id 오름차순)
+# score 를 -방문자 수로 두어 ZRANGE 의 오름차순/사전순 정렬을 그대로 쓴다. member 는 사전순이 id 순과 같도록 0 으로 채운다.
+# page 는 이전 페이지 마지막 (score, room_id) 다음부터 읽으므로, 그 사이 순위가 바뀌어도 방이 중복/누락되지 않는다.
+class RedisRoomRanking:
+    def __init__(self, cache="default"):
+        self.cache_alias = cache
+        self._page_script = None
+
+    def _redis(self):
+        from django_redis import get_redis_connection
+
+        return get_redis_connection(self.cache_alias)
+
+    def _key(self):
+        # 캐시의 KEY_PREFIX/VERSION 을 붙여 다른 배포와 키가 겹치지 않게 한다.
+        return caches[self.cache_alias].make_key("chat:lobby:ranking")
+
+    def _member(self, room_id):
+        return f"{room_id:020d}"
+
+    def update(self, room_id, visitor_count):
+        self._redis().zadd(self._key(), {self._member(room_id): -visitor_count})
+
+    def update_many(self, visitor_counts):
+        if visitor_counts:
+            self._redis().zadd(
+                self._key(),
+                {self._member(id_): -count for id_, count in visitor_counts.items()},
+            )
+
+    def remove(self, room_id):
+        self._redis().zrem(self._key(), self._member(room_id))
+
+    def rank(self, room_id):
+        return self._redis().zrank(self._key(), self._member(room_id))
+
+    def page(self, after=None, limit=50):
+        # 반환: [(score, room_id)]
+        if after is None:
+            items = self._redis().zrange(self._key(), 0, limit - 1, withscores=True)
+        else:
+            if self._page_script is None:
+                self._page_script = self._redis().register_script(PAGE_AFTER_SCRIPT)
+            score, room_id = after
+            raw = self._page_script(
+                keys=[self._key()], args=[score, self._member(room_id), limit]
+            )
+            items = zip(raw[::2], raw[1::2])
+        return [(int(float(score)), int(member)) for member, score in items]
+
+    def size(self):
+        return self._redis().zcard(self._key())
+
+
+# 테스트 및 단일 프로세스용 구현
+class InMemoryRoomRanking:
+    def __init__(self):
+        self.scores = {}
+        self.ranking = SortedList()
+
+    def update(self, room_id, visitor_count):
+        previous = self.scores.get(room_id)
+        if previous is not None:
+            self.ranking.remove((previous, room_id))
+        self.scores[room_id] = -visitor_count
+        self.ranking.add((-visitor_count, room_id))
+
+    def update_many(self, visitor_counts):
+        for room_id, visitor_count in visitor_counts.items():
+            self.update(room_id, visitor_count)
+
+    def remove(self, room_id):
+        previous = self.scores.pop(room_id, None)
+        if previous is not None:
+            self.ranking.remove((previous, room_id))
+
+    def rank(self, room_id):
+        score = self.scores.get(room_id)
+        if score is None:
+            return None
+        return self.ranking.index((score, room_id))
+
+    def page(self, after=None, limit=50):
+        start = 0 if after is None else self.ranking.bisect_right(tuple(after))
+        return list(self.ranking[start : start + limit])
+
+    def size(self):
+        return len(self.ranking)
+
+
+def get_room_ranking():
+    return get_backend("CHAT_LOBBY_RANKING")
@@ -0,0 +1,149 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from chat.backends import get_backend
+from chat.executor import run_sync
+
+logger = logging.getLogger(__name__)
+
+# KEYS 의 bucket 마다 ARGV 에 (초당 충전량, 최대 토큰) 을 받아,
+# 모든 bucket 에 토큰이 있을 때만 하나씩 꺼낸다. 반환값은 다시 보낼 수 있을 때까지 기다릴 시간(초)이다.
+# 노드마다 시계가 다를 수 있어 redis 서버 시각을 쓴다.
+TOKEN_BUCKET_SCRIPT = """
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local burst = tonumber(ARGV[i * 2])
+    local state = redis.call("HMGET", key, "tokens", "ts")
+    local left = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    left = math.min(burst, left + math.max(0, now - ts) * rate)
+    tokens[i] = left
+    if left < 1 then
+        wait = math.max(wait, (1 - left) / rate)
+    end
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local burst = tonumber(ARGV[i * 2])
+    local left = tokens[i]
+    if wait == 0 then
+        left = left - 1
+    end
+    redis.call("HSET", key, "tokens", left, "ts", now)
+    redis.call("PEXPIRE", key, math.ceil(burst / rate * 1000) + 1000)
+end
+return tostring(wait)
+"""
+
+
+# 마지막 시각 이후 충전된 토큰 수 (최대 burst)
+def _refill(tokens, elapsed, rate, burst):
+    return min(burst, tokens + max(0, elapsed) * rate)
+
+
+# acquire 는 bucket 목록 [(key, 초당 충전량, 최대 토큰)] 을 받아 기다릴 시간(초, 0 이면 허용)을 반환한다.
+# redis hash 에 bucket 별 (토큰, 마지막 시각) 을 두고 lua 스크립트로 한번에 확인/차감한다.
+# redis 에 연결할 수 없으면 프로세스 로컬 bucket 으로 대신 제한한다.
+class RedisRateLimiter:
+    def __init__(self, cache="default"):
+        self.cache_alias = cache
+        self.fallback = InMemoryRateLimiter()
+        self._script = None
+
+    def _redis(self):
+        from django_redis import get_redis_connection
+
+        return get_redis_connection(self.cache_alias)
+
+    def acquire(self, buckets):
+        from redis.exceptions import ConnectionError, TimeoutError
+
+        if self._script is None:
+            self._script = self._redis().register_script(TOKEN_BUCKET_SCRIPT)
+        cache = caches[self.cache_alias]
+        keys = [cache.make_key(f"chat:rate:{key}") for key, _, _ in buckets]
+        args = [value for _, rate, burst in buckets for value in (rate, burst)]
+        try:
+            return float(self._script(keys=keys, args=args))
+        except (ConnectionError, TimeoutError):
+            logger.warning("rate limiter redis unavailable, using local buckets")
+            return self.fallback.acquire(buckets)
+
+
+# 테스트 및 단일 프로세스용 구현
+class InMemoryRateLimiter:
+    def __init__(self):
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets):
+        now = time.monotonic()
+        with self._lock:
+            tokens = {}
+            wait = 0
+            for key, rate, burst in buckets:
+                left, ts = self.buckets.get(key, (burst, now))
+                tokens[key] = _refill(left, now - ts, rate, burst)
+                if tokens[key] < 1:
+                    wait = max(wait, (1 - tokens[key]) / rate)
+            for key, _, _ in buckets:
+                self.buckets[key] = (tokens[key] - (0 if wait else 1), now)
+        return wait
+
+
+def get_rate_limiter():
+    return get_backend("CHAT_RATE_LIMITER")
+
+
+def rate_limit_key(user, client=None):
+    # 게스트는 토큰 없이 재접속하면 새 이름을 받으므로 이름 대신 접속 주소(scope["client"])로 묶는다.
+    # (프록시 뒤에서는 daphne --proxy-headers 로 실제 주소를 받아야 한다.)
+    if getattr(user, "is_guest", False) and client:
+        return f"guest:{client[0]}"
+    return f"user:{user.pk or user.username}"
+
+
+def message_buckets(room, key):
+    # 채팅방에 값이 없으면 settings 의 기본값을 쓴다.
+    user_rate = room.user_message_rate or settings.CHAT_USER_MESSAGE_RATE
+    user_burst = room.user_message_burst or settings.CHAT_USER_MESSAGE_BURST
+    room_rate = room.room_message_rate or settings.CHAT_ROOM_MESSAGE_RATE
+    room_burst = room.room_message_burst or settings.CHAT_ROOM_MESSAGE_BURST
+    return [
+        (f"{room.id}:{key}", user_rate, user_burst),
+        (f"{room.id}", room_rate, room_burst),
+    ]
+
+
+def request_buckets(room, key):
+    # 채팅 메시지가 아닌 프레임(LOAD_MORE 등)은 채팅방 bucket 을 쓰지 않고 유저별로만 제한한다.
+    return [
+        (
+            f"{room.id}:{key}:requests",
+            settings.CHAT_USER_REQUEST_RATE,
+            settings.CHAT_USER_REQUEST_BURST,
+        ),
+    ]
+
+
+async def _acquire(buckets):
+    # 보낼 수 있으면 0, 아니면 다시 보낼 수 있을 때까지 기다릴 시간(초, 올림)을 반환한다.
+    wait = await run_sync(get_rate_limiter().acquire, buckets)
+    return math.ceil(wait * 1000) / 1000
+
+
+async def acheck_message_rate(room, key):
+    return await _acquire(message_buckets(room, key))
+
+
+async def acheck_request_rate(room, key):
+    return await _acquire(request_buckets(room, key))
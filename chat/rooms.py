@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import router
+
+from chat.executor import run_sync
+from chat.models import ChatRoom
+
+
+# 접속 경로에서 쓰는 프로세스 로컬 ChatRoom 캐시 (TTL + LRU)
+# 이 프로세스의 변경은 signals 에서 바로 지우고, 다른 프로세스의 변경은 TTL 안에 반영된다.
+# 방을 만들자마자 접속해도 찾을 수 있도록 캐시가 비었을 때는 replica 가 아닌 primary 에서 읽는다.
+class RoomCache:
+    def __init__(self):
+        self.rooms = OrderedDict()
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def get(self, room_id):
+        room = self._lookup(room_id)
+        if room is None:
+            room = self._store(self._rooms().get(id=room_id))
+        return room
+
+    async def aget(self, room_id):
+        room = self._lookup(room_id)
+        if room is None:
+            room = self._store(await run_sync(self._rooms().get, id=room_id))
+        return room
+
+    def _rooms(self):
+        return ChatRoom.objects.using(router.db_for_write(ChatRoom))
+
+    def _lookup(self, room_id):
+        with self._lock:
+            cached = self.rooms.get(int(room_id))
+            if cached is not None and cached[0] > time.monotonic():
+                self.rooms.move_to_end(int(room_id))
+                self.stats["hits"] += 1
+                return cached[1]
+        self.stats["misses"] += 1
+        return None
+
+    def _store(self, room):
+        with self._lock:
+            self.rooms[room.id] = (
+                time.monotonic() + settings.CHAT_ROOM_CACHE_TTL,
+                room,
+            )
+            self.rooms.move_to_end(room.id)
+            while len(self.rooms) > settings.CHAT_ROOM_CACHE_SIZE:
+                self.rooms.popitem(last=False)
+        return room
+
+    def invalidate(self, room_id):
+        with self._lock:
+            self.rooms.pop(room_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.rooms.clear()
+
+
+room_cache = RoomCache()
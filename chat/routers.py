@@ -0,0 +1,71 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+_primary_until = ContextVar("chat_primary_until", default=0.0)
+_health = {}
+_health_lock = threading.Lock()
+
+
+def pin_primary(seconds=None):
+    # 이 컨텍스트(소켓 연결 하나)에서 방금 쓴 데이터를 잃지 않도록 잠시 primary 에서 읽는다.
+    if seconds is None:
+        seconds = settings.CHAT_READ_YOUR_WRITES_SECONDS
+    _primary_until.set(time.monotonic() + seconds)
+
+
+def replica_healthy(alias):
+    # CHAT_REPLICA_HEALTH_CHECK_INTERVAL 초마다 한번 SELECT 1 로 확인하고 결과를 공유한다.
+    now = time.monotonic()
+    with _health_lock:
+        checked_at, healthy = _health.get(alias, (None, True))
+    if checked_at is not None and now - checked_at < (
+        settings.CHAT_REPLICA_HEALTH_CHECK_INTERVAL
+    ):
+        return healthy
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+        healthy = True
+    except Exception:
+        logger.warning("replica %s is unhealthy, reading from primary", alias)
+        healthy = False
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def reset_replica_health():
+    with _health_lock:
+        _health.clear()
+
+
+# chat 앱의 읽기(과거 메시지, 채팅방 목록 등)를 CHAT_READ_REPLICAS 로 보내고, 쓰기는 항상 primary 로 보낸다.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != "chat":
+            return None
+        if time.monotonic() < _primary_until.get():
+            return DEFAULT_DB_ALIAS
+        replicas = [
+            alias for alias in settings.CHAT_READ_REPLICAS if replica_healthy(alias)
+        ]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # replica 에서 읽은 인스턴스를 저장해도 replica 로 가지 않도록 명시한다.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.CHAT_READ_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import re
+from collections import Counter
+
+from django.conf import settings
+
+from chat.executor import run_sync
+from chat.models import ArchivedMessage, Message, MessageTerm
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"\w+")
+
+# n-gram 빈도를 셀 때 이 개수까지만 센다. (흔한 n-gram 의 posting 을 모두 세지 않도록)
+TERM_COUNT_LIMIT = 10_000
+# 가장 드문 n-gram 의 posting 을 한번에 limit * SCAN_FACTOR 개씩 읽는다.
+SCAN_FACTOR = 4
+
+
+def tokenize(text):
+    # 한국어처럼 띄어쓰기로 나뉘지 않는 부분 검색을 위해 단어를 2글자 n-gram 으로 나눈다.
+    terms = set()
+    for word in WORD_RE.findall(text.lower()):
+        terms.update(word[i : i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def index_messages(messages):
+    # pk 를 다시 읽지 못한 메시지(MySQL bulk_create)는 rebuild_search_index 로 나중에 색인한다.
+    MessageTerm.objects.bulk_create(
+        [
+            MessageTerm(term=term, message_id=message.pk, room_id=message.room_id)
+            for message in messages
+            if message.pk is not None
+            for term in tokenize(message.content)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+# 소켓으로 보낸 메시지는 전송 경로에서 기다리지 않도록 색인을 background task 로 쓴다.
+class BackgroundIndexer:
+    def __init__(self):
+        self.tasks = set()
+        self.stats = Counter()
+
+    def add(self, messages):
+        task = asyncio.get_running_loop().create_task(self._index(messages))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def close(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    async def _index(self, messages):
+        try:
+            await run_sync(index_messages, messages)
+        except Exception:
+            # 빠진 색인은 rebuild_search_index 로 다시 채운다.
+            self.stats["failed"] += len(messages)
+            logger.exception("failed to index %d chat messages", len(messages))
+            return
+        self.stats["indexed"] += len(messages)
+
+
+search_indexer = BackgroundIndexer()
+
+
+def search_messages(query, room_id=None, before_id=None, limit=None):
+    # 모든 n-gram 을 가진 메시지를 id 역순으로 찾고, 실제 내용에 검색어가 있는지 확인한다.
+    # 반환: (메시지 목록, 다음 페이지 cursor)
+    limit = limit or settings.CHAT_SEARCH_PAGE_SIZE
+    terms = tokenize(query)
+    if not terms:
+        return [], None
+
+    needle = query.lower()
+    results = []
+    while len(results) < limit:
+        candidate_ids = _candidate_ids(terms, room_id, before_id, limit)
+        if not candidate_ids:
+            break
+        messages = _load_messages(candidate_ids)
+        results += [
+            messages[message_id]
+            for message_id in candidate_ids
+            if message_id in messages and needle in messages[message_id].content.lower()
+        ]
+        if len(candidate_ids) < limit:
+            break
+        before_id = candidate_ids[-1]
+
+    results = results[:limit]
+    next_cursor = results[-1].id if len(results) == limit else None
+    return results, next_cursor
+
+
+def _postings(term, room_id):
+    queryset = MessageTerm.objects.filter(term=term)
+    if room_id is not None:
+        queryset = queryset.filter(room_id=room_id)
+    return queryset
+
+
+def _candidate_ids(terms, room_id, before_id, limit):
+    # 가장 드문 n-gram 의 posting 을 message_id 역순으로 조금씩 읽고, 나머지 n-gram 도 가진 id 만 남긴다.
+    # (term, message_id) 인덱스만 타고, limit 개를 찾으면 더 읽지 않는다.
+    rarest, *others = sorted(
+        terms,
+        key=lambda term: _postings(term, room_id)
+        .values("id")[:TERM_COUNT_LIMIT]
+        .count(),
+    )
+    batch_size = limit * SCAN_FACTOR
+    candidate_ids = []
+    while len(candidate_ids) < limit:
+        postings = _postings(rarest, room_id)
+        if before_id is not None:
+            postings = postings.filter(message_id__lt=before_id)
+        batch = list(
+            postings.order_by("-message_id").values_list("message_id", flat=True)[
+                :batch_size
+            ]
+        )
+        matched = batch
+        for term in others:
+            if not matched:
+                break
+            found = set(
+                _postings(term, room_id)
+                .filter(message_id__in=matched)
+                .values_list("message_id", flat=True)
+            )
+            matched = [message_id for message_id in matched if message_id in found]
+        candidate_ids += matched
+        if len(batch) < batch_size:
+            break
+        before_id = batch[-1]
+    return candidate_ids[:limit]
+
+
+def _load_messages(message_ids):
+    # hot/archive 어느 쪽에도 없는 id(삭제된 메시지)는 결과에서 빠진다.
+    messages = {}
+    for model in (Message, ArchivedMessage):
+        missing = [
+            message_id for message_id in message_ids if message_id not in messages
+        ]
+        if not missing:
+            break
+        for message in model.objects.filter(id__in=missing).select_related("user"):
+            messages[message.id] = message
+    return messages
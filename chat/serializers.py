@@ -1,11 +1,45 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from chat.models import ChatRoom
+from chat.search import tokenize
 
 
 class ChatRoomSeriailizer(serializers.ModelSerializer):
 
     class Meta:
         model = ChatRoom
-        fields = ["name", "id"]
+        fields = [
+            "name",
+            "id",
+            "user_message_rate",
+            "user_message_burst",
+            "room_message_rate",
+            "room_message_burst",
+        ]
         read_only_fields = ("id",)
+
+
+class MessageSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    room_id = serializers.IntegerField(required=False)
+    cursor = serializers.IntegerField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_q(self, value):
+        if not tokenize(value):
+            raise serializers.ValidationError(
+                "Search query needs a word of at least 2 characters."
+            )
+        return value
+
+    def validate_limit(self, value):
+        return min(value, settings.CHAT_SEARCH_MAX_PAGE_SIZE)
+
+
+class MessageSearchResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    room_id = serializers.IntegerField()
+    message = serializers.CharField(source="content")
+    username = serializers.CharField(source="user.username")
+    created_at = serializers.DateTimeField()
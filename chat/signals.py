@@ -0,0 +1,67 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from chat.history import encode_history_entry, get_history_buffer
+from chat.lobby import invalidate_chatroom_list
+from chat.models import ChatRoom, ChatRoomVisit, Message
+from chat.ranking import get_room_ranking
+from chat.rooms import room_cache
+from chat.search import index_messages
+from chat.visitors import touch_visitor
+
+
+def handle_messages_created(messages, index=True):
+    # post_save 가 발생하지 않는 bulk_create 경로에서도 직접 호출한다.
+    # index=False 면 검색 색인은 호출한 쪽이 따로 쓴다. (chat.search.search_indexer)
+    buffer = get_history_buffer()
+    for message in messages:
+        if message.pk is None:
+            # pk 를 돌려주지 않는 DB(MySQL bulk_create)는 다음 조회때 다시 채우도록 버린다.
+            buffer.invalidate(message.room_id)
+        else:
+            buffer.push(message.room_id, message.pk, encode_history_entry(message))
+
+    if index:
+        index_messages(messages)
+
+    latest_by_room = {message.room_id: message for message in messages}
+    for message in latest_by_room.values():
+        ChatRoom.update_latest_message(message)
+    invalidate_chatroom_list()
+
+
+@receiver(post_save, sender=Message)
+def on_message_saved(sender, instance, created, **kwargs):
+    if created:
+        # 소켓 전송 경로는 index_later 를 켜고, 브로드캐스트 후 background 로 색인한다.
+        handle_messages_created(
+            [instance], index=not getattr(instance, "index_later", False)
+        )
+
+
+@receiver(post_delete, sender=Message)
+def on_message_deleted(sender, instance, **kwargs):
+    get_history_buffer().invalidate(instance.room_id)
+    if ChatRoom.refresh_latest_message(instance.room_id, instance.pk):
+        invalidate_chatroom_list()
+
+
+@receiver(post_save, sender=ChatRoom)
+def on_chatroom_saved(sender, instance, created, **kwargs):
+    room_cache.invalidate(instance.id)
+    if created:
+        get_room_ranking().update(instance.id, 0)
+    invalidate_chatroom_list()
+
+
+@receiver(post_delete, sender=ChatRoom)
+def on_chatroom_deleted(sender, instance, **kwargs):
+    room_cache.invalidate(instance.id)
+    get_room_ranking().remove(instance.id)
+    invalidate_chatroom_list()
+
+
+@receiver(post_save, sender=ChatRoomVisit)
+def on_visit_saved(sender, instance, **kwargs):
+    if instance.last_visited_at is not None:
+        touch_visitor(instance.room_id, instance.user_id, instance.last_visited_at)
@@ -1,24 +1,109 @@
+import asyncio
+import contextvars
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
+from io import StringIO
+from unittest import mock
 
+import msgpack
 import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
 from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
 from channels.testing import WebsocketCommunicator
+from daphne.server import Server as DaphneServer
 from django.contrib.auth import get_user_model
-from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.db.utils import ConnectionHandler, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
 from rest_framework import status
 from rest_framework.test import APIClient
-
-from chat.const import NO_MSG, SYSTEM
+from twisted.internet.abstract import FileDescriptor
+
+from chat import lobby
+from chat.archive import archive_cutoff, archive_messages
+from chat.backends import reset_backends
+from chat.batching import batch_stats
+from chat.const import INVALID_CURSOR, NO_MSG, RATE_LIMITED, SYSTEM
+from chat.data import asave_message
+from chat.db_backends.pool import (ConnectionPool, PoolTimeout, close_pools,
+                                   pool_metrics)
+from chat.encoding import MSGPACK_SUBPROTOCOL, StdlibJSONEncoder, encode_event
 from chat.enums import MessageType
-from chat.models import ChatRoom, ChatRoomVisit, Message
+from chat.groups import broadcast_frame, shard_group_name, shard_group_names
+from chat.history import (build_history_frames, fetch_history_page,
+                          load_history_entries)
+from chat.lobby import (current_lobby_version, get_chatroom_list_frame,
+                        latest_message_coalescer, next_lobby_version,
+                        publish_lobby_delta)
+from chat.models import (ArchivedMessage, ChatRoom, ChatRoomVisit, Message,
+                         MessageTerm)
+from chat.outbox import (COALESCE, DISCONNECT, DROP_OLDEST, Outbox,
+                         outbox_metrics, outbox_stats, watch_transport)
+from chat.persistence import message_writer
+from chat.presence import InMemoryPresence, presence_tracker
+from chat.ranking import get_room_ranking
+from chat.ratelimit import InMemoryRateLimiter
+from chat.rooms import room_cache
+from chat.routers import ReplicaRouter, pin_primary, reset_replica_health
+from chat.routing import websocket_urlpatterns
+from chat.search import search_indexer, search_messages
+from chat.visitors import (check_visitor_counts, get_visitor_counter,
+                           rebuild_visitor_counts)
 from chat_project.asgi import application
 from chat_project.helpers import SEOUL_TZ
 
 User = get_user_model()
 
+# 테스트는 redis 없이 로컬 백엔드로 실행한다.
+LOCAL_BACKENDS = {
+    "CACHES": {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    },
+    "CHAT_VISITOR_COUNTER": {"BACKEND": "chat.visitors.InMemoryVisitorCounter"},
+    "CHAT_LOBBY_RANKING": {"BACKEND": "chat.ranking.InMemoryRoomRanking"},
+    "CHAT_RATE_LIMITER": {"BACKEND": "chat.ratelimit.InMemoryRateLimiter"},
+    "CHAT_PRESENCE": {"BACKEND": "chat.presence.InMemoryPresence"},
+    "CHAT_PRESENCE_DEBOUNCE_MS": 0,
+}
+
+
+class CountingEncoder(StdlibJSONEncoder):
+    frames = []
+
+    def dumps(self, data):
+        CountingEncoder.frames.append(data)
+        return super().dumps(data)
 
+
+def reset_local_backends():
+    cache.clear()
+    reset_backends()
+    message_writer.pending.clear()
+    latest_message_coalescer.pending.clear()
+    presence_tracker.pending.clear()
+    presence_tracker.rooms.clear()
+    search_indexer.tasks.clear()
+    room_cache.clear()
+
+
+@override_settings(**LOCAL_BACKENDS)
 class TestChatRoom(TestCase):
     def setUp(self):
+        reset_local_backends()
         self.client = APIClient()
 
     def _create_user(self, username: str = "Sue"):
@@ -58,6 +143,356 @@ class TestChatRoom(TestCase):
         # Then: 카운트는 user2, user4 두명이어야한다.
         assert count == 2
 
+    def test_should_count_recent_visitors_same_as_sql(self):
+        # Given: 방문 기록 (한 시간 전, 20분 전, 현재)
+        now = datetime.now(tz=SEOUL_TZ)
+        chatroom1 = self._create_chatrooms()
+        chatroom2 = self._create_chatrooms("빈 채팅방")
+        self._add_user_to_chatroom(
+            self._create_user(), chatroom1, now - timedelta(hours=1)
+        )
+        self._add_user_to_chatroom(
+            self._create_user("Min"), chatroom1, now - timedelta(minutes=20)
+        )
+        self._add_user_to_chatroom(self._create_user("Zzng"), chatroom1, now)
+
+        # When: 카운터로 여러 방의 최근 방문자 수를 한번에 조회
+        counts = get_visitor_counter().counts([chatroom1.id, chatroom2.id], now=now)
+
+        # Then: SQL 집계와 동일하다.
+        assert counts == {chatroom1.id: 2, chatroom2.id: 0}
+        assert counts[chatroom1.id] == chatroom1.recent_visitor_count()
+        assert check_visitor_counts([chatroom1.id, chatroom2.id], now=now) == {}
+
+        # And: 기간을 바꿔서 조회할 수 있다.
+        assert get_visitor_counter().count(chatroom1.id, now=now, minutes=90) == 3
+
+    def test_should_detect_and_rebuild_inconsistent_visitor_counts(self):
+        # Given: 카운터에 반영되지 않은 방문 기록
+        now = datetime.now(tz=SEOUL_TZ)
+        chatroom = self._create_chatrooms()
+        self._add_user_to_chatroom(self._create_user(), chatroom, now)
+        get_visitor_counter().clear(chatroom.id)
+
+        # When: 일관성 검사
+        # Then: SQL 결과와 다른 방을 찾는다.
+        assert check_visitor_counts([chatroom.id], now=now) == {chatroom.id: (0, 1)}
+
+        # And: 다시 채우면 일치한다.
+        rebuild_visitor_counts([chatroom.id], now=now)
+        assert check_visitor_counts([chatroom.id], now=now) == {}
+
+    def test_should_refresh_ranking_when_visits_expire(self):
+        # Given: 20분 전 방문자가 있는 방과 현재 방문자가 있는 방
+        now = datetime.now(tz=SEOUL_TZ)
+        chatroom1 = self._create_chatrooms()
+        chatroom2 = self._create_chatrooms("삼성전자 공채 준비방")
+        self._add_user_to_chatroom(self._create_user(), chatroom1, now)
+        self._add_user_to_chatroom(
+            self._create_user("Min"), chatroom2, now - timedelta(minutes=20)
+        )
+        self._add_user_to_chatroom(
+            self._create_user("Jang"), chatroom2, now - timedelta(minutes=20)
+        )
+        assert get_room_ranking().page(limit=2) == [
+            (-2, chatroom2.id),
+            (-1, chatroom1.id),
+        ]
+
+        # When: 집계 기간이 줄어든 뒤 순위를 다시 계산하면
+        with self.settings(CHAT_VISITOR_WINDOW_MINUTES=10):
+            call_command("refresh_lobby_ranking", stdout=StringIO())
+
+        # Then: 기간이 지난 방문자는 순위에서 빠진다.
+        assert get_room_ranking().page(limit=2) == [
+            (-1, chatroom1.id),
+            (0, chatroom2.id),
+        ]
+        assert get_room_ranking().rank(chatroom2.id) == 1
+
+    def test_should_update_latest_message_summary_when_message_saved(self):
+        # Given: 채팅방 생성
+        user = self._create_user()
+        chatroom = self._create_chatrooms()
+
+        # When: 메시지 저장
+        Message.objects.create(user=user, room=chatroom, content="첫번째")
+        message2 = Message.objects.create(user=user, room=chatroom, content="두번째")
+
+        # Then: 채팅방에 마지막 메시지 요약이 저장된다.
+        chatroom.refresh_from_db()
+        assert chatroom.latest_message_id == message2.id
+        assert chatroom.latest_message_preview == "두번째"
+        assert chatroom.latest_message_username == user.username
+
+    def test_should_refresh_latest_message_summary_when_message_deleted(self):
+        # Given: 메시지 2개가 있는 채팅방
+        user = self._create_user()
+        chatroom = self._create_chatrooms()
+        message1 = Message.objects.create(user=user, room=chatroom, content="첫번째")
+        message2 = Message.objects.create(user=user, room=chatroom, content="두번째")
+
+        # When: 마지막 메시지를 삭제하면
+        message2.delete()
+
+        # Then: 남은 마지막 메시지로 요약을 다시 채운다.
+        chatroom.refresh_from_db()
+        assert chatroom.latest_message_id == message1.id
+        assert chatroom.latest_message_preview == "첫번째"
+
+        # When: 남은 메시지도 삭제하면
+        message1.delete()
+
+        # Then: 요약을 비운다.
+        chatroom.refresh_from_db()
+        assert chatroom.latest_message_id is None
+        assert chatroom.latest_message_preview is None
+        assert chatroom.latest_message_username is None
+
+    def test_should_keep_latest_message_summary_when_message_archived(self):
+        # Given: 오래된 메시지만 있는 채팅방
+        user = self._create_user()
+        chatroom = self._create_chatrooms()
+        Message.objects.create(user=user, room=chatroom, content="첫번째")
+        message2 = Message.objects.create(user=user, room=chatroom, content="두번째")
+        Message.objects.update(
+            created_at=datetime.now(tz=SEOUL_TZ) - timedelta(days=31)
+        )
+
+        # When: archive 로 옮기면
+        archive_messages(archive_cutoff(30))
+
+        # Then: archive 에 있는 마지막 메시지가 요약으로 남는다.
+        chatroom.refresh_from_db()
+        assert chatroom.latest_message_id == message2.id
+        assert chatroom.latest_message_preview == "두번째"
+
+    def test_should_refresh_summary_once_per_archived_latest_message(self):
+        # Given: 오래된 메시지만 있는 채팅방과 최근 메시지가 요약인 채팅방
+        user = self._create_user()
+        chatroom1 = self._create_chatrooms()
+        chatroom2 = self._create_chatrooms("최근 채팅방")
+        for i in range(3):
+            Message.objects.create(user=user, room=chatroom1, content=f"옛날 {i}")
+            Message.objects.create(user=user, room=chatroom2, content=f"옛날 {i}")
+        Message.objects.update(
+            created_at=datetime.now(tz=SEOUL_TZ) - timedelta(days=31)
+        )
+        latest = Message.objects.create(user=user, room=chatroom2, content="최근")
+
+        # When: archive 로 옮기면
+        with mock.patch.object(
+            ChatRoom,
+            "refresh_latest_message",
+            wraps=ChatRoom.refresh_latest_message,
+        ) as refresh:
+            archive_messages(archive_cutoff(30))
+
+        # Then: 행마다가 아니라 요약 메시지가 옮겨진 채팅방만 한번 다시 계산한다.
+        old_latest = ArchivedMessage.objects.filter(room=chatroom1).latest("id")
+        refresh.assert_called_once_with(chatroom1.id, old_latest.id, archived=True)
+        chatroom1.refresh_from_db()
+        chatroom2.refresh_from_db()
+        assert chatroom1.latest_message_id == old_latest.id
+        assert chatroom1.latest_message_preview == "옛날 2"
+        assert chatroom2.latest_message_id == latest.id
+
+    def test_should_backfill_latest_message_summary(self):
+        # Given: 요약이 비어있는 기존 채팅방 데이터
+        user = self._create_user()
+        chatroom1 = self._create_chatrooms()
+        chatroom2 = self._create_chatrooms("빈 채팅방")
+        Message.objects.create(user=user, room=chatroom1, content="첫번째")
+        message2 = Message.objects.create(user=user, room=chatroom1, content="두번째")
+        ChatRoom.objects.update(
+            latest_message_id=None,
+            latest_message_preview=None,
+            latest_message_username=None,
+            latest_message_at=None,
+        )
+
+        # When: backfill 커맨드 실행
+        call_command("backfill_room_summary", batch_size=1, stdout=StringIO())
+
+        # Then: 메시지가 있는 방만 마지막 메시지로 채워진다.
+        chatroom1.refresh_from_db()
+        chatroom2.refresh_from_db()
+        assert chatroom1.latest_message_id == message2.id
+        assert chatroom1.latest_message_preview == "두번째"
+        assert chatroom1.latest_message_username == user.username
+        assert chatroom2.latest_message_id is None
+
+    def test_should_cleanup_temp_users_without_messages(self):
+        # Given: 예전 방식의 임시 유저 2명(한명은 메시지 작성), 게스트 유저, 일반 유저
+        chatroom = self._create_chatrooms()
+        unused = User.objects.create(username="1a2b3c4d", password="1234")
+        writer = User.objects.create(username="5e6f7a8b", password="1234")
+        Message.objects.create(user=writer, room=chatroom, content="안녕하세요.")
+        guest = User.objects.create(username="guest-0a1b2c3d", is_guest=True)
+        member = User.objects.create_user(username="abcdef12", password="1234")
+
+        # When: 정리 커맨드 실행
+        call_command("cleanup_temp_users", batch_size=1, stdout=StringIO())
+
+        # Then: 메시지가 없는 임시/게스트 유저만 삭제된다.
+        remaining = set(User.objects.values_list("id", flat=True))
+        assert unused.id not in remaining and guest.id not in remaining
+        assert remaining == {writer.id, member.id}
+
+    @override_settings(CHAT_ROOM_CACHE_SIZE=1)
+    def test_should_cache_chatroom_until_changed(self):
+        # Given: 채팅방 2개를 캐시에 올린다.
+        chatroom1 = self._create_chatrooms()
+        chatroom2 = self._create_chatrooms("삼성전자 공채 준비방")
+        room_cache.get(chatroom1.id)
+
+        # When: 같은 방을 다시 조회하면
+        with self.assertNumQueries(0):
+            cached = room_cache.get(str(chatroom1.id))
+
+        # Then: DB 조회 없이 캐시에서 응답한다.
+        assert cached.name == chatroom1.name
+
+        # When: 방 이름을 바꾸면
+        chatroom1.name = "이름 바뀐 방"
+        chatroom1.save()
+
+        # Then: 캐시가 지워져 바뀐 방을 응답한다.
+        assert room_cache.get(chatroom1.id).name == "이름 바뀐 방"
+
+        # And: 크기를 넘으면 가장 오래 쓰지 않은 방부터 내보낸다.
+        room_cache.get(chatroom2.id)
+        assert list(room_cache.rooms) == [chatroom2.id]
+
+    @override_settings(CHAT_ROOM_CACHE_TTL=0)
+    def test_should_reload_chatroom_after_ttl(self):
+        # Given: 캐시에 올린 채팅방
+        chatroom = self._create_chatrooms()
+        room_cache.get(chatroom.id)
+
+        # When: TTL 이 지난 뒤 다른 프로세스에서 바뀐 방을 조회하면
+        ChatRoom.objects.filter(id=chatroom.id).update(name="다른 프로세스")
+
+        # Then: DB 에서 다시 읽는다.
+        assert room_cache.get(chatroom.id).name == "다른 프로세스"
+
+    def test_should_search_messages_in_room_with_keyset_paging(self):
+        # Given: 두 채팅방의 메시지 (한 메시지는 archive 로 옮겨짐)
+        user = self._create_user()
+        chatroom1 = self._create_chatrooms()
+        chatroom2 = self._create_chatrooms("삼성전자 공채 준비방")
+        archived = Message.objects.create(
+            user=user, room=chatroom1, content="자기소개서 첨삭 부탁해요"
+        )
+        Message.objects.filter(id=archived.id).update(
+            created_at=datetime.now(tz=SEOUL_TZ) - timedelta(days=31)
+        )
+        archive_messages(archive_cutoff(30))
+        message2 = Message.objects.create(
+            user=user, room=chatroom1, content="내일 면접 자기소개 준비"
+        )
+        Message.objects.create(user=user, room=chatroom1, content="소개팅 후기")
+        message4 = Message.objects.create(
+            user=user, room=chatroom2, content="Samsung 자기소개서 마감"
+        )
+
+        # When: 채팅방에서 검색
+        response = self.client.get(
+            "/chat/search/", {"q": "자기소개", "room_id": chatroom1.id, "limit": 1}
+        )
+
+        # Then: 최신 메시지부터 한 페이지와 다음 cursor 를 응답한다.
+        assert response.status_code == status.HTTP_200_OK
+        assert [m["id"] for m in response.data["results"]] == [message2.id]
+        assert response.data["results"][0]["username"] == user.username
+        assert response.data["next_cursor"] == message2.id
+
+        # When: cursor 로 다음 페이지 요청
+        response = self.client.get(
+            "/chat/search/",
+            {"q": "자기소개", "room_id": chatroom1.id, "cursor": message2.id},
+        )
+
+        # Then: archive 로 옮겨진 메시지까지 응답한다.
+        assert [m["id"] for m in response.data["results"]] == [archived.id]
+        assert response.data["next_cursor"] is None
+
+        # And: 채팅방 없이 검색하면 모든 방에서 찾는다. (대소문자 무시)
+        response = self.client.get("/chat/search/", {"q": "samsung 자기"})
+        assert [m["id"] for m in response.data["results"]] == [message4.id]
+
+    def test_should_intersect_terms_from_rarest_across_scan_batches(self):
+        # Given: 드문 n-gram("개팅")만 가진 최근 메시지 여럿과, 모든 n-gram 을 가진 오래된 메시지
+        user = self._create_user()
+        chatroom = self._create_chatrooms()
+        target = Message.objects.create(user=user, room=chatroom, content="소개팅 후기")
+        for _ in range(20):
+            Message.objects.create(user=user, room=chatroom, content="자기소개")
+        for _ in range(6):
+            Message.objects.create(user=user, room=chatroom, content="미개팅 후기")
+
+        # When: 한 건만 검색하면 (드문 n-gram posting 을 4개씩 읽는다)
+        results, next_cursor = search_messages("소개팅", limit=1)
+
+        # Then: 여러 묶음을 읽어 모든 n-gram 을 가진 메시지를 찾는다.
+        assert results == [target]
+        assert next_cursor == target.id
+
+    def test_should_skip_index_on_save_when_indexed_later(self):
+        # When: 나중에 색인하도록 표시한 메시지를 저장하면
+        message = Message(
+            user=self._create_user(), room=self._create_chatrooms(), content="면접 후기"
+        )
+        message.index_later = True
+        message.save()
+
+        # Then: 저장 경로에서는 색인하지 않는다.
+        assert not MessageTerm.objects.filter(message_id=message.id).exists()
+
+    def test_should_not_cache_snapshot_when_version_moved_while_building(self):
+        # Given: 채팅방과 스냅샷을 만드는 동안 delta 가 나가는 상황
+        self._create_chatrooms()
+        version = current_lobby_version()
+        build_chatroom_page = lobby.build_chatroom_page
+
+        def build_with_delta(*args, **kwargs):
+            page = build_chatroom_page(*args, **kwargs)
+            next_lobby_version()
+            return page
+
+        # When: 스냅샷을 요청하면
+        with mock.patch("chat.lobby.build_chatroom_page", side_effect=build_with_delta):
+            frame = get_chatroom_list_frame()
+
+        # Then: 이전 version 스냅샷으로 응답하되 캐시하지 않는다.
+        assert json.loads(frame)["version"] == version
+        assert cache.get(lobby.SNAPSHOT_KEY) is None
+
+        # And: 다음 요청은 새 version 으로 만들어 캐시한다.
+        frame = get_chatroom_list_frame()
+        assert json.loads(frame)["version"] == version + 1
+        assert cache.get(lobby.SNAPSHOT_KEY) == frame
+
+    def test_should_not_search_with_too_short_query(self):
+        # When: 2글자 이상 단어가 없는 검색어로 요청시
+        response = self.client.get("/chat/search/", {"q": "자 기"})
+
+        # Then: 400 Bad Request
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_should_rebuild_search_index(self):
+        # Given: 색인이 비어있는 기존 메시지
+        user = self._create_user()
+        chatroom = self._create_chatrooms()
+        message = Message.objects.create(user=user, room=chatroom, content="면접 후기")
+        MessageTerm.objects.all().delete()
+
+        # When: 색인 커맨드 실행
+        call_command("rebuild_search_index", batch_size=1, stdout=StringIO())
+
+        # Then: 다시 검색된다.
+        assert search_messages("면접")[0] == [message]
+
     def test_should_create_chatroom(self):
         # When: 방 생성 API 요청시
         response = self.client.post("/chat/", data={"name": "자소설 닷컴 채팅방"})
@@ -77,9 +512,566 @@ class TestChatRoom(TestCase):
         # Then: 400 Bad Request
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
+    def test_should_not_create_with_invalid_rate_limit(self):
+        # When: 0 이하이거나 너무 큰 전송 속도 제한으로 방 생성 API 요청시
+        for data in (
+            {"user_message_rate": -1},
+            {"room_message_rate": 0},
+            {"user_message_burst": 0},
+            {"room_message_burst": 1_000_000},
+        ):
+            response = self.client.post("/chat/", data={"name": "도배방", **data})
+
+            # Then: 400 Bad Request
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        # And: 방은 생성되지 않는다.
+        assert not ChatRoom.objects.exists()
+
+
+@override_settings(**LOCAL_BACKENDS)
+class TestHistoryBuffer(TestCase):
+    def setUp(self):
+        reset_local_backends()
+        self.user = User.objects.create(username="Sue", password="1234")
+        self.chatroom = ChatRoom.objects.create(name="자소설 닷컴 채팅방")
+
+    def _create_message(self, content):
+        return Message.objects.create(
+            user=self.user, room=self.chatroom, content=content
+        )
+
+    def _ids(self, entries):
+        return [json.loads(entry)["id"] for entry in entries]
+
+    def test_should_serve_history_from_buffer_after_warm(self):
+        # Given: 메시지 생성 후 최초 조회로 버퍼를 채운다.
+        message1 = self._create_message("첫번째")
+        message2 = self._create_message("두번째")
+        assert self._ids(load_history_entries(self.chatroom.id)) == [
+            message2.id,
+            message1.id,
+        ]
+
+        # When: 새 메시지가 저장되면
+        message3 = self._create_message("세번째")
+
+        # Then: DB 조회 없이 버퍼에서 최신순으로 응답한다.
+        with self.assertNumQueries(0):
+            entries = load_history_entries(self.chatroom.id)
+        assert self._ids(entries) == [message3.id, message2.id, message1.id]
+
+    def test_should_archive_old_messages_in_batches(self):
+        # Given: 오래된 메시지 3개와 최근 메시지 1개
+        old_messages = [self._create_message(f"옛날 {i}") for i in range(3)]
+        recent = self._create_message("최근")
+        Message.objects.filter(id__in=[m.id for m in old_messages]).update(
+            created_at=datetime.now(tz=SEOUL_TZ) - timedelta(days=31)
+        )
+
+        # When: archive 커맨드 실행
+        call_command(
+            "archive_messages", days=30, batch_size=2, pause=0, stdout=StringIO()
+        )
+
+        # Then: 오래된 메시지만 같은 id 로 archive 테이블에 옮겨진다.
+        assert list(Message.objects.values_list("id", flat=True)) == [recent.id]
+        archived = ArchivedMessage.objects.order_by("id")
+        assert [m.id for m in archived] == [m.id for m in old_messages]
+        assert archived[0].content == "옛날 0"
+
+    def test_should_read_history_across_hot_and_archive(self):
+        # Given: archive 로 옮겨진 메시지 2개와 hot 메시지 2개
+        archived = [self._create_message(f"옛날 {i}") for i in range(2)]
+        hot = [self._create_message(f"최근 {i}") for i in range(2)]
+        Message.objects.filter(id__in=[m.id for m in archived]).update(
+            created_at=datetime.now(tz=SEOUL_TZ) - timedelta(days=31)
+        )
+        archive_messages(archive_cutoff(30))
+        assert Message.objects.count() == 2
+
+        # When: 최신 페이지와 이전 페이지를 조회하면
+        latest = load_history_entries(self.chatroom.id, limit=3)
+        older = load_history_entries(self.chatroom.id, before_id=hot[0].id, limit=3)
+
+        # Then: 두 테이블을 이어서 최신순으로 응답한다.
+        assert self._ids(latest) == [hot[1].id, hot[0].id, archived[1].id]
+        assert self._ids(older) == [archived[1].id, archived[0].id]
+
+    @override_settings(
+        CHAT_HISTORY_BUFFER={
+            "BACKEND": "chat.history.CacheHistoryBuffer",
+            "OPTIONS": {"size": 2},
+        }
+    )
+    def test_should_fallback_to_db_when_scroll_deeper_than_buffer(self):
+        # Given: 버퍼 크기보다 많은 메시지
+        message1 = self._create_message("첫번째")
+        message2 = self._create_message("두번째")
+        message3 = self._create_message("세번째")
+        load_history_entries(self.chatroom.id, limit=2)
+
+        # When: 버퍼 안쪽 페이지는 버퍼에서 응답한다.
+        with self.assertNumQueries(0):
+            entries = load_history_entries(
+                self.chatroom.id, before_id=message3.id, limit=1
+            )
+        assert self._ids(entries) == [message2.id]
+
+        # Then: 버퍼보다 깊은 페이지는 DB 에서 응답한다. (hot 에서 모자라면 archive 도 조회)
+        with self.assertNumQueries(2):
+            entries = load_history_entries(
+                self.chatroom.id, before_id=message2.id, limit=2
+            )
+        assert self._ids(entries) == [message1.id]
+
+
+@override_settings(CHAT_READ_REPLICAS=["replica"], CHAT_REPLICA_HEALTH_CHECK_INTERVAL=0)
+@override_settings(**LOCAL_BACKENDS)
+class TestReplicaRouter(TestCase):
+    # 테스트 DB 설정에 없는 alias 이므로 router 가 상태 확인에 쓰는 connections 만 바꿔서 확인한다.
+    def setUp(self):
+        reset_local_backends()
+        reset_replica_health()
+        self.connections = ConnectionHandler(
+            {
+                "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+                "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+            }
+        )
+        self.addCleanup(self.connections.close_all)
+        patcher = mock.patch("chat.routers.connections", self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReplicaRouter()
+
+    def test_should_read_from_replica_and_own_writes_from_primary(self):
+        # When: chat 앱 모델을 읽으면
+        # Then: replica 에서 읽고, 다른 앱과 쓰기는 건드리지 않는다.
+        assert self.router.db_for_read(ChatRoom) == "replica"
+        assert self.router.db_for_read(User) is None
+        assert self.router.db_for_write(ChatRoom) == "default"
+
+        # When: 한 연결(컨텍스트)에서 메시지를 저장하면
+        context = contextvars.copy_context()
+        context.run(pin_primary)
+
+        # Then: 그 연결은 잠시 primary 에서 읽어 자기 메시지를 본다.
+        assert context.run(self.router.db_for_read, Message) == "default"
+
+        # And: 다른 연결은 계속 replica 에서 읽는다.
+        assert self.router.db_for_read(Message) == "replica"
+
+    def test_should_pin_primary_after_saving_message(self):
+        # Given: 채팅방과 유저
+        chatroom = ChatRoom.objects.create(name="primary 채팅방")
+        user = User.objects.create(username="Sue", password="!234")
+
+        # When: 한 연결(컨텍스트)에서 메시지를 저장하면
+        # (테스트 트랜잭션의 DB 연결로 저장하도록 전용 executor 대신 테스트 스레드에서 실행한다.)
+        async def run_inline(func, *args, **kwargs):
+            return await sync_to_async(func)(*args, **kwargs)
+
+        context = contextvars.copy_context()
+        with mock.patch.object(
+            ReplicaRouter, "db_for_read", return_value=None
+        ), mock.patch("chat.data.run_sync", run_inline):
+            context.run(
+                async_to_sync(asave_message),
+                Message(user=user, room=chatroom, content="방금 보낸 메시지"),
+            )
+
+        # Then: 그 연결의 읽기만 primary 로 고정된다.
+        assert context.run(self.router.db_for_read, Message) == "default"
+        assert self.router.db_for_read(Message) == "replica"
+
+    def test_should_fallback_to_primary_when_replica_is_unhealthy(self):
+        # Given: 상태 확인에 실패하는 replica
+        replica = self.connections["replica"]
+
+        # When: 읽으면
+        with mock.patch.object(replica, "cursor", side_effect=OperationalError):
+            alias = self.router.db_for_read(ChatRoom)
+
+        # Then: primary 에서 읽는다.
+        assert alias == "default"
+
+
+@override_settings(CHAT_READ_REPLICAS=["replica"], CHAT_REPLICA_HEALTH_CHECK_INTERVAL=0)
+@override_settings(**LOCAL_BACKENDS)
+class TestReplicaReads(TestCase):
+    # 복제가 늦은 replica 를 migrate 만 한 별도 SQLite 파일로 만들어 실제 ORM 읽기가 어디로 가는지 확인한다.
+    # replica alias 는 설정에 없으므로 test runner 가 아닌 이 클래스에서 등록하고 databases 에 넣는다.
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings["replica"] = connections.configure_settings(
+            {
+                "default": connections.settings["default"],
+                "replica": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": os.path.join(cls.replica_dir.name, "replica.sqlite3"),
+                },
+            }
+        )["replica"]
+        call_command("migrate", database="replica", verbosity=0)
+        cls.databases = {"default", "replica"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        reset_local_backends()
+        reset_replica_health()
+        self.user = User.objects.create(username="Sue", password="!234")
+        self.chatroom = ChatRoom.objects.create(name="replica 채팅방")
+        self.first = Message.objects.create(
+            user=self.user, room=self.chatroom, content="복제된 메시지"
+        )
+        self.second = Message.objects.create(
+            user=self.user, room=self.chatroom, content="아직 복제 안 된 메시지"
+        )
+        # replica 에는 첫번째 메시지까지만 복제됐다.
+        User.objects.using("replica").bulk_create([self.user])
+        ChatRoom.objects.using("replica").bulk_create([self.chatroom])
+        Message.objects.using("replica").bulk_create([self.first])
+        cache.clear()
+
+    def _ids(self, entries):
+        return [json.loads(entry)["id"] for entry in entries]
+
+    def test_should_warm_history_buffer_from_primary(self):
+        # Given: 일반 읽기는 replica 로 간다.
+        assert [m.id for m in fetch_history_page(self.chatroom.id)] == [self.first.id]
+
+        # When: 버퍼가 비어 있는 채팅방의 과거 메시지를 읽으면
+        entries = load_history_entries(self.chatroom.id)
+
+        # Then: primary 에서 읽어 아직 복제되지 않은 메시지도 버퍼에 담는다.
+        assert self._ids(entries) == [self.second.id, self.first.id]
+        assert self._ids(load_history_entries(self.chatroom.id)) == self._ids(entries)
+
+    def test_should_read_own_writes_from_primary(self):
+        # When: 한 연결(컨텍스트)에서 메시지를 저장한 뒤 읽으면
+        context = contextvars.copy_context()
+        context.run(pin_primary)
+        messages = context.run(fetch_history_page, self.chatroom.id)
+
+        # Then: 그 연결은 primary 에서 읽어 자기 메시지를 본다.
+        assert [m.id for m in messages] == [self.second.id, self.first.id]
+
+        # And: 다른 연결은 계속 replica 에서 읽는다.
+        assert [m.id for m in fetch_history_page(self.chatroom.id)] == [self.first.id]
+
+    def test_should_find_new_room_before_replication(self):
+        # Given: 방금 만들어 replica 에는 아직 없는 채팅방
+        chatroom = ChatRoom.objects.create(name="새 채팅방")
+        assert not ChatRoom.objects.filter(id=chatroom.id).exists()
+
+        # When: 접속 경로에서 채팅방을 찾으면
+        room = room_cache.get(chatroom.id)
+
+        # Then: primary 에서 찾는다.
+        assert room.name == "새 채팅방"
+
+
+class TestConnectionPool(TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(close_pools)
+        self.db_path = os.path.join(tmpdir.name, "pool.sqlite3")
+
+    def test_should_reuse_pooled_connection(self):
+        # Given: 풀을 쓰는 sqlite DB 연결 (MIN_SIZE 2)
+        handler = ConnectionHandler(
+            {
+                "default": {"ENGINE": "django.db.backends.dummy"},
+                "pooled": {
+                    "ENGINE": "chat.db_backends.sqlite3",
+                    "NAME": self.db_path,
+                    "POOL": {"MIN_SIZE": 2, "MAX_SIZE": 4},
+                },
+            }
+        )
+        self.addCleanup(handler.close_all)
+
+        # When: 쿼리 후 연결을 닫기를 반복하면
+        for _ in range(3):
+            with handler["pooled"].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            handler["pooled"].close()
+
+        # Then: 미리 연 연결만 재사용한다.
+        metrics = pool_metrics()["pooled"]
+        assert metrics["created"] == 2
+        assert metrics["reused"] == 3
+        assert metrics["idle"] == 2
+        assert metrics["in_use"] == 0
+
+    def test_should_open_new_database_when_connection_settings_change(self):
+        # Given: a.sqlite3 를 쓰는 풀에서 연결했다가 닫은 뒤
+        other_path = os.path.join(os.path.dirname(self.db_path), "other.sqlite3")
+        handler = ConnectionHandler(
+            {
+                "default": {"ENGINE": "django.db.backends.dummy"},
+                "pooled": {"ENGINE": "chat.db_backends.sqlite3", "NAME": self.db_path},
+            }
+        )
+        self.addCleanup(handler.close_all)
+        handler["pooled"].ensure_connection()
+        handler["pooled"].close()
+
+        # When: 테스트 DB 생성처럼 NAME 을 바꾸고 다시 연결하면
+        handler["pooled"].settings_dict["NAME"] = other_path
+        with handler["pooled"].cursor() as cursor:
+            cursor.execute("PRAGMA database_list")
+            [(_, _, path)] = cursor.fetchall()
+
+        # Then: 바뀐 DB 에 연결한다.
+        assert path == other_path
+
+    def test_should_wait_for_released_connection_and_timeout(self):
+        # Given: 최대 1개짜리 풀에서 연결을 빌린다.
+        pool = self._create_pool(max_size=1, timeout=5)
+        conn = pool.acquire()
+
+        # When: 다른 스레드가 연결을 기다리는 중에 반납하면
+        waiter = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(waiter.shutdown)
+        future = waiter.submit(pool.acquire)
+        while pool.metrics()["waiting"] == 0:
+            time.sleep(0.01)
+        pool.release(conn)
+
+        # Then: 기다리던 스레드가 같은 연결을 받는다.
+        assert future.result(timeout=5) is conn
+
+        # And: 반납되지 않으면 TIMEOUT 후 실패한다.
+        pool.timeout = 0.05
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        assert pool.metrics()["timeouts"] == 1
+
+    def test_should_recycle_expired_and_unhealthy_connections(self):
+        # Given: 수명이 지난 연결
+        pool = self._create_pool(max_lifetime=0)
+        pool.release(pool.acquire())
+
+        # Then: 반납시 닫는다.
+        assert pool.metrics()["recycled"] == 1
+        assert pool.metrics()["size"] == 0
+
+        # Given: 쉬는 동안 끊긴 연결
+        pool = self._create_pool(health_check_after=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.close()
+
+        # When: 다시 빌리면
+        new_conn = pool.acquire()
+
+        # Then: 상태 확인에 실패한 연결을 버리고 새로 연다.
+        assert new_conn is not conn
+        assert pool.metrics()["health_check_failed"] == 1
+        assert pool.metrics()["created"] == 2
+
+    def _create_pool(self, **options):
+        return ConnectionPool(
+            lambda: sqlite3.connect(self.db_path, check_same_thread=False), **options
+        )
+
+
+class BlockingSend:
+    # released 전까지 보내지 못하는 느린 클라이언트
+    def __init__(self):
+        self.sent = []
+        self.released = asyncio.Event()
+
+    async def __call__(self, text_data=None, bytes_data=None):
+        await self.released.wait()
+        self.sent.append(text_data)
+
+
+class StalledTransport(FileDescriptor):
+    # 클라이언트가 읽지 않아 커널 버퍼가 가득 찬 소켓 (twisted 쓰기 버퍼는 bufferSize 를 넘으면 producer 를 멈춘다.)
+    bufferSize = 1024
+
+    def __init__(self):
+        super().__init__(reactor=mock.Mock())
+        self.connected = True
+        self.reading = False
+        self.received = []
+
+    def writeSomeData(self, data):
+        if not self.reading:
+            return 0
+        self.received.append(bytes(data))
+        return len(data)
+
+
+class StalledWebSocket:
+    # daphne WebSocketProtocol 처럼 받은 프레임을 transport 에 쓰고, producer 등록을 transport 에 넘긴다.
+    def __init__(self):
+        self.transport = StalledTransport()
+
+    def registerProducer(self, producer, streaming):
+        self.transport.registerProducer(producer, streaming)
+
+    def unregisterProducer(self):
+        self.transport.unregisterProducer()
+
+    def handle_reply(self, message):
+        self.transport.write(message["text"].encode())
+
+
+class TestOutbox(TestCase):
+    def setUp(self):
+        outbox_stats.clear()
+
+    async def _settle(self):
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    async def _put_frames(self, outbox, frames):
+        for key, text in frames:
+            await outbox.put(key, text_data=text)
+            await self._settle()
+
+    async def test_should_drop_oldest_frame_for_slow_consumer(self):
+        # Given: 보내는 중에 멈춘 클라이언트의 송신 큐 (크기 2)
+        send = BlockingSend()
+        outbox = Outbox(send, mock.AsyncMock(), size=2, policy=DROP_OLDEST)
+
+        # When: 큐보다 많은 프레임이 들어오면
+        with self.assertLogs("chat.outbox", level="WARNING"):
+            await self._put_frames(outbox, [(None, "1"), (None, "2"), (None, "3")])
+            await self._put_frames(outbox, [(None, "4")])
+
+        # Then: 기다리지 않고 가장 오래된 프레임을 버린다.
+        send.released.set()
+        await self._settle()
+        assert send.sent == ["1", "3", "4"]
+        assert outbox_metrics()["dropped"] == 1
+        assert outbox_metrics()["slow_consumers"] == 1
+        assert outbox.slow is False
+        outbox.stop()
+
+    async def test_should_drop_frames_when_daphne_transport_is_full(self):
+        # Given: daphne 의 ASGI send 로 읽지 않는 클라이언트에게 보내는 송신 큐 (크기 3)
+        protocol = StalledWebSocket()
+        server = DaphneServer.__new__(DaphneServer)
+        server.connections = {protocol: {}}
+        send = partial(server.handle_reply, protocol)
+        outbox = Outbox(
+            lambda text_data: send({"type": "websocket.send", "text": text_data}),
+            mock.AsyncMock(),
+            size=3,
+            policy=DROP_OLDEST,
+            flow=watch_transport(send),
+        )
+
+        # When: transport 쓰기 버퍼가 찰 만큼 프레임이 들어오면
+        frames = [(None, f"{i}" * 600) for i in range(7)]
+        with self.assertLogs("chat.outbox", level="WARNING"):
+            await self._put_frames(outbox, frames)
+
+        # Then: transport 에는 버퍼가 찰 때까지만 쓰고, 나머지는 큐에서 오래된 것부터 버린다.
+        assert not outbox.flow.writable.is_set()
+        assert protocol.transport._tempDataLen == 1200
+        assert [frame["text_data"][0] for _, frame in outbox.frames] == ["4", "5", "6"]
+        assert outbox_metrics()["dropped"] == 2
+
+        # When: 클라이언트가 다시 읽으면
+        protocol.transport.reading = True
+        while outbox.frames or protocol.transport._tempDataLen:
+            protocol.transport.doWrite()
+            await self._settle()
+
+        # Then: 남은 프레임을 보낸다.
+        assert (
+            b"".join(protocol.transport.received)
+            == "".join(text for _, text in frames[:2] + frames[4:]).encode()
+        )
+
+        # And: 닫을 때 producer 를 해제한다.
+        outbox.stop()
+        assert protocol.transport.producer is None
+
+    async def test_should_stop_outbox_when_send_fails(self):
+        # Given: 보내기에 실패하는 연결
+        outbox = Outbox(
+            mock.AsyncMock(side_effect=RuntimeError), mock.AsyncMock(), size=2
+        )
+
+        # When: 프레임을 보내면
+        with self.assertLogs("chat.outbox", level="ERROR"):
+            await self._put_frames(outbox, [(None, "1")])
+
+        # Then: 실패를 남기고 이후 프레임은 쌓지 않는다.
+        assert outbox.closed
+        await outbox.put(text_data="2")
+        assert not outbox.frames
+        assert outbox_metrics()["send_failed"] == 1
+
+    async def test_should_coalesce_keyed_frames(self):
+        # Given: 멈춘 클라이언트의 송신 큐 (coalesce)
+        send = BlockingSend()
+        outbox = Outbox(send, mock.AsyncMock(), size=10, policy=COALESCE)
+
+        # When: 접속자 수 프레임이 보내지기 전에 여러번 들어오면
+        await self._put_frames(
+            outbox,
+            [
+                (None, "chat1"),
+                ("count", "count1"),
+                (None, "chat2"),
+                ("count", "count2"),
+                ("count", "count3"),
+            ],
+        )
+
+        # Then: 처음 자리에 마지막 값만 보내고, 채팅 메시지는 모두 보낸다.
+        send.released.set()
+        await self._settle()
+        assert send.sent == ["chat1", "count3", "chat2"]
+        assert outbox_metrics()["coalesced"] == 2
+        outbox.stop()
+
+    async def test_should_disconnect_slow_consumer(self):
+        # Given: 멈춘 클라이언트의 송신 큐 (disconnect)
+        send = BlockingSend()
+        close = mock.AsyncMock()
+        outbox = Outbox(send, close, size=1, policy=DISCONNECT)
+
+        # When: 큐가 가득 찬 뒤 프레임이 들어오면
+        await self._put_frames(outbox, [(None, "1"), (None, "2"), (None, "3")])
+
+        # Then: 남은 프레임을 버리고 close code 로 연결을 끊는다.
+        close.assert_awaited_once_with(code=4008)
+        assert outbox.frames == deque()
+        assert outbox_metrics()["disconnected"] == 1
+        assert outbox_metrics()["dropped"] == 2
+
+        # And: 이후 프레임은 무시한다.
+        await outbox.put(text_data="4")
+        send.released.set()
+        await self._settle()
+        assert send.sent == []
+
 
 @pytest.mark.asyncio
+@override_settings(**LOCAL_BACKENDS)
 class TestSocket(TransactionTestCase):
+    def setUp(self):
+        reset_local_backends()
+
     async def _create_default_chatroom(self, name: str = "자소설 닷컴"):
         return await database_sync_to_async(ChatRoom.objects.create)(name=name)
 
@@ -100,6 +1092,29 @@ class TestSocket(TransactionTestCase):
             user=user, room=chatroom, content=content
         )
 
+    async def _connect_msgpack(self, path, user=None):
+        communicator = WebsocketCommunicator(
+            application, path, subprotocols=[MSGPACK_SUBPROTOCOL]
+        )
+        if user is not None:
+            communicator.scope["user"] = user
+        connected, subprotocol = await communicator.connect()
+        assert connected is True
+        assert subprotocol == MSGPACK_SUBPROTOCOL
+        return communicator
+
+    async def _receive_msgpack(self, communicator):
+        response = await communicator.receive_output()
+        assert "bytes" in response and "text" not in response
+        return msgpack.unpackb(response["bytes"])
+
+    async def _drain(self, communicator):
+        while not await communicator.receive_nothing():
+            await communicator.receive_json_from()
+
+    async def _send_msgpack(self, communicator, data):
+        await communicator.send_to(bytes_data=msgpack.packb(data))
+
 
 class TestChat(TestSocket):
     async def test_shold_connect_unauthorized_user(self):
@@ -110,15 +1125,186 @@ class TestChat(TestSocket):
         communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
         connected, subprotocol = await communicator.connect()
 
-        # Then: 연결은 실패된다.
+        # Then: 연결은 성공한다.
         assert connected is True
 
-        # And: 유저가 랜덤명으로 생성된다.
-        assert await database_sync_to_async(User.objects.exists)()
+        # And: 게스트 토큰을 받고, 유저는 생성되지 않는다.
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.GUEST_TOKEN
+        assert response["username"].startswith("guest-")
+        assert not await database_sync_to_async(User.objects.exists)()
+
+        # And: 게스트도 방문 인원에 포함된다.
+        await self._drain_until_join_msg(communicator, 1)
 
         # And: WebSocket 연결 종료
         await communicator.disconnect()
 
+    async def test_should_log_connect_phase_timings(self):
+        # Given: 채팅방 생성
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = await self._create_default_user()
+
+        # When: 연결하면
+        with self.assertLogs("chat.timing", level="DEBUG") as logs:
+            await communicator.connect()
+            await self._drain_until_join_msg(communicator, 1)
+
+        # Then: 구간별 소요 시간을 로깅한다.
+        [line] = logs.output
+        assert f"room={chatroom.id}" in line
+        for phase in ("lookup=", "accept=", "load=", "history=", "count="):
+            assert phase in line
+
+        await communicator.disconnect()
+
+    @override_settings(CHAT_DB_EXECUTOR_WORKERS=4)
+    async def test_should_join_concurrently_while_shared_executor_is_busy(self):
+        # Given: 채팅방 생성 후 이벤트 루프의 공유 executor 를 모두 점유한다.
+        chatroom = await self._create_default_chatroom()
+        loop = asyncio.get_running_loop()
+        shared_executor = ThreadPoolExecutor(max_workers=1)
+        loop.set_default_executor(shared_executor)
+        release = threading.Event()
+        blocker = loop.run_in_executor(None, release.wait)
+
+        try:
+            # When: 120명이 동시에 접속하면
+            communicators = [
+                WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+                for _ in range(120)
+            ]
+            results = await asyncio.gather(
+                *(communicator.connect(timeout=10) for communicator in communicators)
+            )
+
+            # Then: 공유 executor 를 기다리지 않고 모두 접속 인원까지 받는다.
+            assert all(connected for connected, _ in results)
+            for communicator in communicators:
+                while True:
+                    response = await communicator.receive_json_from(timeout=10)
+                    if response.get("type") == MessageType.SEND_USER_COUNT:
+                        break
+            assert get_visitor_counter().count(chatroom.id) == 120
+        finally:
+            release.set()
+            await blocker
+            shared_executor.shutdown()
+
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    async def test_should_send_guest_message_while_thread_sensitive_executor_is_busy(
+        self,
+    ):
+        # Given: 채팅방 생성 후 (세션 조회 미들웨어 없이) 게스트로 접속한다.
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f"/room/{chatroom.id}/chat/"
+        )
+        communicator.scope["user"] = AnonymousUser()
+
+        # And: Django async ORM 이 쓰는 thread_sensitive executor 를 점유한다.
+        release = threading.Event()
+        blocker = asyncio.ensure_future(sync_to_async(release.wait)())
+        try:
+            # When: 접속해 첫 메시지를 보내면 (게스트 유저 생성, 메시지 저장)
+            connected, _ = await communicator.connect(timeout=3)
+            assert connected is True
+            await self._drain(communicator)
+            await communicator.send_json_to({"message": "안녕하세요."})
+
+            # Then: thread_sensitive executor 를 기다리지 않고 브로드캐스트된다.
+            response = await communicator.receive_json_from(timeout=3)
+            while response.get("type") is not None:
+                response = await communicator.receive_json_from(timeout=3)
+            assert response["message"] == "안녕하세요."
+        finally:
+            release.set()
+            await blocker
+        await communicator.disconnect()
+        await search_indexer.close()
+
+    async def test_should_reuse_guest_and_create_user_on_first_message(self):
+        # Given: 게스트로 접속해 토큰을 받는다.
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        await communicator.connect()
+        guest = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        # When: 토큰으로 재접속
+        communicator = WebsocketCommunicator(
+            application, f"/room/{chatroom.id}/chat/?guest={guest['token']}"
+        )
+        await communicator.connect()
+
+        # Then: 같은 게스트로 식별되고, 방문 인원도 늘지 않는다.
+        response = await communicator.receive_json_from()
+        assert response["username"] == guest["username"]
+        await self._drain_until_join_msg(communicator, 1)
+        assert not await database_sync_to_async(User.objects.exists)()
+
+        # When: 메시지를 두번 보내면
+        await communicator.send_json_to({"message": "안녕하세요."})
+        await communicator.receive_json_from()
+        await communicator.send_json_to({"message": "반갑습니다."})
+        await communicator.receive_json_from()
+
+        # Then: 게스트 유저가 한번만 생성되고 메시지가 저장된다.
+        user = await database_sync_to_async(User.objects.get)()
+        assert user.username == guest["username"]
+        assert user.is_guest and not user.has_usable_password()
+        assert (
+            await database_sync_to_async(Message.objects.filter(user=user).count)() == 2
+        )
+
+        await communicator.disconnect()
+
+    async def test_should_rename_guest_when_registered_user_has_same_name(self):
+        # Given: 게스트와 같은 이름으로 가입한 유저
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        await communicator.connect()
+        guest = await communicator.receive_json_from()
+        await self._drain_until_join_msg(communicator, 1)
+        member = await self._create_default_user(guest["username"])
+
+        # When: 게스트가 메시지를 보내면
+        await communicator.send_json_to({"message": "안녕하세요."})
+
+        # Then: 새 게스트 이름과 토큰을 받고, 그 이름으로 메시지가 저장된다.
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.GUEST_TOKEN
+        assert response["username"] != guest["username"]
+        chat = await communicator.receive_json_from()
+        assert chat["username"] == response["username"]
+        message = await database_sync_to_async(
+            Message.objects.select_related("user").get
+        )()
+        assert message.user.username == response["username"]
+        assert message.user.is_guest and message.user != member
+
+        await communicator.disconnect()
+
+    async def test_should_issue_new_guest_when_token_is_forged(self):
+        # Given: 채팅방 생성
+        chatroom = await self._create_default_chatroom()
+
+        # When: 위조된 토큰으로 접속
+        communicator = WebsocketCommunicator(
+            application, f"/room/{chatroom.id}/chat/?guest=guest-admin:forged"
+        )
+        await communicator.connect()
+
+        # Then: 새 게스트를 발급받는다.
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.GUEST_TOKEN
+        assert response["username"] != "guest-admin"
+
+        await communicator.disconnect()
+
     async def test_should_connect_to_chat_room(self):
         # Given: 채팅방 생성
         chatroom = await self._create_default_chatroom()
@@ -138,34 +1324,153 @@ class TestChat(TestSocket):
 
     async def test_should_recode_visit_cnt_when_connect_to_chatroom(self):
         # Given: 채팅방 생성
-        now = datetime.now(tz=SEOUL_TZ)
         chatroom = await self._create_default_chatroom()
 
         # And: 기존 유저 접속 중
-        user1 = await self._create_default_user()
-        await database_sync_to_async(ChatRoomVisit.objects.create)(
-            user=user1, room=chatroom, last_visited_at=now - timedelta(minutes=10)
-        )
+        communicator1 = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator1.scope["user"] = await self._create_default_user()
+        await communicator1.connect()
+        await self._drain_until_join_msg(communicator1, 1)
 
         # When: 새 유저가 접속
         user2 = await database_sync_to_async(User.objects.create)(
             username="Min", password="!234"
         )
-        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
-        communicator.scope["user"] = user2
-        await communicator.connect()
+        communicator2 = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator2.scope["user"] = user2
+        await communicator2.connect()
 
-        # Then: 유저 카운트를 더해서 응답한다.
-        response = await communicator.receive_json_from()
-        self._assert_join_msg(response, 2)
+        # Then: 접속 중인 연결 수를 더해서 모두에게 응답한다.
+        self._assert_join_msg(await communicator2.receive_json_from(), 2)
+        self._assert_join_msg(await communicator1.receive_json_from(), 2)
 
-        await communicator.disconnect()
+        # And: 나가면 남은 유저에게 줄어든 수를 응답한다.
+        await communicator2.disconnect()
+        self._assert_join_msg(await communicator1.receive_json_from(), 1)
+        await communicator1.disconnect()
 
         # And: 방문기록이 저장된다.
         assert await database_sync_to_async(
             ChatRoomVisit.objects.filter(user=user2, room=chatroom).exists
         )()
 
+    @override_settings(CHAT_PRESENCE_DEBOUNCE_MS=300)
+    async def test_should_debounce_user_count_broadcast(self):
+        # Given: 채팅방 생성
+        chatroom = await self._create_default_chatroom()
+        presence_tracker.stats.clear()
+
+        # When: 짧은 시간 안에 세명이 접속하면
+        communicators = []
+        for i in range(3):
+            communicator = WebsocketCommunicator(
+                application, f"/room/{chatroom.id}/chat/"
+            )
+            communicator.scope["user"] = await self._create_default_user(f"user{i}")
+            await communicator.connect()
+            communicators.append(communicator)
+
+        # Then: 마지막 수만 한번 브로드캐스트한다.
+        for communicator in communicators:
+            self._assert_join_msg(await communicator.receive_json_from(), 3)
+            assert await communicator.receive_nothing(timeout=0.1)
+        assert presence_tracker.stats["broadcasts"] == 1
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    def test_should_not_count_connections_of_dead_node(self):
+        # Given: 두 노드에 연결된 채팅방
+        presence = InMemoryPresence(node_ttl=30)
+        presence.join(1, "node-a", now=100)
+        presence.join(1, "node-a", now=100)
+        presence.join(1, "node-b", now=100)
+        presence.leave(1, "node-a")
+
+        # When: node-b 만 heartbeat 를 남기고 TTL 이 지나면
+        presence.heartbeat("node-b", now=125)
+
+        # Then: heartbeat 가 끊긴 node-a 의 연결은 세지 않는다.
+        assert presence.count(1, now=120) == 2
+        assert presence.count(1, now=140) == 1
+        assert presence.rooms[1] == {"node-b": 1}
+
+    def test_should_restore_connections_of_node_on_heartbeat(self):
+        # Given: heartbeat 가 늦어 다른 노드가 연결 수를 지운 노드
+        presence = InMemoryPresence(node_ttl=30)
+        presence.join(1, "node-a", now=100)
+        presence.join(2, "node-a", now=100)
+        assert presence.counts([1, 2], now=140) == {1: 0, 2: 0}
+
+        # When: 그 노드가 다시 heartbeat 를 남기면
+        presence.heartbeat("node-a", rooms={1: 1, 2: 3}, now=145)
+
+        # Then: 채팅방별 연결 수가 복구된다.
+        assert presence.counts([1, 2], now=150) == {1: 1, 2: 3}
+
+    @override_settings(CHAT_PRESENCE_HEARTBEAT_SECONDS=0.01)
+    async def test_should_keep_heartbeat_running_after_failure(self):
+        # Given: heartbeat 가 한번 실패하는 presence
+        chatroom = await self._create_default_chatroom()
+        calls = []
+
+        def heartbeat(presence, node_id, rooms=None, now=None):
+            calls.append(rooms)
+            if len(calls) == 1:
+                raise ConnectionError("redis down")
+
+        presence_tracker.stats.clear()
+        with mock.patch.object(InMemoryPresence, "heartbeat", heartbeat):
+            # When: 접속 후 heartbeat 주기가 여러번 지나면
+            await presence_tracker.join(chatroom.id)
+            await asyncio.sleep(0.1)
+
+            # Then: 실패 후에도 계속 이 노드의 채팅방별 연결 수를 보낸다.
+            assert presence_tracker.stats["heartbeat_failed"] == 1
+            assert len(calls) >= 2
+            assert calls[-1] == {chatroom.id: 1}
+            assert not presence_tracker._heartbeat.done()
+            await presence_tracker.leave(chatroom.id)
+        presence_tracker._heartbeat.cancel()
+
+    async def test_should_not_leave_presence_when_join_failed(self):
+        # Given: presence 에 기록하지 못하는 상황
+        user = await self._create_default_user()
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+
+        with mock.patch.object(
+            presence_tracker, "join", side_effect=ConnectionError("redis down")
+        ), mock.patch.object(presence_tracker, "leave") as leave:
+            # When: 접속이 실패하고 연결이 끊기면
+            await communicator.connect()
+            await communicator.disconnect()
+
+        # Then: 더하지 않은 연결 수를 빼지 않는다.
+        leave.assert_not_called()
+
+    async def test_should_keep_one_visit_per_user_when_reconnect(self):
+        # Given: 채팅방 및 유저 생성
+        chatroom = await self._create_default_chatroom()
+        user = await self._create_default_user()
+
+        # When: 같은 유저가 두번 접속
+        for _ in range(2):
+            communicator = WebsocketCommunicator(
+                application, f"/room/{chatroom.id}/chat/"
+            )
+            communicator.scope["user"] = user
+            await communicator.connect()
+            response = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+        # Then: 방문 기록은 하나만 남고 방문자 수도 한명이다.
+        self._assert_join_msg(response, 1)
+        visits = await database_sync_to_async(
+            lambda: list(ChatRoomVisit.objects.filter(user=user, room=chatroom))
+        )()
+        assert len(visits) == 1
+
     async def test_should_respond_past_messages_and_visitor_cnt_when_connect_to_chatroom(
         self,
     ):
@@ -177,6 +1482,7 @@ class TestChat(TestSocket):
         c = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
         c.scope["user"] = user
         await c.connect()
+        await self._drain_until_join_msg(c, 1)
 
         message1 = await database_sync_to_async(Message.objects.create)(
             user=user, room=chatroom, content="첫번째"
@@ -209,6 +1515,117 @@ class TestChat(TestSocket):
 
         await communicator.disconnect()
 
+    @override_settings(CHAT_HISTORY_PAGE_SIZE=2)
+    async def test_should_respond_older_messages_when_load_more(self):
+        # Given: 채팅방 및 메시지 3개 생성
+        chatroom = await self._create_default_chatroom()
+        user = await self._create_default_user()
+        message1 = await self._create_message(user, chatroom, "첫번째")
+        message2 = await self._create_message(user, chatroom, "두번째")
+        message3 = await self._create_message(user, chatroom, "세번째")
+
+        # When: 연결
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+        await communicator.connect()
+
+        # Then: 최신 페이지(2개)만 응답한다.
+        response = await communicator.receive_json_from()
+        self._assert_message(response, message3, user)
+        response = await communicator.receive_json_from()
+        self._assert_message(response, message2, user)
+        response = await communicator.receive_json_from()
+        self._assert_join_msg(response, 1)
+
+        # When: 마지막으로 받은 메시지 id 로 이전 메시지 요청
+        await communicator.send_json_to(
+            {"type": MessageType.LOAD_MORE, "before_id": message2.id}
+        )
+
+        # Then: 그 이전 메시지를 응답한다.
+        response = await communicator.receive_json_from()
+        self._assert_message(response, message1, user)
+        assert await communicator.receive_nothing()
+
+        await communicator.disconnect()
+
+    async def test_should_reject_load_more_with_invalid_before_id(self):
+        # Given: 접속한 유저
+        user = await self._create_default_user()
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+        await communicator.connect()
+        await communicator.receive_json_from()  # JOIN MSG
+
+        for fields in ({}, {"before_id": "1"}, {"before_id": 1.5}, {"before_id": 0}):
+            # When: before_id 가 없거나 양의 정수가 아닌 과거 메시지 요청을 보내면
+            await communicator.send_json_to({"type": MessageType.LOAD_MORE, **fields})
+
+            # Then: 연결을 끊지 않고 ERROR 프레임으로 알린다.
+            response = await communicator.receive_json_from()
+            assert response["type"] == MessageType.ERROR
+            assert response["code"] == INVALID_CURSOR
+
+        await communicator.disconnect()
+
+    async def test_should_respond_batched_past_messages_with_protocol_v2(self):
+        # Given: 채팅방 및 메시지 생성
+        chatroom = await self._create_default_chatroom()
+        user = await self._create_default_user()
+        message1 = await self._create_message(user, chatroom, "첫번째")
+        message2 = await self._create_message(user, chatroom, "두번째")
+
+        # When: v2 프로토콜로 연결
+        communicator = WebsocketCommunicator(
+            application, f"/room/{chatroom.id}/chat/?version=2"
+        )
+        communicator.scope["user"] = user
+        await communicator.connect()
+
+        # Then: 과거 메시지를 하나의 프레임으로 최신순 응답한다.
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.PAST_MESSAGES
+        assert [m["id"] for m in response["messages"]] == [message2.id, message1.id]
+        assert response["messages"][0]["message"] == message2.content
+        assert response["messages"][0]["username"] == user.username
+
+        # And: 현재 접속 인원을 응답한다.
+        response = await communicator.receive_json_from()
+        self._assert_join_msg(response, 1)
+
+        await communicator.disconnect()
+
+    def test_should_split_history_frames_by_size(self):
+        # Given: 인코딩된 메시지 3개
+        entries = [json.dumps({"id": i, "message": "x" * 40}) for i in range(3)]
+
+        # When: 두 메시지가 겨우 들어가는 크기로 프레임 생성
+        frames = build_history_frames(entries, max_bytes=180)
+
+        # Then: 크기 제한에 맞게 나누어지고 순서는 유지된다.
+        assert len(frames) == 2
+        assert all(len(frame) <= 180 for frame in frames)
+        decoded = [json.loads(frame) for frame in frames]
+        assert [m["id"] for d in decoded for m in d["messages"]] == [0, 1, 2]
+        assert all(d["type"] == MessageType.PAST_MESSAGES for d in decoded)
+
+    def test_should_split_history_frames_by_encoded_bytes(self):
+        # Given: 한글을 이스케이프하지 않고 인코딩한 메시지 3개 (orjson 과 같은 출력)
+        entries = [
+            json.dumps({"id": i, "message": "가" * 40}, ensure_ascii=False)
+            for i in range(3)
+        ]
+
+        # When: 글자 수로는 세 메시지가 모두 들어가는 크기로 프레임 생성
+        frames = build_history_frames(entries, max_bytes=250)
+
+        # Then: UTF-8 바이트 수 기준으로 나누어진다.
+        assert len(frames) == 3
+        assert all(len(frame.encode()) <= 250 for frame in frames)
+        decoded = [json.loads(frame) for frame in frames]
+        assert [m["id"] for d in decoded for m in d["messages"]] == [0, 1, 2]
+
     async def test_should_send_and_receive_message(self):
         # Given: 유저 및 채팅방 생성
         user = await self._create_default_user()
@@ -240,6 +1657,316 @@ class TestChat(TestSocket):
             ).exists
         )()
 
+    async def test_should_index_sent_message_after_broadcast(self):
+        # Given: 채팅방 접속
+        user = await self._create_default_user()
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+        await communicator.connect()
+        await communicator.receive_json_from()  # JOIN MSG
+
+        # When: 메시지를 보내고 background 색인이 끝나면
+        await communicator.send_json_to({"message": "면접 후기"})
+        assert (await communicator.receive_json_from())["message"] == "면접 후기"
+        await search_indexer.close()
+        await communicator.disconnect()
+
+        # Then: 검색된다.
+        results, _ = await database_sync_to_async(search_messages)("면접")
+        assert [message.content for message in results] == ["면접 후기"]
+
+    @override_settings(
+        CHAT_WRITE_BEHIND_ENABLED=True, CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS=60_000
+    )
+    async def test_should_save_message_after_broadcast_with_write_behind(self):
+        # Given: 유저 및 채팅방 생성 후 연결
+        user = await self._create_default_user()
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+        await communicator.connect()
+        await communicator.receive_json_from()  # JOIN MSG
+
+        # When: 메시지를 보낸다.
+        await communicator.send_json_to({"message": "첫번째"})
+        await communicator.send_json_to({"message": "두번째"})
+
+        # Then: 저장 전에 브로드캐스트된다.
+        assert (await communicator.receive_json_from())["message"] == "첫번째"
+        assert (await communicator.receive_json_from())["message"] == "두번째"
+
+        # And: 버퍼를 비우면 한번의 bulk insert 로 저장된다.
+        flushes = message_writer.stats["flushes"]
+        await message_writer.close()
+        assert await database_sync_to_async(
+            lambda: list(
+                Message.objects.filter(room=chatroom)
+                .order_by("id")
+                .values_list("content", flat=True)
+            )
+        )() == ["첫번째", "두번째"]
+        assert message_writer.stats["flushes"] == flushes + 1
+        assert not message_writer.pending
+
+        await communicator.disconnect()
+
+    @override_settings(
+        CHAT_WRITE_BEHIND_ENABLED=True, CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS=60_000
+    )
+    async def test_should_fill_pks_when_bulk_create_does_not_return_them(self):
+        # Given: MySQL 처럼 bulk_create 가 pk 를 돌려주지 않는 DB 와 과거 메시지 버퍼가 있는 채팅방
+        user = await self._create_default_user()
+        chatroom = await self._create_default_chatroom()
+        await database_sync_to_async(load_history_entries)(chatroom.id)
+        bulk_create = Message.objects.bulk_create
+
+        def bulk_create_without_pks(objs, *args, **kwargs):
+            created = bulk_create(objs, *args, **kwargs)
+            for obj in created:
+                obj.pk = None
+            return created
+
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+        await communicator.connect()
+        await communicator.receive_json_from()  # JOIN MSG
+
+        # When: 메시지를 보내고 버퍼를 비운다.
+        await communicator.send_json_to({"message": "첫번째 메시지"})
+        await communicator.send_json_to({"message": "두번째 메시지"})
+        await communicator.receive_json_from()
+        await communicator.receive_json_from()
+        with mock.patch.object(
+            Message.objects, "bulk_create", side_effect=bulk_create_without_pks
+        ):
+            await message_writer.close()
+        await communicator.disconnect()
+
+        # Then: 저장한 행을 다시 읽어 pk 를 채우므로 과거 메시지 버퍼, 검색 색인, 채팅방 목록 요약이 갱신된다.
+        ids = await database_sync_to_async(
+            lambda: list(
+                Message.objects.filter(room=chatroom)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+        )()
+        entries = await database_sync_to_async(load_history_entries)(chatroom.id)
+        assert [json.loads(entry)["message"] for entry in entries] == [
+            "두번째 메시지",
+            "첫번째 메시지",
+        ]
+        assert await database_sync_to_async(
+            MessageTerm.objects.filter(message_id=ids[0], term="첫번").exists
+        )()
+        await chatroom.arefresh_from_db()
+        assert chatroom.latest_message_id == ids[1]
+
+    @override_settings(
+        CHAT_WRITE_BEHIND_ENABLED=True, CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS=60_000
+    )
+    async def test_should_flush_write_behind_on_lifespan_shutdown(self):
+        # Given: 저장 대기 중인 메시지
+        user = await self._create_default_user()
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+        await communicator.connect()
+        await communicator.receive_json_from()  # JOIN MSG
+        await communicator.send_json_to({"message": "종료 직전"})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+        assert message_writer.pending
+        task = message_writer._task
+
+        # When: 서버가 lifespan shutdown 을 보낸다.
+        lifespan = ApplicationCommunicator(application, {"type": "lifespan"})
+        await lifespan.send_input({"type": "lifespan.startup"})
+        assert (await lifespan.receive_output())["type"] == "lifespan.startup.complete"
+        await lifespan.send_input({"type": "lifespan.shutdown"})
+        assert (await lifespan.receive_output())["type"] == "lifespan.shutdown.complete"
+
+        # Then: 남은 메시지가 저장된다.
+        assert not message_writer.pending
+        assert await database_sync_to_async(
+            Message.objects.filter(room=chatroom, content="종료 직전").exists
+        )()
+
+        # And: 저장 루프는 취소되지 않고 마지막 flush 후 끝난다.
+        assert task.done() and not task.cancelled()
+        assert message_writer._task is None
+
+    async def test_should_reject_messages_over_rate_limit(self):
+        # Given: 유저당 연속 2개까지 보낼 수 있는 채팅방
+        user = await self._create_default_user()
+        chatroom = await database_sync_to_async(ChatRoom.objects.create)(
+            name="도배 금지방", user_message_rate=0.01, user_message_burst=2
+        )
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+        await communicator.connect()
+        await communicator.receive_json_from()  # JOIN MSG
+
+        # When: 연속으로 3개를 보내면
+        for i in range(3):
+            await communicator.send_json_to({"message": f"도배{i}"})
+
+        # Then: 두개만 브로드캐스트되고, 세번째는 보낸 사람에게 ERROR 프레임으로 응답한다.
+        # (ERROR 프레임은 그룹을 거치지 않아 브로드캐스트보다 먼저 올 수 있다.)
+        responses = [await communicator.receive_json_from() for _ in range(3)]
+        [response] = [r for r in responses if r.get("type") == MessageType.ERROR]
+        assert [r["message"] for r in responses if r is not response] == [
+            "도배0",
+            "도배1",
+        ]
+        assert response["code"] == RATE_LIMITED
+        assert response["retry_after"] > 0
+        assert await communicator.receive_nothing()
+        await communicator.disconnect()
+
+        # And: 제한된 메시지는 저장하지 않는다.
+        assert (
+            await database_sync_to_async(Message.objects.filter(room=chatroom).count)()
+            == 2
+        )
+
+    @override_settings(CHAT_USER_REQUEST_RATE=0.01, CHAT_USER_REQUEST_BURST=1)
+    async def test_should_rate_limit_load_more_frames(self):
+        # Given: 접속한 유저
+        user = await self._create_default_user()
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/{chatroom.id}/chat/")
+        communicator.scope["user"] = user
+        await communicator.connect()
+        await communicator.receive_json_from()  # JOIN MSG
+
+        # When: 과거 메시지를 연속으로 요청하면
+        for _ in range(2):
+            await communicator.send_json_to(
+                {"type": MessageType.LOAD_MORE, "before_id": 1}
+            )
+
+        # Then: 두번째 요청은 ERROR 프레임으로 거절한다.
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.ERROR
+        assert response["code"] == RATE_LIMITED
+        assert await communicator.receive_nothing()
+
+        # And: 채팅 메시지 bucket 은 쓰지 않는다.
+        await communicator.send_json_to({"message": "안녕"})
+        assert (await communicator.receive_json_from())["message"] == "안녕"
+        await communicator.disconnect()
+
+    async def test_should_share_rate_limit_between_guests_from_same_address(self):
+        # Given: 유저당 1개까지 보낼 수 있는 채팅방
+        chatroom = await database_sync_to_async(ChatRoom.objects.create)(
+            name="도배 금지방", user_message_rate=0.01, user_message_burst=1
+        )
+
+        # When: 같은 주소에서 토큰 없이 두번 접속해 (매번 새 게스트) 메시지를 보내면
+        responses = []
+        for _ in range(2):
+            communicator = WebsocketCommunicator(
+                application, f"/room/{chatroom.id}/chat/"
+            )
+            communicator.scope["client"] = ("10.0.0.1", 50000)
+            await communicator.connect()
+            await communicator.receive_json_from()  # GUEST TOKEN
+            await communicator.receive_json_from()  # JOIN MSG
+            await communicator.send_json_to({"message": "도배"})
+            response = await communicator.receive_json_from()
+            while response.get("type") == MessageType.SEND_USER_COUNT:
+                response = await communicator.receive_json_from()
+            responses.append(response)
+            await communicator.disconnect()
+
+        # Then: 새 게스트 이름으로 bucket 을 다시 받지 못한다.
+        assert responses[0]["message"] == "도배"
+        assert responses[1]["type"] == MessageType.ERROR
+        assert responses[1]["code"] == RATE_LIMITED
+
+    def test_should_not_take_token_when_any_bucket_is_empty(self):
+        # Given: 채팅방 bucket 이 비어 있으면
+        limiter = InMemoryRateLimiter()
+        assert limiter.acquire([("room", 0.01, 1)]) == 0
+
+        # When: 유저 bucket 과 함께 요청하면
+        wait = limiter.acquire([("room:user", 1, 1), ("room", 0.01, 1)])
+
+        # Then: 거절하고, 유저 bucket 의 토큰은 그대로 둔다.
+        assert wait > 0
+        assert limiter.acquire([("room:user", 1, 1)]) == 0
+
+    @override_settings(CHAT_BATCH_WINDOW_MS=200)
+    async def test_should_batch_messages_arriving_within_window(self):
+        # Given: 묶음 전송 모드로 연결
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(
+            application, f"/room/{chatroom.id}/chat/?delivery=batch"
+        )
+        communicator.scope["user"] = await self._create_default_user()
+        await communicator.connect()
+        await self._drain_until_join_msg(communicator, 1)
+        batch_stats.clear()
+
+        # When: 메시지가 한꺼번에 들어오면
+        for i in range(5):
+            await broadcast_frame(
+                get_channel_layer(),
+                f"chat_{chatroom.id}",
+                MessageType.CHAT_MESSAGE,
+                {"message": f"메시지{i}", "username": "Sue"},
+            )
+
+        # Then: 첫 메시지는 바로, 나머지는 창이 끝날 때 한 프레임으로 받는다.
+        assert (await communicator.receive_json_from())["message"] == "메시지0"
+        assert await communicator.receive_nothing(timeout=0.05)
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.CHAT_MESSAGES
+        assert [m["message"] for m in response["messages"]] == [
+            f"메시지{i}" for i in range(1, 5)
+        ]
+        assert batch_stats == {"frames": 2, "messages": 5}
+
+        # And: 조용해진 뒤의 메시지는 다시 바로 받는다.
+        await asyncio.sleep(0.2)
+        await communicator.send_json_to({"message": "조용"})
+        assert (await communicator.receive_json_from(timeout=0.1))["message"] == "조용"
+        await communicator.disconnect()
+
+    @override_settings(CHAT_BATCH_WINDOW_MS=200, CHAT_BATCH_MAX_MESSAGES=3)
+    async def test_should_flush_full_msgpack_batch(self):
+        # Given: msgpack 묶음 전송 모드로 연결
+        chatroom = await self._create_default_chatroom()
+        communicator = await self._connect_msgpack(
+            f"/room/{chatroom.id}/chat/?delivery=batch",
+            await self._create_default_user(),
+        )
+        while (await self._receive_msgpack(communicator)).get(
+            "type"
+        ) != MessageType.SEND_USER_COUNT:
+            pass
+
+        # When: 첫 메시지 뒤로 최대 개수만큼 들어오면
+        for i in range(4):
+            await broadcast_frame(
+                get_channel_layer(),
+                f"chat_{chatroom.id}",
+                MessageType.CHAT_MESSAGE,
+                {"message": f"메시지{i}", "username": "Sue"},
+            )
+
+        # Then: 창이 끝나기 전에 바로 묶음 프레임을 받는다.
+        assert (await self._receive_msgpack(communicator))["message"] == "메시지0"
+        response = await asyncio.wait_for(self._receive_msgpack(communicator), 0.1)
+        assert response == {
+            "type": MessageType.CHAT_MESSAGES,
+            "messages": [
+                {"message": f"메시지{i}", "username": "Sue"} for i in range(1, 4)
+            ],
+        }
+        await communicator.disconnect()
+
     async def test_should_chat_more_than_two_people(self):
         user1 = await self._create_default_user()
         user2 = await self._create_default_user("Min")
@@ -284,7 +2011,143 @@ class TestChat(TestSocket):
         response_3 = await communicator_3.receive_json_from()
         assert response_3 == message
 
+    @override_settings(CHAT_GROUP_SHARDS={"chat": 4})
+    async def test_should_deliver_message_to_every_shard(self):
+        # Given: shard 4개로 나뉜 채팅방에 여러 유저 접속
+        chatroom = await self._create_default_chatroom()
+        communicators = []
+        for i in range(6):
+            communicator = WebsocketCommunicator(
+                application, f"/room/{chatroom.id}/chat/"
+            )
+            communicator.scope["user"] = await self._create_default_user(f"user{i}")
+            await communicator.connect()
+            communicators.append(communicator)
+        for communicator in communicators:
+            await self._drain(communicator)  # JOIN MSG
+
+        # When: 메시지를 보내면
+        await communicators[0].send_json_to({"message": "안녕하세요."})
+
+        # Then: 모든 shard 의 유저가 받는다.
+        for communicator in communicators:
+            response = await communicator.receive_json_from()
+            assert response["message"] == "안녕하세요."
+            await communicator.disconnect()
+
+    async def test_should_exchange_msgpack_frames_in_chat_room(self):
+        # Given: 채팅방 및 메시지 2개 생성
+        chatroom = await self._create_default_chatroom()
+        user1 = await self._create_default_user("user1")
+        user2 = await self._create_default_user("user2")
+        message1 = await self._create_message(user1, chatroom, "첫번째")
+        message2 = await self._create_message(user1, chatroom, "두번째")
+
+        # When: msgpack subprotocol, v2 프로토콜로 연결
+        communicator1 = await self._connect_msgpack(
+            f"/room/{chatroom.id}/chat/?version=2", user1
+        )
+
+        # Then: 과거 메시지 묶음과 접속 인원을 바이너리 프레임으로 받는다.
+        response = await self._receive_msgpack(communicator1)
+        assert response == {
+            "type": MessageType.PAST_MESSAGES,
+            "messages": [
+                {"id": message2.id, "message": "두번째", "username": "user1"},
+                {"id": message1.id, "message": "첫번째", "username": "user1"},
+            ],
+        }
+        response = await self._receive_msgpack(communicator1)
+        self._assert_join_msg(response, 1)
+
+        # When: 두번째 유저가 msgpack subprotocol, v1 프로토콜로 연결
+        communicator2 = await self._connect_msgpack(f"/room/{chatroom.id}/chat/", user2)
+
+        # Then: 과거 메시지를 하나씩 바이너리 프레임으로 받는다.
+        response = await self._receive_msgpack(communicator2)
+        self._assert_message(response, message2, user1)
+        response = await self._receive_msgpack(communicator2)
+        self._assert_message(response, message1, user1)
+        response = await self._receive_msgpack(communicator2)
+        self._assert_join_msg(response, 2)
+        response = await self._receive_msgpack(communicator1)
+        self._assert_join_msg(response, 2)
+
+        # When: 바이너리 프레임으로 이전 메시지 요청
+        await self._send_msgpack(
+            communicator1, {"type": MessageType.LOAD_MORE, "before_id": message2.id}
+        )
+
+        # Then: 그 이전 메시지를 바이너리 프레임으로 받는다.
+        response = await self._receive_msgpack(communicator1)
+        assert response["type"] == MessageType.PAST_MESSAGES
+        assert [m["id"] for m in response["messages"]] == [message1.id]
+
+        # When: 바이너리 프레임으로 메시지 전송
+        await self._send_msgpack(communicator1, {"message": "안녕하세요."})
+
+        # Then: 두 유저 모두 바이너리 프레임으로 받는다.
+        for communicator in (communicator1, communicator2):
+            response = await self._receive_msgpack(communicator)
+            assert response == {"message": "안녕하세요.", "username": "user1"}
+            await communicator.disconnect()
+
+    def test_should_carry_only_json_frame_in_group_event(self):
+        # When: 그룹 이벤트를 만들면
+        frame = {"message": "안녕하세요.", "username": "user1"}
+        event = encode_event(MessageType.CHAT_MESSAGE, frame)
+
+        # Then: JSON 프레임만 싣는다. (msgpack 은 받는 consumer 가 필요할 때만 변환)
+        assert event == {"type": MessageType.CHAT_MESSAGE, "text": json.dumps(frame)}
+
+    @override_settings(CHAT_JSON_ENCODER={"BACKEND": "chat.tests.CountingEncoder"})
+    async def test_should_encode_broadcast_frame_once(self):
+        # Given: 세명의 유저가 채팅방 접속
+        chatroom = await self._create_default_chatroom()
+        communicators = []
+        for i in range(3):
+            communicator = WebsocketCommunicator(
+                application, f"/room/{chatroom.id}/chat/"
+            )
+            communicator.scope["user"] = await self._create_default_user(f"user{i}")
+            await communicator.connect()
+            communicators.append(communicator)
+        for communicator in communicators:
+            await self._drain(communicator)  # JOIN MSG
+        CountingEncoder.frames.clear()
+
+        # When: 메시지를 보내면
+        await communicators[0].send_json_to({"message": "안녕하세요."})
+
+        # Then: 모두 같은 프레임을 받고, 인코딩은 한번만 한다.
+        frames = {await c.receive_from() for c in communicators}
+        chat_frame = {"message": "안녕하세요.", "username": "user0"}
+        assert len(frames) == 1
+        assert json.loads(frames.pop()) == chat_frame
+        assert CountingEncoder.frames.count(chat_frame) == 1
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    @override_settings(CHAT_GROUP_SHARDS={"chat": 4})
+    def test_should_spread_members_over_shards(self):
+        # When: 여러 채널의 shard 를 계산하면
+        shards = {
+            shard_group_name("chat_1", f"specific..inmemory!{i}") for i in range(100)
+        }
+
+        # Then: 모든 shard 에 고르게 들어가고, 설정이 없는 그룹은 나누지 않는다.
+        assert shards == set(shard_group_names("chat_1"))
+        assert shard_group_names("chat_1") == [f"chat_1.{i}" for i in range(4)]
+        assert shard_group_names("chatroom") == ["chatroom"]
+
+    async def _drain_until_join_msg(self, communicator, active_user_cnt):
+        while True:
+            response = await communicator.receive_json_from()
+            if response.get("type") == MessageType.SEND_USER_COUNT:
+                return self._assert_join_msg(response, active_user_cnt)
+
     def _assert_message(self, response, message, user):
+        assert response["id"] == message.id
         assert response["message"] == message.content
         assert response["type"] == MessageType.PAST_MESSAGE
         assert response["username"] == user.username
@@ -329,6 +2192,41 @@ class TestChatRoomInfo(TestSocket):
         # And: 연결 종료
         await communicator.disconnect()
 
+    async def test_should_watch_daphne_transport_through_middleware(self):
+        # Given: daphne 서버가 넘기는 send (AuthMiddlewareStack 이 한번 더 감싼다.)
+        protocol = mock.Mock(
+            spec=["registerProducer", "unregisterProducer", "handle_reply"]
+        )
+        server = DaphneServer.__new__(DaphneServer)
+        server.connections = {protocol: {}}
+        receive = asyncio.Queue()
+        scope = {
+            "type": "websocket",
+            "path": "/room/",
+            "headers": [],
+            "subprotocols": [],
+        }
+
+        # When: 로비에 연결하면
+        await receive.put({"type": "websocket.connect"})
+        task = asyncio.create_task(
+            application(scope, receive.get, partial(server.handle_reply, protocol))
+        )
+        while protocol.handle_reply.call_count < 2:
+            await asyncio.sleep(0.01)
+
+        # Then: 송신 큐가 transport 에 producer 로 등록된다.
+        assert (
+            protocol.handle_reply.call_args_list[0].args[0]["type"]
+            == "websocket.accept"
+        )
+        protocol.registerProducer.assert_called_once_with(mock.ANY, True)
+
+        # And: 연결을 끊으면 producer 를 해제한다.
+        await receive.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(task, 1)
+        protocol.unregisterProducer.assert_called_once_with()
+
     async def test_should_respond_empty_if_there_is_no_room(self):
         # When: 소켓 연결
         communicator = WebsocketCommunicator(application, f"/room/")
@@ -341,6 +2239,42 @@ class TestChatRoomInfo(TestSocket):
         # And: 연결 종료
         await communicator.disconnect()
 
+    async def test_should_send_chatroom_list_only_to_connecting_client(self):
+        # Given: 채팅방 목록에 접속한 유저
+        await self._create_default_chatroom()
+        communicator1 = WebsocketCommunicator(application, f"/room/")
+        await communicator1.connect()
+        await communicator1.receive_json_from()
+
+        # When: 다른 유저가 접속하면
+        communicator2 = WebsocketCommunicator(application, f"/room/")
+        await communicator2.connect()
+
+        # Then: 새 유저만 목록을 받는다.
+        response = await communicator2.receive_json_from()
+        assert response["type"] == MessageType.SEND_CHATROOM_LIST
+        assert await communicator1.receive_nothing()
+
+        await communicator1.disconnect()
+        await communicator2.disconnect()
+
+    async def test_should_refresh_chatroom_list_when_chatroom_created(self):
+        # Given: 빈 채팅방 목록을 캐싱
+        communicator = WebsocketCommunicator(application, f"/room/")
+        await communicator.connect()
+        assert (await communicator.receive_json_from())["results"] == {}
+        await communicator.disconnect()
+
+        # When: 채팅방 생성 후 다시 접속
+        chatroom = await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/")
+        await communicator.connect()
+
+        # Then: 새 채팅방이 목록에 포함된다.
+        response = await communicator.receive_json_from()
+        assert list(response["results"]) == [str(chatroom.id)]
+        await communicator.disconnect()
+
     async def test_should_respond_order_by_visitor_count(self):
         # Given: 채팅방 생성
         now = datetime.now(tz=SEOUL_TZ)
@@ -415,6 +2349,7 @@ class TestChatRoomInfo(TestSocket):
             },
         }
 
+    @override_settings(CHAT_LOBBY_COALESCE_INTERVAL_MS=0)
     async def test_should_respond_latest_msg_when_msg_is_updated(self):
         # Given: 채팅방 생성 및 메시지
         chatroom = await self._create_default_chatroom()
@@ -448,14 +2383,273 @@ class TestChatRoomInfo(TestSocket):
         chat_communicator.scope["user"] = user
         await chat_communicator.connect()
 
+        # And: 입장으로 인한 방문자 수, 순위 변경을 응답한다.
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.VISITOR_COUNT_CHANGED
+        assert response["visitor_count"] == 1
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.RANK_CHANGED
+
         message = {"message": "I'm so happy.", "username": user.username}
         await chat_communicator.send_json_to(message)
 
         # Then: 새로 전달된 메시지를 응답한다.
         response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.UPDATE_LATEST_MSG
         assert response["chatroom_id"] == str(chatroom.id)
         assert response["message"] == "I'm so happy."
         assert response["username"] == user.username
 
         await chat_communicator.disconnect()
         await communicator.disconnect()
+
+    async def test_should_send_versioned_deltas_and_snapshot_on_request(self):
+        # Given: 채팅방 2개 생성 후 채팅방 목록 접속
+        chatroom1 = await self._create_default_chatroom()
+        chatroom2 = await self._create_default_chatroom("삼성전자 공채 준비방")
+        user = await self._create_default_user()
+        communicator = WebsocketCommunicator(application, f"/room/")
+        await communicator.connect()
+        snapshot = await communicator.receive_json_from()
+
+        # When: 두번째 방에 유저가 입장
+        chat_communicator = WebsocketCommunicator(
+            application, f"/room/{chatroom2.id}/chat/"
+        )
+        chat_communicator.scope["user"] = user
+        await chat_communicator.connect()
+
+        # Then: 바뀐 필드만 담은 delta 를 버전 순서대로 받는다.
+        visitor_delta = await communicator.receive_json_from()
+        assert visitor_delta == {
+            "type": MessageType.VISITOR_COUNT_CHANGED,
+            "version": snapshot["version"] + 1,
+            "chatroom_id": chatroom2.id,
+            "visitor_count": 1,
+        }
+        rank_delta = await communicator.receive_json_from()
+        assert rank_delta == {
+            "type": MessageType.RANK_CHANGED,
+            "version": snapshot["version"] + 2,
+            "chatroom_id": chatroom2.id,
+            "rank": 0,
+        }
+
+        # When: 전체 목록을 다시 요청하면
+        await communicator.send_json_to({"type": MessageType.REQUEST_SNAPSHOT})
+
+        # Then: 최신 버전의 스냅샷을 받는다.
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.SEND_CHATROOM_LIST
+        assert response["version"] == rank_delta["version"]
+        assert list(response["results"]) == [str(chatroom2.id), str(chatroom1.id)]
+
+        await chat_communicator.disconnect()
+        await communicator.disconnect()
+
+    async def test_should_send_room_created_delta(self):
+        # Given: 채팅방 목록 접속
+        communicator = WebsocketCommunicator(application, f"/room/")
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        # When: 채팅방 생성 API 요청
+        response = await database_sync_to_async(APIClient().post)(
+            "/chat/", data={"name": "자소설 닷컴 채팅방"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        # Then: 채팅방 생성 delta 를 받는다.
+        chatroom = await database_sync_to_async(ChatRoom.objects.get)()
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.ROOM_CREATED
+        assert response["chatroom_id"] == chatroom.id
+        assert response["name"] == "자소설 닷컴 채팅방"
+
+        await communicator.disconnect()
+
+    @override_settings(CHAT_LOBBY_COALESCE_INTERVAL_MS=60_000)
+    async def test_should_coalesce_latest_msg_updates_per_room(self):
+        # Given: 채팅방 2개와 채팅방 목록 접속
+        chatroom1 = await self._create_default_chatroom()
+        chatroom2 = await self._create_default_chatroom("삼성전자 공채 준비방")
+        user = await self._create_default_user()
+        communicator = WebsocketCommunicator(application, f"/room/")
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        # When: 한 방에서 여러 메시지, 다른 방에서 한 메시지를 보낸다.
+        coalesced = latest_message_coalescer.stats["coalesced"]
+        await latest_message_coalescer.add(chatroom1.id, "첫번째", user.username)
+        await latest_message_coalescer.add(chatroom1.id, "두번째", user.username)
+        await latest_message_coalescer.add(chatroom2.id, "방가방가", user.username)
+        await latest_message_coalescer.close()
+
+        # Then: 방별 마지막 메시지만 하나의 프레임으로 받는다.
+        response = await communicator.receive_json_from()
+        assert response["type"] == MessageType.UPDATE_LATEST_MSGS
+        assert response["messages"] == [
+            {
+                "chatroom_id": chatroom1.id,
+                "message": "두번째",
+                "username": user.username,
+            },
+            {
+                "chatroom_id": chatroom2.id,
+                "message": "방가방가",
+                "username": user.username,
+            },
+        ]
+        assert await communicator.receive_nothing()
+
+        # And: 합쳐진 이벤트 수가 집계된다.
+        assert latest_message_coalescer.stats["coalesced"] == coalesced + 1
+
+        await communicator.disconnect()
+
+    @override_settings(CHAT_LOBBY_COALESCE_INTERVAL_MS=10)
+    async def test_should_stop_coalescer_task_when_idle(self):
+        # Given: 마지막 메시지 변경이 하나 들어온 뒤
+        chatroom = await self._create_default_chatroom()
+        await latest_message_coalescer.add(chatroom.id, "안녕", "user")
+        task = latest_message_coalescer._task
+
+        # When: 보낸 뒤 새 변경이 없으면
+        await asyncio.wait_for(task, timeout=1)
+
+        # Then: task 가 끝나고, 다음 변경이 들어오면 다시 시작한다.
+        assert not latest_message_coalescer.pending
+        await latest_message_coalescer.add(chatroom.id, "다시", "user")
+        assert latest_message_coalescer._task is not task
+        assert not latest_message_coalescer._task.done()
+        await latest_message_coalescer.close()
+
+    @override_settings(CHAT_LOBBY_PAGE_SIZE=1, CHAT_LOBBY_COALESCE_INTERVAL_MS=0)
+    async def test_should_exchange_msgpack_frames_in_chatroom_list(self):
+        # Given: 채팅방 2개 생성
+        chatroom1 = await self._create_default_chatroom()
+        chatroom2 = await self._create_default_chatroom("삼성전자 공채 준비방")
+        user = await self._create_default_user()
+
+        # When: msgpack subprotocol 로 채팅방 목록 접속
+        communicator = await self._connect_msgpack("/room/")
+        json_communicator = WebsocketCommunicator(application, "/room/")
+        await json_communicator.connect()
+
+        # Then: JSON 과 같은 내용의 스냅샷을 바이너리 프레임으로 받는다.
+        snapshot = await self._receive_msgpack(communicator)
+        assert snapshot["type"] == MessageType.SEND_CHATROOM_LIST
+        assert snapshot == await json_communicator.receive_json_from()
+
+        # When: 바이너리 프레임으로 다음 페이지와 스냅샷을 요청
+        await self._send_msgpack(
+            communicator,
+            {"type": MessageType.LOAD_ROOMS, "cursor": snapshot["next_cursor"]},
+        )
+        await self._send_msgpack(communicator, {"type": MessageType.REQUEST_SNAPSHOT})
+
+        # Then: 바이너리 프레임으로 응답한다.
+        response = await self._receive_msgpack(communicator)
+        assert response["type"] == MessageType.SEND_CHATROOM_LIST
+        assert len(response["results"]) == 1
+        assert response["next_cursor"] is None
+        assert await self._receive_msgpack(communicator) == snapshot
+
+        # When: 방 입장, 메시지 전송, 방 생성으로 delta 가 발생하면
+        chat_communicator = WebsocketCommunicator(
+            application, f"/room/{chatroom2.id}/chat/"
+        )
+        chat_communicator.scope["user"] = user
+        await chat_communicator.connect()
+        await chat_communicator.send_json_to({"message": "방가방가"})
+        await publish_lobby_delta(
+            MessageType.ROOM_CREATED, chatroom_id=chatroom1.id + 100, name="새 방"
+        )
+
+        # Then: 모든 delta 를 JSON 클라이언트와 같은 내용의 바이너리 프레임으로 받는다.
+        delta_types = set()
+        for _ in range(4):
+            response = await self._receive_msgpack(communicator)
+            assert response == await json_communicator.receive_json_from()
+            delta_types.add(response["type"])
+        assert delta_types == {
+            MessageType.VISITOR_COUNT_CHANGED,
+            MessageType.RANK_CHANGED,
+            MessageType.UPDATE_LATEST_MSG,
+            MessageType.ROOM_CREATED,
+        }
+
+        await chat_communicator.disconnect()
+        await json_communicator.disconnect()
+        await communicator.disconnect()
+
+    @override_settings(CHAT_LOBBY_PAGE_SIZE=2)
+    async def test_should_page_chatroom_list_with_cursor(self):
+        # Given: 방문자 수가 다른 채팅방 3개
+        now = datetime.now(tz=SEOUL_TZ)
+        chatroom1 = await self._create_default_chatroom()
+        chatroom2 = await self._create_default_chatroom("삼성전자 공채 준비방")
+        chatroom3 = await self._create_default_chatroom("롯데그룹 면접방")
+        user1 = await self._create_default_user()
+        user2 = await self._create_default_user("Min")
+        await self._add_user_to_chatroom(user1, chatroom3, now)
+        await self._add_user_to_chatroom(user2, chatroom3, now)
+        await self._add_user_to_chatroom(user1, chatroom2, now)
+
+        # When: 채팅방 목록 접속
+        communicator = WebsocketCommunicator(application, f"/room/")
+        await communicator.connect()
+
+        # Then: 상위 2개 방과 다음 페이지 cursor (마지막 방의 순위 값) 를 받는다.
+        response = await communicator.receive_json_from()
+        assert list(response["results"]) == [str(chatroom3.id), str(chatroom2.id)]
+        assert response["next_cursor"] == f"-1:{chatroom2.id}"
+        cursor = response["next_cursor"]
+
+        # When: cursor 로 다음 페이지 요청
+        await communicator.send_json_to(
+            {"type": MessageType.LOAD_ROOMS, "cursor": cursor}
+        )
+
+        # Then: 나머지 방을 받고 다음 페이지는 없다.
+        response = await communicator.receive_json_from()
+        assert list(response["results"]) == [str(chatroom1.id)]
+        assert response["next_cursor"] is None
+
+        # When: 다음 페이지의 방이 앞 페이지로 올라간 뒤 같은 cursor 로 요청하면
+        await self._add_user_to_chatroom(user1, chatroom1, now)
+        await self._add_user_to_chatroom(user2, chatroom1, now)
+        await self._add_user_to_chatroom(
+            await self._create_default_user("Jang"), chatroom1, now
+        )
+        await self._drain(communicator)
+        await communicator.send_json_to(
+            {"type": MessageType.LOAD_ROOMS, "cursor": cursor}
+        )
+
+        # Then: 앞 페이지에서 받은 방이 밀려서 다시 오지 않는다.
+        response = await communicator.receive_json_from()
+        assert response["results"] == {}
+        assert response["next_cursor"] is None
+
+        await communicator.disconnect()
+
+    async def test_should_reply_error_for_invalid_chatroom_list_cursor(self):
+        # Given: 채팅방 목록 접속
+        await self._create_default_chatroom()
+        communicator = WebsocketCommunicator(application, f"/room/")
+        await communicator.connect()
+        snapshot = await communicator.receive_json_from()
+
+        # When: 잘못된 cursor 로 다음 페이지 요청
+        await communicator.send_json_to(
+            {"type": MessageType.LOAD_ROOMS, "cursor": "abc"}
+        )
+
+        # Then: ERROR 프레임으로 응답하고 연결은 유지된다.
+        response = await communicator.receive_json_from()
+        assert response == {"type": MessageType.ERROR, "code": INVALID_CURSOR}
+        await communicator.send_json_to({"type": MessageType.LOAD_ROOMS})
+        assert await communicator.receive_json_from() == snapshot
+
+        await communicator.disconnect()
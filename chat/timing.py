@@ -0,0 +1,30 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# 구간별 소요 시간(ms)을 재서 한 줄로 로깅한다.
+class PhaseTimer:
+    def __init__(self, name):
+        self.name = name
+        self.phases = {}
+        self.started = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = (now - self.last) * 1000
+        self.last = now
+
+    @property
+    def total(self):
+        return (self.last - self.started) * 1000
+
+    def log(self, **context):
+        logger.debug(
+            "%s %s total=%.1fms %s",
+            self.name,
+            " ".join(f"{key}={value}" for key, value in context.items()),
+            self.total,
+            " ".join(f"{phase}={ms:.1f}ms" for phase, ms in self.phases.items()),
+        )
@@ -4,4 +4,5 @@ from chat import views
 
 urlpatterns = [
     path("", views.create_chatrooms),
+    path("search/", views.search_chat_messages),
 ]
@@ -1,17 +1,44 @@
+from asgiref.sync import async_to_sync
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from chat.serializers import ChatRoomSeriailizer
+from chat.enums import MessageType
+from chat.lobby import publish_lobby_delta
+from chat.search import search_messages
+from chat.serializers import (ChatRoomSeriailizer,
+                              MessageSearchQuerySerializer,
+                              MessageSearchResultSerializer)
 
 
 def _create_chatroom(data):
     serializer = ChatRoomSeriailizer(data=data)
     if serializer.is_valid(raise_exception=True):
-        serializer.save()
+        chatroom = serializer.save()
+        async_to_sync(publish_lobby_delta)(
+            MessageType.ROOM_CREATED, chatroom_id=chatroom.id, name=chatroom.name
+        )
         return Response(status=status.HTTP_200_OK)
 
 
 @api_view(["POST"])
 def create_chatrooms(request):
     return _create_chatroom(request.data)
+
+
+@api_view(["GET"])
+def search_chat_messages(request):
+    query = MessageSearchQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    messages, next_cursor = search_messages(
+        query.validated_data["q"],
+        room_id=query.validated_data.get("room_id"),
+        before_id=query.validated_data.get("cursor"),
+        limit=query.validated_data.get("limit"),
+    )
+    return Response(
+        {
+            "results": MessageSearchResultSerializer(messages, many=True).data,
+            "next_cursor": next_cursor,
+        }
+    )
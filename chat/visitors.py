@@ -0,0 +1,148 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+from sortedcontainers import SortedList
+
+from chat.backends import get_backend
+from chat.models import ChatRoomVisit
+from chat.ranking import get_room_ranking
+from chat_project.helpers import SEOUL_TZ
+
+
+def _window_start(now, minutes):
+    now = now or datetime.now(tz=SEOUL_TZ)
+    minutes = minutes or settings.CHAT_VISITOR_WINDOW_MINUTES
+    return (now - timedelta(minutes=minutes)).timestamp()
+
+
+# 채팅방별 sorted set (member=방문자, score=마지막 방문 시각) 으로 최근 방문자 수를 센다.
+class RedisVisitorCounter:
+    def __init__(self, cache="default", retention_minutes=24 * 60):
+        self.cache_alias = cache
+        self.retention = timedelta(minutes=retention_minutes)
+
+    def _redis(self):
+        from django_redis import get_redis_connection
+
+        return get_redis_connection(self.cache_alias)
+
+    def _key(self, room_id):
+        # 캐시의 KEY_PREFIX/VERSION 을 붙여 다른 배포와 키가 겹치지 않게 한다.
+        return caches[self.cache_alias].make_key(f"chat:visitors:{room_id}")
+
+    def touch(self, room_id, visitor_id, visited_at):
+        key = self._key(room_id)
+        with self._redis().pipeline() as pipe:
+            pipe.zadd(key, {str(visitor_id): visited_at.timestamp()}, gt=True)
+            pipe.zremrangebyscore(
+                key, "-inf", (visited_at - self.retention).timestamp()
+            )
+            pipe.expire(key, self.retention)
+            pipe.execute()
+
+    def count(self, room_id, now=None, minutes=None):
+        return self.counts([room_id], now=now, minutes=minutes)[room_id]
+
+    def counts(self, room_ids, now=None, minutes=None):
+        start = _window_start(now, minutes)
+        with self._redis().pipeline(transaction=False) as pipe:
+            for room_id in room_ids:
+                pipe.zcount(self._key(room_id), start, "+inf")
+            return dict(zip(room_ids, pipe.execute()))
+
+    def clear(self, room_id):
+        self._redis().delete(self._key(room_id))
+
+
+# 테스트 및 단일 프로세스용 구현
+class InMemoryVisitorCounter:
+    def __init__(self):
+        self.last_visits = defaultdict(dict)
+        self.timeline = defaultdict(SortedList)
+
+    def touch(self, room_id, visitor_id, visited_at):
+        score = visited_at.timestamp()
+        previous = self.last_visits[room_id].get(visitor_id)
+        if previous is not None:
+            if previous >= score:
+                return
+            self.timeline[room_id].remove((previous, visitor_id))
+        self.last_visits[room_id][visitor_id] = score
+        self.timeline[room_id].add((score, visitor_id))
+
+    def count(self, room_id, now=None, minutes=None):
+        return self.counts([room_id], now=now, minutes=minutes)[room_id]
+
+    def counts(self, room_ids, now=None, minutes=None):
+        start = _window_start(now, minutes)
+        results = {}
+        for room_id in room_ids:
+            timeline = self.timeline.get(room_id)
+            results[room_id] = (
+                len(timeline) - timeline.bisect_left((start,)) if timeline else 0
+            )
+        return results
+
+    def clear(self, room_id):
+        self.last_visits.pop(room_id, None)
+        self.timeline.pop(room_id, None)
+
+
+def get_visitor_counter():
+    return get_backend("CHAT_VISITOR_COUNTER")
+
+
+def touch_visitor(room_id, visitor_id, visited_at):
+    # 방문자 카운터와 채팅방 목록 순위를 함께 갱신한다.
+    counter = get_visitor_counter()
+    counter.touch(room_id, visitor_id, visited_at)
+    get_room_ranking().update(room_id, counter.count(room_id))
+
+
+def record_visit(user, room, visited_at):
+    # DB 행이 없는 게스트는 카운터에만 기록한다. (SQL 집계/재구축에는 포함되지 않는다.)
+    if user.pk is None:
+        touch_visitor(room.id, user.visitor_id, visited_at)
+        return
+    # upsert 는 post_save 가 발생하지 않으므로 카운터를 직접 갱신한다.
+    ChatRoomVisit.upsert(user, room, visited_at)
+    touch_visitor(room.id, user.id, visited_at)
+
+
+def sql_visitor_counts(room_ids, now=None, minutes=None):
+    start = datetime.fromtimestamp(_window_start(now, minutes), tz=SEOUL_TZ)
+    counts = dict(
+        ChatRoomVisit.objects.filter(room_id__in=room_ids, last_visited_at__gte=start)
+        .values("room_id")
+        .annotate(count=Count("user", distinct=True))
+        .values_list("room_id", "count")
+    )
+    return {room_id: counts.get(room_id, 0) for room_id in room_ids}
+
+
+def check_visitor_counts(room_ids, now=None, minutes=None):
+    # 카운터와 SQL 집계가 다른 방을 {room_id: (카운터, SQL)} 로 반환한다.
+    now = now or datetime.now(tz=SEOUL_TZ)
+    counted = get_visitor_counter().counts(room_ids, now=now, minutes=minutes)
+    expected = sql_visitor_counts(room_ids, now=now, minutes=minutes)
+    return {
+        room_id: (counted[room_id], expected[room_id])
+        for room_id in room_ids
+        if counted[room_id] != expected[room_id]
+    }
+
+
+def rebuild_visitor_counts(room_ids, now=None):
+    counter = get_visitor_counter()
+    start = datetime.fromtimestamp(_window_start(now, None), tz=SEOUL_TZ)
+    for room_id in room_ids:
+        counter.clear(room_id)
+    visits = ChatRoomVisit.objects.filter(
+        room_id__in=room_ids, last_visited_at__gte=start
+    ).values_list("room_id", "user_id", "last_visited_at")
+    for room_id, user_id, visited_at in visits.iterator():
+        counter.touch(room_id, user_id, visited_at)
+    get_room_ranking().update_many(counter.counts(room_ids))
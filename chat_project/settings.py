@@ -82,12 +82,20 @@ ASGI_APPLICATION = "chat_project.asgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        # django.db.backends.mysql + 프로세스 단위 연결 풀 (chat/db_backends/pool.py)
+        "ENGINE": "chat.db_backends.mysql",
         "NAME": "chat",
         "USER": "root",
         "PASSWORD": "1234",
         "HOST": "localhost",
         "PORT": "3306",
+        "POOL": {
+            "MIN_SIZE": 2,
+            "MAX_SIZE": 32,
+            "MAX_LIFETIME": 30 * 60,
+            "TIMEOUT": 10,
+            "HEALTH_CHECK_AFTER": 30,
+        },
     },
     "TEST": {
         "NAME": "chat_test",
@@ -98,6 +106,14 @@ DATABASES = {
     },
 }
 
+# chat 앱 읽기를 CHAT_READ_REPLICAS 의 DB alias 로 보낸다. (비어 있으면 모두 default)
+# ex) DATABASES["replica"] = {..., "TEST": {"MIRROR": "default"}}, CHAT_READ_REPLICAS = ["replica"]
+DATABASE_ROUTERS = ["chat.routers.ReplicaRouter"]
+CHAT_READ_REPLICAS = []
+# 메시지를 보낸 연결은 이 시간(초) 동안 primary 에서 읽는다. (replica 지연보다 길게)
+CHAT_READ_YOUR_WRITES_SECONDS = 5
+CHAT_REPLICA_HEALTH_CHECK_INTERVAL = 10
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -117,6 +133,117 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Chat
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_FRAME_MAX_BYTES = 64 * 1024
+CHAT_DEFAULT_PROTOCOL_VERSION = 1
+
+# 소켓 consumer 의 sync DB 작업 전용 executor 스레드 수
+CHAT_DB_EXECUTOR_WORKERS = 32
+
+# 접속 경로의 ChatRoom 프로세스 로컬 캐시 (TTL 초, 최대 개수)
+CHAT_ROOM_CACHE_TTL = 30
+CHAT_ROOM_CACHE_SIZE = 10_000
+
+# 익명 게스트 토큰 (쿼리스트링 guest 또는 쿠키로 재접속시 같은 게스트로 식별)
+CHAT_GUEST_COOKIE = "chat_guest"
+CHAT_GUEST_TOKEN_MAX_AGE = 30 * 24 * 60 * 60
+# 메시지 검색 페이지 크기 (기본, 최대)
+CHAT_SEARCH_PAGE_SIZE = 20
+CHAT_SEARCH_MAX_PAGE_SIZE = 100
+
+# 이 기간(일)보다 오래된 메시지는 archive_messages 커맨드로 archive 테이블로 옮긴다.
+CHAT_MESSAGE_HOT_DAYS = 30
+CHAT_HISTORY_BUFFER = {
+    "BACKEND": "chat.history.CacheHistoryBuffer",
+    "OPTIONS": {
+        "cache": "default",
+        "size": 200,
+        "timeout": 60 * 60 * 24,
+    },
+}
+
+CHAT_VISITOR_WINDOW_MINUTES = 30
+CHAT_VISITOR_COUNTER = {
+    "BACKEND": "chat.visitors.RedisVisitorCounter",
+    "OPTIONS": {
+        "cache": "default",
+    },
+}
+
+# 채팅방별 접속 중인 연결 수 (SEND_USER_COUNT)
+# 노드마다 CHAT_PRESENCE_HEARTBEAT_SECONDS 마다 heartbeat 를 남기고, node_ttl 초 동안 없으면 그 노드의 연결은 빠진다.
+# 접속/종료로 바뀐 수는 CHAT_PRESENCE_DEBOUNCE_MS 동안 모아서 한번만 보낸다. (0 이면 바로 전송)
+CHAT_PRESENCE = {
+    "BACKEND": "chat.presence.RedisPresence",
+    "OPTIONS": {
+        "cache": "default",
+        "node_ttl": 30,
+    },
+}
+CHAT_PRESENCE_HEARTBEAT_SECONDS = 10
+CHAT_PRESENCE_DEBOUNCE_MS = 500
+
+# 채팅방 목록 스냅샷/버전 캐시 (TTL 초)
+CHAT_LOBBY_CACHE = "default"
+CHAT_LOBBY_SNAPSHOT_TTL = 5
+CHAT_LOBBY_PAGE_SIZE = 50
+CHAT_LOBBY_RANKING = {
+    "BACKEND": "chat.ranking.RedisRoomRanking",
+    "OPTIONS": {
+        "cache": "default",
+    },
+}
+# 채팅방별 마지막 메시지 변경을 모아서 보내는 주기 (0 이면 메시지마다 바로 전송)
+# 켜면 update_latest_msg 대신 update_latest_msgs 프레임을 보내므로,
+# 모든 채팅방 목록 클라이언트가 update_latest_msgs 를 처리할 수 있을 때만 켠다.
+CHAT_LOBBY_COALESCE_INTERVAL_MS = 0
+
+# 메시지를 브로드캐스트 후 모아서 저장 (write-behind)
+CHAT_WRITE_BEHIND_ENABLED = False
+CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS = 100
+CHAT_WRITE_BEHIND_BATCH_SIZE = 500
+CHAT_WRITE_BEHIND_MAX_QUEUE = 10_000
+
+# 메시지 전송 속도 제한 (token bucket: RATE 초당 메시지 수, BURST 연속 최대 메시지 수)
+# 유저별(채팅방 안에서, 게스트는 접속 주소별)/채팅방별로 제한하고, ChatRoom 에 값이 있으면 그 값을 쓴다.
+# 채팅 메시지가 아닌 프레임(LOAD_MORE 등)은 CHAT_USER_REQUEST_* 로 유저별로 제한한다.
+CHAT_RATE_LIMITER = {
+    "BACKEND": "chat.ratelimit.RedisRateLimiter",
+    "OPTIONS": {
+        "cache": "default",
+    },
+}
+CHAT_USER_MESSAGE_RATE = 1
+CHAT_USER_MESSAGE_BURST = 5
+CHAT_ROOM_MESSAGE_RATE = 50
+CHAT_ROOM_MESSAGE_BURST = 100
+CHAT_USER_REQUEST_RATE = 2
+CHAT_USER_REQUEST_BURST = 10
+
+# 연결별 송신 큐 크기와 가득 찼을 때(느린 클라이언트) 처리 방식
+# ("drop_oldest": 오래된 프레임 버림, "coalesce": 같은 종류 프레임 합침, "disconnect": 연결 끊기)
+CHAT_OUTBOUND_QUEUE_SIZE = 256
+CHAT_OUTBOUND_QUEUE_POLICY = "drop_oldest"
+CHAT_SLOW_CONSUMER_CLOSE_CODE = 4008
+
+# ?delivery=batch 로 연결한 클라이언트에게 채팅 메시지를 모아서 보내는 시간 창과 최대 개수
+# (직전 전송 후 창이 지난 첫 메시지는 바로 보낸다.)
+CHAT_BATCH_WINDOW_MS = 15
+CHAT_BATCH_MAX_MESSAGES = 100
+
+# 소켓 프레임 JSON 인코더 (orjson 설치시 chat.encoding.OrjsonEncoder)
+CHAT_JSON_ENCODER = {
+    "BACKEND": "chat.encoding.StdlibJSONEncoder",
+}
+
+# 그룹 종류별 channel layer 그룹 shard 수 ("chatroom": 채팅방 목록, "chat": 채팅방)
+# 값을 바꾸면 기존 연결은 재접속 전까지 예전 shard 에 남는다.
+CHAT_GROUP_SHARDS = {
+    "chatroom": 1,
+    "chat": 1,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 